@@ -1,64 +1,67 @@
 # gui_launcher.py
-import tkinter as tk
-from reliakit.codex_base_ui import CodexBaseUI
 import sys
+import json
 import argparse
 from pathlib import Path
-import subprocess # For running agent execution
 
-# Corrected imports for memory_seeder and MemoryDB
-from memory_seeder import seed_database
-from reliakit.memory_db import MemoryDB
+# Heavier imports (tkinter, the GUI, the agent runtime) happen in the branches that need
+# them, so `--execute` served by the agent daemon starts in a few milliseconds.
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--seed", action="store_true", help="Seed the memory database")
     parser.add_argument("--execute", type=str, help="Agent name to execute")
     parser.add_argument("--input", type=str, help="Input data for the agent")
+    parser.add_argument("--db", type=Path, help="Path to memory.db (defaults to reliakit/utils/memory.db)")
+    parser.add_argument("--json", action="store_true", help="With --execute, print the result as JSON on the last line")
+    parser.add_argument("--local", action="store_true", help="With --execute, run in this process even if the agent daemon is up")
+    parser.add_argument("--heal-of", type=int, help="With --execute, id of the failed log entry this run retries")
     args = parser.parse_args()
 
     # Determine the database path relative to the project root
-    db_path = Path(__file__).resolve().parent / "reliakit" / "utils" / "memory.db"
+    db_path = args.db or Path(__file__).resolve().parent / "reliakit" / "utils" / "memory.db"
 
     if args.seed:
+        # Corrected imports for memory_seeder and MemoryDB
+        from memory_seeder import seed_database
+        from reliakit.memory_db import MemoryDB
         # Initialize MemoryDB to ensure table exists before seeding
-        MemoryDB(db_path=db_path) 
+        MemoryDB(db_path=db_path)
         seed_database(db_path=db_path)
         print("✅ Database seeded.")
         return
 
     if args.execute:
         print(f"🧠 Executing {args.execute} with input: '{args.input}'")
-        # This part simulates the agent's execution and logs it to the DB.
-        # In a real scenario, this would trigger the actual agent logic.
-        db = MemoryDB(db_path=db_path)
-        try:
-            # Simulate agent execution and log it
-            response_text = f"Agent '{args.execute}' processed input: '{args.input}' successfully."
-            db.insert_log( # Changed to insert_log
-                agent_name=args.execute,
-                model_used="SimulatedModel", # Use a simulated model name for direct execution
-                prompt=args.input,
-                response=response_text,
-                status="SUCCESS"
-            )
-            print(f"Execution logged: {response_text}")
-        except Exception as e:
-            error_response = f"Error executing agent '{args.execute}': {e}"
-            db.insert_log( # Changed to insert_log
-                agent_name=args.execute,
-                model_used="SimulatedModel/Error",
-                prompt=args.input,
-                response=error_response,
-                status="ERROR" # Log as ERROR status
-            )
-            print(f"Execution failed and logged: {error_response}")
-        return
+        result = None
+        if not args.local:
+            # Forward to the resident agent daemon when one is running (see reliakit/agent_daemon.py)
+            from reliakit.agent_client import run_via_daemon
+            try:
+                result = run_via_daemon(args.execute, args.input or "", db_path, heal_of=args.heal_of)
+            except TimeoutError as e:
+                print(e)
+                sys.exit(1)
+        if result is None:
+            # In-process; this is also what AgentExecutor's subprocess isolation runs (with --local).
+            from reliakit.agent_executor import AgentExecutor
+            executor = AgentExecutor(db_path=db_path, isolation="thread")
+            try:
+                result = executor.run(args.execute, args.input or "", heal_of=args.heal_of)
+            finally:
+                executor.close()
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(f"Execution logged ({result['status']} via {result['model_used']}): {result['response']}")
+        sys.exit(1 if result['status'] in ("ERROR", "BLOCKED") else 0)
 
     # Launch GUI
+    import tkinter as tk
+    from reliakit.codex_base_ui import CodexBaseUI
     root = tk.Tk()
     app = CodexBaseUI(root, db_path=db_path) # Pass db_path to GUI
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
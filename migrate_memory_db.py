@@ -0,0 +1,40 @@
+# migrate_memory_db.py
+import argparse
+from pathlib import Path
+from reliakit.memory_db import ConnectionPool
+from reliakit.db_migrations import migrate, get_schema_version, SCHEMA_VERSION, BACKFILL_CHUNK_SIZE
+
+def main():
+    """
+    Upgrades a ReliaKit memory database to the latest schema version.
+    Safe to run against a live database: backfills happen in small chunks,
+    each in its own short transaction, and every step can be resumed.
+    """
+    parser = argparse.ArgumentParser(description="Migrate the ReliaKit memory database schema.")
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=Path(__file__).resolve().parent / "reliakit" / "utils" / "memory.db",
+        help="Path to memory.db"
+    )
+    parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE, help="Rows per backfill transaction")
+    parser.add_argument("--status", action="store_true", help="Only print the current schema version")
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        print(f"❌ Database not found at {args.db}")
+        return
+
+    pool = ConnectionPool(args.db, max_size=1)
+    try:
+        current = get_schema_version(pool)
+        print(f"🧠 {args.db}: schema version {current} (latest {SCHEMA_VERSION})")
+        if args.status or current >= SCHEMA_VERSION:
+            return
+        version = migrate(pool, chunk_size=args.chunk_size, verbose=True)
+        print(f"✅ Migrated to schema version {version}.")
+    finally:
+        pool.close()
+
+if __name__ == '__main__':
+    main()
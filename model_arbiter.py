@@ -1,7 +1,8 @@
 import os
 from enum import Enum
-from reliakit.memory_db import db_session, MemorySnapshot
-import json
+from pathlib import Path
+from reliakit.memory_db import get_memory_db
+from reliakit.circuit_breaker import CircuitBreaker
 
 class ModelType(Enum):
     GEMINI = "gemini"
@@ -11,12 +12,16 @@ class ModelType(Enum):
 class ModelArbiter:
     """Handles model selection and fallback logic"""
     def __init__(self):
-        self.preferred_model = self._get_initial_model()
         self.fallback_order = [
             ModelType.GEMINI,
             ModelType.CLAUDE, 
             ModelType.OLLAMA
         ]
+        # Health is shared with other ReliaKit processes through the memory DB
+        store = get_memory_db(Path(__file__).resolve().parent / "reliakit" / "utils" / "memory.db")
+        self.breakers = {model: CircuitBreaker(model.value, store=store) for model in self.fallback_order}
+        self.initial_model = self._get_initial_model()
+        self.preferred_model = self.initial_model
 
     def _get_initial_model(self):
         """Determine initial model based on environment"""
@@ -27,15 +32,28 @@ class ModelArbiter:
     def get_model_for_agent(self, agent_name):
         """Get appropriate model for given agent"""
         # Placeholder - could implement agent-specific model preferences
-        return self.preferred_model
+        # Walk the fallback order from the initial model and take the first backend whose
+        # circuit lets calls through, so the primary is used again as soon as it recovers.
+        start = self.fallback_order.index(self.initial_model)
+        for model in self.fallback_order[start:]:
+            if self.breakers[model].allow_request():
+                self.preferred_model = model
+                return model
+        return self.fallback_order[-1]
+
+    def record_success(self, model, latency):
+        """Report a successful call so the model's circuit can close again"""
+        self.breakers[model].record_success(latency)
 
     def handle_fallback(self, error):
         """Handle model errors by falling back to next available model"""
+        self.breakers[self.preferred_model].record_failure()
         current_index = self.fallback_order.index(self.preferred_model)
-        if current_index + 1 < len(self.fallback_order):
-            self.preferred_model = self.fallback_order[current_index + 1]
-            print(f"Falling back to {self.preferred_model.value}")
-            return True
+        for model in self.fallback_order[current_index + 1:]:
+            if self.breakers[model].allow_request():
+                self.preferred_model = model
+                print(f"Falling back to {self.preferred_model.value}")
+                return True
         return False
 
 def main():
@@ -51,4 +69,4 @@ def main():
         print(f"New model: {arbiter.preferred_model.value}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,11 +1,20 @@
 # File: modules/dashboard/server.py
-from flask import Flask, render_template, g
+from flask import Flask, render_template, g, jsonify
 import sqlite3
 import os
+try:
+    from reliakit.memory_db import DataVersionProbe
+    from reliakit.response_cache import ResponseCache
+except ImportError: # Standalone image without the reliakit package: render every request
+    DataVersionProbe = ResponseCache = None
 
 app = Flask(__name__)
 DATABASE = '/app/reliakit/memory.db' # The absolute path to the DB inside the container
 
+# Rendered pages keyed by (endpoint, data_version), shared by all viewers
+response_cache = ResponseCache(max_entries=32, ttl=30.0) if ResponseCache else None
+version_probe = DataVersionProbe(DATABASE) if DataVersionProbe else None
+
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
@@ -21,10 +30,22 @@ def close_connection(exception):
 
 @app.route('/')
 def index():
+    if response_cache is None:
+        return render_index()
+    return response_cache.get_or_compute(('/', version_probe.version()), render_index)
+
+def render_index():
     db = get_db()
-    cursor = db.execute('SELECT * FROM llm_log ORDER BY timestamp DESC LIMIT 50')
+    # Newest first by id: these standalone apps never migrate, so ts_us may not exist yet
+    cursor = db.execute('SELECT * FROM llm_log ORDER BY id DESC LIMIT 50')
     actions = cursor.fetchall()
     return render_template('index.html', actions=actions)
 
+@app.route('/stats/cache')
+def cache_stats():
+    if response_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(response_cache.stats(), enabled=True))
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000, debug=True)
@@ -0,0 +1,57 @@
+# reliakit/agent_client.py
+import json
+import os
+import socket
+from pathlib import Path
+from typing import Optional
+
+# Kept free of heavy imports: `gui_launcher.py --execute` loads only this module when the
+# agent daemon (reliakit/agent_daemon.py) is running, so a call costs a socket round trip.
+
+DEFAULT_SOCKET_PATH = Path(os.getenv(
+    "RELIAKIT_AGENT_SOCKET",
+    Path(os.getenv("TMPDIR", "/tmp")) / f"reliakit-agentd-{os.getuid()}.sock",
+))
+
+# Longest a daemon run should take: the primary and the fallback each up to the adaptive
+# timeout ceiling (120s, see LatencyTracker), plus queueing for budget, plus a margin.
+RUN_TIMEOUT = float(os.getenv("RELIAKIT_AGENT_TIMEOUT", 2 * 120 + 10 + 30))
+
+
+def send_request(request: dict, socket_path: Path = DEFAULT_SOCKET_PATH, timeout: Optional[float] = None) -> dict:
+    """Sends one JSON-line request to the daemon and returns its JSON-line reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(socket_path))
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as reply:
+            line = reply.readline()
+    if not line:
+        raise ConnectionError("agent daemon closed the connection without replying")
+    return json.loads(line)
+
+
+def run_via_daemon(agent_name: str, input_data: str, db_path: Path,
+                   socket_path: Path = DEFAULT_SOCKET_PATH, heal_of: Optional[int] = None,
+                   timeout: float = RUN_TIMEOUT) -> Optional[dict]:
+    """
+    Runs an agent in the resident daemon and returns its result dict, or None if no
+    daemon is listening or it serves a different database, so the caller can run it locally.
+    Raises TimeoutError if the daemon accepted the run but did not answer within `timeout`
+    seconds; the run may still finish there, so it is not repeated locally.
+    """
+    try:
+        reply = send_request({"op": "execute", "agent": agent_name, "input": input_data, "db": str(db_path),
+                              "heal_of": heal_of}, socket_path, timeout=timeout)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None  # No daemon running
+    except socket.timeout as e:
+        raise TimeoutError(f"Agent daemon on {socket_path} did not answer within {timeout:.0f}s; "
+                           f"the run may still complete there (use --local to run in this process)") from e
+    except (OSError, ValueError) as e:
+        print(f"Agent daemon unavailable ({e}); running locally.")
+        return None
+    if reply.get("error"):
+        print(f"Agent daemon declined the request ({reply['error']}); running locally.")
+        return None
+    return reply
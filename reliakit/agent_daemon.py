@@ -0,0 +1,112 @@
+# reliakit/agent_daemon.py
+import argparse
+import json
+import os
+import signal
+import socketserver
+import threading
+from pathlib import Path
+from reliakit.agent_client import DEFAULT_SOCKET_PATH, send_request
+from reliakit.agent_executor import AgentExecutor, DEFAULT_DB_PATH
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """One JSON-line request per connection, answered with one JSON line."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+            reply = self.server.daemon.handle(request)
+        except Exception as e:
+            reply = {"error": str(e)}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class AgentDaemon:
+    """
+    Resident process that keeps an AgentExecutor (and with it the model backends' warm
+    workers and the pooled database) alive and serves agent runs over a Unix domain
+    socket, so `gui_launcher.py --execute` does not start a full agent runtime per call.
+    Runs are bounded by the executor's pool.
+    """
+
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH, socket_path: Path = DEFAULT_SOCKET_PATH,
+                 max_workers: int = 4):
+        self.db_path = Path(db_path).resolve()
+        self.socket_path = Path(socket_path)
+        self.executor = AgentExecutor(db_path=self.db_path, max_workers=max_workers)
+        self.server = None
+
+    def handle(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "db": str(self.db_path), "pid": os.getpid()}
+        if op == "execute":
+            if Path(request.get("db") or self.db_path).resolve() != self.db_path:
+                return {"error": f"daemon serves {self.db_path}"}
+            return self.executor.submit(request["agent"], request.get("input") or "", request.get("heal_of")).result()
+        return {"error": f"unknown op '{op}'"}
+
+    def _claim_socket(self):
+        """Removes a stale socket file; refuses to start if another daemon answers on it."""
+        if not self.socket_path.exists():
+            return
+        try:
+            send_request({"op": "ping"}, self.socket_path, timeout=2)
+        except OSError:
+            self.socket_path.unlink()
+            return
+        raise RuntimeError(f"An agent daemon is already listening on {self.socket_path}")
+
+    def serve_forever(self):
+        self._claim_socket()
+        # Only this user may run agents through it. The socket is created owner-only
+        # rather than chmod-ed after bind(), which would leave it open for a moment.
+        umask = os.umask(0o077)
+        try:
+            self.server = _Server(str(self.socket_path), _RequestHandler)
+        finally:
+            os.umask(umask)
+        self.server.daemon = self
+        print(f"Agent daemon listening on {self.socket_path} (database {self.db_path})")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+            self.executor.close()
+            print("Agent daemon stopped.")
+
+    def shutdown(self):
+        if self.server is not None:
+            # serve_forever() must be stopped from another thread
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident ReliaKit agent daemon.")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help="Path to memory.db")
+    parser.add_argument("--socket", type=Path, default=DEFAULT_SOCKET_PATH, help="Unix socket to listen on")
+    parser.add_argument("--workers", type=int, default=4, help="Agent runs served concurrently")
+    args = parser.parse_args()
+
+    daemon = AgentDaemon(db_path=args.db, socket_path=args.socket, max_workers=args.workers)
+    signal.signal(signal.SIGTERM, lambda *_: daemon.shutdown())
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# reliakit/agent_executor.py
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+from reliakit.model_arbiter import CANCELLED, ModelArbiter, QueryStream
+from reliakit.model_backends import CancelToken
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_DB_PATH = PROJECT_ROOT / "reliakit" / "utils" / "memory.db"
+GUI_LAUNCHER = PROJECT_ROOT / "gui_launcher.py"
+
+# "thread" runs agents in this process; "subprocess" gives each run its own interpreter.
+ISOLATION_MODES = ("thread", "subprocess")
+DEFAULT_ISOLATION = os.getenv("RELIAKIT_AGENT_ISOLATION", "thread")
+
+
+class AgentExecutor:
+    """
+    Runs agents for the GUI, the meta loop and the CLI. By default an agent run is a
+    ModelArbiter query on a shared thread pool, so no interpreter is started and the
+    backends' warm workers and pooled DB connections are reused across runs. With
+    isolation="subprocess" each run is `gui_launcher.py --execute --local` in a fresh
+    interpreter instead, for agents that must not share the caller's process.
+
+    Every run returns (or resolves to) a dict with agent_name, input, response, status,
+    model_used and duration.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, max_workers: int = 4, isolation: str = DEFAULT_ISOLATION,
+                 arbiter: Optional[ModelArbiter] = None):
+        if isolation not in ISOLATION_MODES:
+            raise ValueError(f"Unknown isolation mode '{isolation}'; expected one of {ISOLATION_MODES}")
+        self.db_path = Path(db_path) if db_path is not None else DEFAULT_DB_PATH
+        self.isolation = isolation
+        self._arbiter = arbiter
+        self._arbiter_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-executor")
+
+    @property
+    def arbiter(self) -> ModelArbiter:
+        """The in-process ModelArbiter, created on first use."""
+        with self._arbiter_lock:
+            if self._arbiter is None:
+                self._arbiter = ModelArbiter(db_path=self.db_path)
+            return self._arbiter
+
+    def submit(self, agent_name: str, input_data: str, heal_of: Optional[int] = None) -> Future:
+        """Queues an agent run and returns a Future for its result dict."""
+        return self._pool.submit(self.run, agent_name, input_data, None, heal_of)
+
+    def run(self, agent_name: str, input_data: str, cancel: Optional[CancelToken] = None,
+            heal_of: Optional[int] = None) -> dict:
+        """
+        Runs an agent on the calling thread. Failures come back as status ERROR, never raised.
+        `heal_of` marks the run as a retry of the failed llm_log entry with that id. Cancelling
+        `cancel` stops the run in either isolation mode; it then ends with status CANCELLED.
+        """
+        started = time.monotonic()
+        try:
+            if self.isolation == "subprocess":
+                result = self._run_subprocess(agent_name, input_data, cancel, heal_of)
+            else:
+                result = self.arbiter.query(agent_name, input_data, heal_of=heal_of, cancel=cancel)
+        except Exception as e:
+            print(f"Error executing agent '{agent_name}': {e}")
+            result = {"model_used": None, "response": f"Error executing agent '{agent_name}': {e}", "status": "ERROR"}
+        return {
+            "agent_name": agent_name,
+            "input": input_data,
+            "response": result["response"],
+            "status": result["status"],
+            "model_used": result["model_used"],
+            "duration": time.monotonic() - started,
+        }
+
+    def stream(self, agent_name: str, input_data: str, cancel: Optional[CancelToken] = None) -> QueryStream:
+        """
+        Runs an agent and yields its output as it is generated (see ModelArbiter.stream_query).
+        Under subprocess isolation the output arrives as one chunk when the run completes.
+        Cancelling `cancel` stops the run and ends the stream with status CANCELLED.
+        """
+        if self.isolation != "subprocess":
+            return self.arbiter.stream_query(agent_name, input_data, cancel=cancel)
+        stream = QueryStream(cancel)
+
+        def chunks():
+            started = time.monotonic()
+            result = self.run(agent_name, input_data, stream.cancel)
+            if stream.cancel.cancelled:
+                stream._finish({"model_used": None, "response": "", "status": CANCELLED}, started)
+                return
+            stream.ttft = result["duration"]
+            yield result["response"]
+            stream._finish(result, started)
+
+        stream._chunks = chunks()
+        return stream
+
+    def _run_subprocess(self, agent_name: str, input_data: str, cancel: Optional[CancelToken] = None,
+                        heal_of: Optional[int] = None) -> dict:
+        command = [sys.executable, str(GUI_LAUNCHER), "--execute", agent_name, "--input", input_data,
+                   "--db", str(self.db_path), "--json", "--local"]
+        if heal_of is not None:
+            command += ["--heal-of", str(heal_of)]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        unlink = cancel.on_cancel(process.kill) if cancel is not None else None
+        try:
+            stdout, stderr = process.communicate()
+        finally:
+            if unlink is not None:
+                unlink()
+        if cancel is not None and cancel.cancelled:
+            return {"model_used": None, "response": "", "status": CANCELLED}
+        lines = stdout.strip().splitlines()
+        try:
+            return json.loads(lines[-1])  # The result is the last line; earlier ones are progress output
+        except (IndexError, json.JSONDecodeError):
+            raise RuntimeError(f"exit code {process.returncode}: {stderr.strip() or 'no result'}")
+
+    def close(self, wait: bool = True):
+        """Waits for queued runs (unless wait=False) and stops the arbiter's backends."""
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+        if self._arbiter is not None:
+            self._arbiter.close()
+
+
+_shared_executors: dict = {}
+_shared_lock = threading.Lock()
+
+
+def get_agent_executor(db_path: Optional[Path] = None) -> AgentExecutor:
+    """Returns the process-wide AgentExecutor for `db_path`, creating it on first use."""
+    key = str(Path(db_path or DEFAULT_DB_PATH).resolve())
+    with _shared_lock:
+        executor = _shared_executors.get(key)
+        if executor is None:
+            executor = _shared_executors[key] = AgentExecutor(db_path=db_path)
+        return executor
+
+
+def execute_agent(agent_name: str, input_data: str, db_path: Optional[Path] = None) -> dict:
+    """Runs one agent with the shared executor and returns its result dict."""
+    return get_agent_executor(db_path).run(agent_name, input_data)
@@ -0,0 +1,190 @@
+# reliakit/circuit_breaker.py
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitBreaker:
+    """
+    Per-backend circuit breaker driven by a rolling window of call outcomes.
+
+    CLOSED: calls flow; the breaker opens when, over the last `window_seconds`, at least
+    `min_calls` were made and the failure rate reaches `failure_threshold`. A slow success
+    counts as `slow_call_weight` of a failure; the weight must stay below the threshold, so
+    a backend that answers every call, however slowly, is never cut off. OPEN: calls are refused until the cool-down ends. HALF_OPEN: one
+    probe call is let through; success closes the breaker, failure re-opens it with a
+    doubled cool-down (up to `max_open_seconds`).
+
+    With a `store` (a MemoryDB), state changes are written to its backend_health table and
+    other processes' changes are picked up every `sync_interval` seconds, so one process
+    discovering an outage spares the others the timeout.
+    """
+
+    def __init__(self, name: str, store=None, window_seconds: float = 60.0, min_calls: int = 5,
+                 failure_threshold: float = 0.5, slow_call_seconds: Optional[float] = None,
+                 slow_call_weight: float = 0.25, open_seconds: float = 30.0, max_open_seconds: float = 300.0, sync_interval: float = 2.0):
+        self.name = name
+        self.store = store
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        if slow_call_weight >= failure_threshold:
+            raise ValueError("slow_call_weight must be below failure_threshold")
+        self.slow_call_weight = slow_call_weight
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.sync_interval = sync_interval
+        self.state = CLOSED
+        self.open_seconds = open_seconds
+        self.opened_until = 0.0  # wall-clock seconds, comparable across processes
+        self.updated_at = 0.0
+        self._outcomes = deque(maxlen=512)  # (time, ok, latency, slow)
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+
+    # --- decisions ---
+
+    def allow_request(self) -> bool:
+        """True if a call may be made now. In HALF_OPEN only one probe is allowed at a time."""
+        self.sync()
+        with self._lock:
+            now = time.time()
+            if self.state == OPEN and now >= self.opened_until:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            # A probe whose outcome was never reported stops blocking after one cool-down.
+            if self.state == HALF_OPEN and (not self._probe_in_flight or now - self._probe_started > self.base_open_seconds):
+                self._probe_in_flight = True
+                self._probe_started = now
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until an OPEN breaker will let a probe through (0 if not open)."""
+        with self._lock:
+            return max(0.0, self.opened_until - time.time()) if self.state == OPEN else 0.0
+
+    # --- outcomes ---
+
+    def record_success(self, latency: float, slow: Optional[bool] = None):
+        """
+        `slow` says whether the call was slow by the caller's current timeout; if omitted,
+        latency is compared with `slow_call_seconds`.
+        """
+        if slow is None:
+            slow = self.slow_call_seconds is not None and latency > self.slow_call_seconds
+        with self._lock:
+            self._outcomes.append((time.time(), True, latency, slow))
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                self.open_seconds = self.base_open_seconds
+                self._outcomes.clear()  # Start the recovered backend with a clean window
+                self._outcomes.append((time.time(), True, latency, slow))
+                self._transition(CLOSED)
+            elif self.state == CLOSED and self._should_open():
+                self._open()
+
+    def record_failure(self):
+        with self._lock:
+            self._outcomes.append((time.time(), False, None, False))
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                self.open_seconds = min(self.open_seconds * 2, self.max_open_seconds)
+                self._open()
+            elif self.state == CLOSED and self._should_open():
+                self._open()
+
+    def record_cancelled(self):
+        """The call was abandoned (e.g. it lost a hedge); it says nothing about health."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    # --- scoring ---
+
+    def _window(self) -> list:
+        cutoff = time.time() - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+        return list(self._outcomes)
+
+    def _failure_score(self, outcomes: list) -> float:
+        score = 0.0
+        for _, ok, _, slow in outcomes:
+            if not ok:
+                score += 1.0
+            elif slow:
+                score += self.slow_call_weight
+        return score / len(outcomes) if outcomes else 0.0
+
+    def _should_open(self) -> bool:
+        outcomes = self._window()
+        return len(outcomes) >= self.min_calls and self._failure_score(outcomes) >= self.failure_threshold
+
+    def health(self) -> dict:
+        """Returns state, failure rate, median latency and a 0..1 health score."""
+        self.sync()
+        with self._lock:
+            outcomes = self._window()
+            latencies = sorted(l for _, ok, l, _ in outcomes if ok)
+            failure_score = self._failure_score(outcomes)
+            score = 0.0 if self.state == OPEN else 1.0 - failure_score
+            return {
+                "backend": self.name,
+                "state": self.state,
+                "calls": len(outcomes),
+                "failure_rate": round(failure_score, 3),
+                "p50_latency": latencies[len(latencies) // 2] if latencies else None,
+                "health_score": round(score, 3),
+                "retry_after": max(0.0, self.opened_until - time.time()) if self.state == OPEN else 0.0,
+            }
+
+    # --- state changes (caller holds the lock) ---
+
+    def _open(self):
+        self.opened_until = time.time() + self.open_seconds
+        self._transition(OPEN)
+
+    def _transition(self, state: str):
+        if state != self.state:
+            print(f"Circuit for {self.name}: {self.state} -> {state}")
+        self.state = state
+        self.updated_at = time.time()
+        if self.store is not None:
+            try:
+                self.store.put_backend_health(self.name, self.state, self.opened_until, self.open_seconds,
+                                              self.updated_at)
+            except Exception as e:
+                print(f"Error persisting health for {self.name}: {e}")
+
+    def sync(self):
+        """Adopts a newer state written by another process (at most every `sync_interval`)."""
+        if self.store is None or time.monotonic() - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = time.monotonic()
+        try:
+            row = self.store.get_backend_health(self.name)
+        except Exception as e:
+            print(f"Error reading health for {self.name}: {e}")
+            return
+        with self._lock:
+            if row is None or row["updated_at"] <= self.updated_at:
+                return
+            self.state = row["state"]
+            self.opened_until = row["opened_until"]
+            self.open_seconds = row["open_seconds"]
+            self.updated_at = row["updated_at"]
+            # A probe another process started recently is still its to finish.
+            self._probe_in_flight = self.state == HALF_OPEN
+            self._probe_started = self.updated_at
+            if self.state == CLOSED:
+                self._outcomes.clear()
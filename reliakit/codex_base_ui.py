@@ -3,18 +3,30 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext
 from pathlib import Path
 import json
-from reliakit.memory_db import MemoryDB # Import MemoryDB
-# from reliakit.model_arbiter import ModelArbiter # Uncomment when ModelArbiter is ready
-import subprocess # For running agents
+from reliakit.memory_db import get_memory_db
+from reliakit.agent_executor import get_agent_executor
+from reliakit.model_backends import CancelToken
+from reliakit.tk_tasks import TkTaskRunner
+from reliakit.memory_viewer import MemoryViewer
+from reliakit.heal_engine import HealEngine
+from reliakit.loop_guardian import BLOCKED
+
+MEMORY_REFRESH_MS = 5000 # How often the Memory Viewer checks for new log entries
 
 class CodexBaseUI:
     def __init__(self, root, db_path: Path):
         self.root = root
         self.root.title("ReliaKit Autonomous Dashboard")
         self.db_path = db_path
-        self.memory_db = MemoryDB(db_path=self.db_path) # Initialize MemoryDB
+        self.memory_db = get_memory_db(self.db_path) # Shared, pooled MemoryDB
         self.available_agents = self._load_available_agents() # Load agents from JSONL
+        self.executor = get_agent_executor(self.db_path) # Runs agents in-process on a shared pool
+        self.heal_engine = HealEngine(self.memory_db, self.executor) # Deduplicated retries with backoff
+        # Database reads and agent runs happen on worker threads; the Tk thread only renders.
+        self.tasks = TkTaskRunner(self.root, on_change=self._show_in_flight)
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
+        self._create_status_bar()
         self._create_notebook()
         self._create_main_tab()
         self._create_memory_tab()
@@ -85,59 +97,114 @@ class CodexBaseUI:
             self._log_output("Error: Agent name and input cannot be empty.", "red")
             return
 
-        try:
-            # Use subprocess to call gui_launcher.py with --execute flag
-            # This simulates the agent execution and logs to the DB
-            command = [
-                "python3",
-                str(Path(__file__).resolve().parent.parent / "gui_launcher.py"),
-                "--execute", agent,
-                "--input", input_text
-            ]
-            result = subprocess.run(command, capture_output=True, text=True, check=False)
-
-            if result.returncode == 0:
-                self._log_output(f"Agent '{agent}' execution command successful.", "green")
-                self._log_output(result.stdout)
-            else:
-                self._log_output(f"Agent '{agent}' execution command failed (Exit Code: {result.returncode}).", "red")
-                self._log_output("STDOUT:\n" + result.stdout, "red")
-                self._log_output("STDERR:\n" + result.stderr, "red")
-            
-            # Refresh memory viewer after execution attempt
-            self._load_memory_snapshots()
-
-        except FileNotFoundError:
-            self._log_output(f"Error: Python or gui_launcher.py not found. Check your PATH and script location.", "red")
-        except Exception as e:
-            self._log_output(f"An unexpected error occurred during agent execution: {e}", "red")
+        # The model answers on a worker thread; its output is shown as it is generated.
+        cancel = CancelToken()
+        self.tasks.submit(self._stream_agent, agent, input_text, cancel, name=f"Run {agent}", cancel=cancel,
+                          on_done=lambda stream: self._agent_finished(agent, stream),
+                          on_error=lambda e: self._log_output(f"An unexpected error occurred during agent execution: {e}", "red"))
+
+    def _stream_agent(self, agent: str, prompt: str, cancel: CancelToken):
+        """Worker thread: posts output chunks to the Tk thread as they arrive and returns the finished stream."""
+        stream = self.executor.stream(agent, prompt, cancel=cancel)
+        for chunk in stream:
+            self.tasks.post(self._append_output, chunk)
+        self.memory_db.flush() # So the Memory Viewer shows the row right away
+        return stream
+
+    def _agent_finished(self, agent: str, stream):
+        self._append_output("\n")
+        ttft = f"{stream.ttft:.2f}s" if stream.ttft is not None else "n/a"
+        color = "red" if stream.status in ("ERROR", BLOCKED) else "green"
+        self._log_output(f"Agent '{agent}' finished: {stream.status} via {stream.model_used} "
+                         f"(first output {ttft}, total {stream.duration:.2f}s).", color)
+        self._refresh_memory()
+
+    def _append_output(self, text: str):
+        self.output_log.config(state='normal')
+        self.output_log.insert(tk.END, text)
+        self.output_log.see(tk.END)
+        self.output_log.config(state='disabled')
 
     def _auto_heal_agents(self):
         self._log_output("Initiating auto-healing process...", "blue")
-        # Placeholder for auto-healing logic
-        # In a real scenario, this would query the DB for "FAILURE" status logs,
-        # and attempt to re-run or apply corrective actions.
-        failed_logs = [log for log in self.memory_db.get_all_llm_logs() if log.get('status') == 'ERROR'] # Assuming 'ERROR' for failed
-        
-        if not failed_logs:
+        cancel = CancelToken()
+        self.tasks.submit(self._heal_failed_runs, cancel, name="Auto-heal", cancel=cancel,
+                          on_done=self._heal_finished,
+                          on_error=lambda e: self._log_output(f"Auto-healing failed: {e}", "red"))
+
+    def _heal_failed_runs(self, cancel: CancelToken) -> dict:
+        """
+        Worker thread: retries each failed (agent, prompt) pair that has not been answered
+        since (see HealEngine), posting progress to the Tk thread as pairs are settled.
+        Cancelling stops further attempts.
+        """
+        candidates = self.heal_engine.find_candidates()
+        if not candidates:
+            return {"healed": 0, "failed": 0, "cancelled": 0}
+
+        failures = sum(candidate['failures'] for candidate in candidates)
+        self.tasks.post(self._log_output, f"Found {failures} failed agent executions ({len(candidates)} distinct prompts). "
+                                          f"Attempting to re-run...", "blue")
+        for candidate in candidates:
+            self.tasks.post(self._log_output, f"Re-running failed agent: {candidate['agent_name']} "
+                                              f"(Prompt: {(candidate['prompt'] or '')[:50]}...)", "orange")
+
+        def report(candidate, result, attempts):
+            if cancel.cancelled:
+                return
+            color = "red" if result['status'] in ("ERROR", BLOCKED) else "blue"
+            self.tasks.post(self._log_output, f"Re-run of {candidate['agent_name']} (log #{candidate['id']}) "
+                                              f"completed after {attempts} attempt(s): {result['status']}.", color)
+
+        summary = self.heal_engine.heal(candidates, cancel=cancel, on_result=report)
+        self.memory_db.flush()
+        return summary
+
+    def _heal_finished(self, summary: dict):
+        if not any(summary.values()):
             self._log_output("No failed agent executions found to heal.", "green")
             return
-
-        self._log_output(f"Found {len(failed_logs)} failed agent executions. Attempting to re-run...", "blue")
-        for i, log in enumerate(failed_logs):
-            self._log_output(f"Re-running failed agent: {log['agent_name']} (Prompt: {log['prompt'][:50]}...)", "orange")
-            # Simulate re-running the agent
-            command = [
-                "python3",
-                str(Path(__file__).resolve().parent.parent / "gui_launcher.py"),
-                "--execute", log['agent_name'],
-                "--input", log['prompt']
-            ]
-            subprocess.run(command, capture_output=True, text=True, check=False) # Run without capturing output here for simplicity
-            self._log_output(f"Re-run attempt {i+1} for {log['agent_name']} completed. Check memory tab for new status.", "blue")
-        
-        self._log_output("Auto-healing process finished. Refreshing memory view.", "green")
-        self._load_memory_snapshots() # Refresh after healing attempts
+        self._log_output(f"Auto-healing process finished ({summary['healed']} healed, {summary['failed']} still failing). "
+                         f"Refreshing memory view.", "green")
+        self._refresh_memory() # Refresh after healing attempts
+
+    def _create_status_bar(self):
+        """Busy indicator for in-flight background work, with a button that cancels it."""
+        status_bar = ttk.Frame(self.root, padding=(10, 0, 10, 5))
+        status_bar.pack(side="bottom", fill="x")
+        self.busy_bar = ttk.Progressbar(status_bar, mode='indeterminate', length=120)
+        self.busy_bar.pack(side="left")
+        self.busy_label = ttk.Label(status_bar, text="Idle")
+        self.busy_label.pack(side="left", padx=10)
+        self.cancel_button = ttk.Button(status_bar, text="Cancel", command=self._cancel_tasks, state='disabled')
+        self.cancel_button.pack(side="right")
+        self._busy = False
+
+    def _show_in_flight(self, tasks: list):
+        """TkTaskRunner on_change hook: keeps the status bar in step with the running tasks."""
+        if not tasks:
+            self.busy_bar.stop()
+            self._busy = False
+            self.busy_label.config(text="Idle")
+            self.cancel_button.state(['disabled'])
+            return
+        names = ", ".join(task.name for task in tasks[:3])
+        if len(tasks) > 3:
+            names += f" (+{len(tasks) - 3} more)"
+        self.busy_label.config(text=f"Running: {names}")
+        self.cancel_button.state(['!disabled'])
+        if not self._busy:
+            self.busy_bar.start(15)
+            self._busy = True
+
+    def _cancel_tasks(self):
+        for task in self.tasks.in_flight:
+            self._log_output(f"\nCancelled: {task.name}.", "orange")
+        self.tasks.cancel_all()
+
+    def _on_close(self):
+        self.tasks.close()
+        self.root.destroy()
 
     def _log_output(self, message, color="white"):
         self.output_log.config(state='normal')
@@ -153,38 +220,16 @@ class CodexBaseUI:
         self.tab_memory = ttk.Frame(self.notebook, padding="10")
         self.notebook.add(self.tab_memory, text="Memory Viewer")
 
-        self.memory_text = scrolledtext.ScrolledText(self.tab_memory, wrap=tk.WORD, height=20, state='disabled')
-        self.memory_text.pack(fill="both", expand=True, pady=5)
-
-        self._load_memory_snapshots()
-
-    def _load_memory_snapshots(self):
-        self.memory_text.config(state='normal')
-        self.memory_text.delete(1.0, tk.END)
-        
-        logs = self.memory_db.get_all_llm_logs()
-        if not logs:
-            self.memory_text.insert(tk.END, "No memory snapshots found yet.\n")
-        else:
-            for log in logs:
-                timestamp = log.get('timestamp', 'N/A')
-                agent_name = log.get('agent_name', 'N/A')
-                model_used = log.get('model_used', 'N/A')
-                prompt = log.get('prompt', 'N/A')
-                response = log.get('response', 'N/A')
-                status = log.get('status', 'N/A')
-
-                self.memory_text.insert(tk.END, f"[{timestamp}] Agent: {agent_name}, Model: {model_used}\n")
-                self.memory_text.insert(tk.END, f"  Prompt: {prompt}\n")
-                self.memory_text.insert(tk.END, f"  Response: {response}\n")
-                self.memory_text.insert(tk.END, f"  Status: {status}\n\n")
-        
-        self.memory_text.config(state='disabled')
-        self.memory_text.see(tk.END)
+        # Pages through llm_log on worker threads; only a bounded window of rows is rendered.
+        self.memory_viewer = MemoryViewer(self.tab_memory, self.memory_db, self.tasks, self.available_agents)
+
+    def _refresh_memory(self):
+        """Shows log rows committed since the last refresh (the query runs on a worker thread)."""
+        self.memory_viewer.refresh()
 
     def _auto_refresh_memory(self):
-        self._load_memory_snapshots()
-        self.root.after(5000, self._auto_refresh_memory) # Refresh every 5 seconds
+        self._refresh_memory()
+        self.root.after(MEMORY_REFRESH_MS, self._auto_refresh_memory) # Refresh every 5 seconds
 
     def _create_visualization_tabs(self):
         # Memory Glyphs Tab
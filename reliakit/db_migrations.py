@@ -0,0 +1,344 @@
+# reliakit/db_migrations.py
+import hashlib
+import sqlite3
+from datetime import datetime
+
+# Schema versions are tracked in SQLite's PRAGMA user_version. Each migration
+# brings the database from version N-1 to N and must be safe to re-run, since
+# another process may have applied part of it before crashing.
+
+BACKFILL_CHUNK_SIZE = 5000
+
+
+def _iso_to_us(value) -> int:
+    """Converts a stored ISO timestamp (local time, as written by datetime.now()) to epoch microseconds."""
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1_000_000)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _migration_1_create_llm_log(pool, chunk_size: int):
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                agent_name TEXT NOT NULL,
+                model_used TEXT NOT NULL,
+                prompt TEXT,
+                response TEXT,
+                status TEXT
+            )
+        ''')
+
+
+def _migration_2_add_ts_us(pool, chunk_size: int):
+    """Adds the integer epoch-microsecond column and backfills it in short transactions."""
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if "ts_us" not in _columns(conn, "llm_log"):
+            conn.execute("ALTER TABLE llm_log ADD COLUMN ts_us INTEGER")
+
+    last_id = 0
+    while True:
+        with pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT id, timestamp FROM llm_log WHERE id > ? AND ts_us IS NULL ORDER BY id LIMIT ?",
+                (last_id, chunk_size),
+            ).fetchall()
+            if not rows:
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE llm_log SET ts_us = ? WHERE id = ? AND ts_us IS NULL",
+                [(_iso_to_us(row[1]), row[0]) for row in rows],
+            )
+        last_id = rows[-1][0]
+
+
+def _migration_3_index_llm_log(pool, chunk_size: int):
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_log_ts ON llm_log (ts_us)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_log_agent_ts ON llm_log (agent_name, ts_us)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_log_status_ts ON llm_log (status, ts_us)")
+
+
+def _migration_4_create_prompt_cache(pool, chunk_size: int):
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS prompt_cache (
+                cache_key TEXT PRIMARY KEY,
+                agent_name TEXT NOT NULL,
+                model_used TEXT NOT NULL,
+                response TEXT NOT NULL,
+                status TEXT NOT NULL,
+                expires_us INTEGER NOT NULL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_prompt_cache_expires ON prompt_cache (expires_us)")
+
+
+def _migration_5_create_backend_health(pool, chunk_size: int):
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS backend_health (
+                backend TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                opened_until REAL NOT NULL,
+                open_seconds REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+
+
+def _migration_6_add_token_counts(pool, chunk_size: int):
+    """Token counts per row let rate-limit budgets be rebuilt after a restart."""
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        columns = _columns(conn, "llm_log")
+        if "prompt_tokens" not in columns:
+            conn.execute("ALTER TABLE llm_log ADD COLUMN prompt_tokens INTEGER NOT NULL DEFAULT 0")
+        if "response_tokens" not in columns:
+            conn.execute("ALTER TABLE llm_log ADD COLUMN response_tokens INTEGER NOT NULL DEFAULT 0")
+
+
+def _migration_7_add_duration(pool, chunk_size: int):
+    """Per-row latency feeds the arbiter's adaptive timeouts; NULL on older rows."""
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if "duration_ms" not in _columns(conn, "llm_log"):
+            conn.execute("ALTER TABLE llm_log ADD COLUMN duration_ms INTEGER")
+
+
+def _migration_8_index_llm_log_by_id(pool, chunk_size: int):
+    """Filtered keyset pages (ORDER BY id) walk these instead of sorting every matching row."""
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_log_agent_id ON llm_log (agent_name, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_log_status_id ON llm_log (status, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_log_model_id ON llm_log (model_used, id)")
+
+
+# Per-agent/model/status activity at minute and hour granularity, kept up to date by a
+# trigger on llm_log so windowed statistics read a few buckets instead of raw rows.
+ROLLUP_TABLES = {
+    "llm_log_rollup_minute": 60_000_000,
+    "llm_log_rollup_hour": 3_600_000_000,
+}
+_ROLLUP_UPSERT = """
+    ON CONFLICT (bucket_us, agent_name, model_used, status) DO UPDATE SET
+        calls = calls + excluded.calls,
+        prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+        response_tokens = response_tokens + excluded.response_tokens,
+        duration_ms = duration_ms + excluded.duration_ms,
+        timed_calls = timed_calls + excluded.timed_calls
+"""
+
+
+def _migration_9_create_rollups(pool, chunk_size: int):
+    """
+    Creates the rollup tables and the trigger that maintains them, then folds in the
+    rows that predate the trigger. The trigger and the backfill boundary are set in one
+    transaction, and backfill progress commits with each chunk, so no row is counted
+    twice or missed even if the migration is interrupted.
+    """
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS migration_progress (
+                migration INTEGER PRIMARY KEY,
+                last_id INTEGER NOT NULL,
+                end_id INTEGER NOT NULL
+            )
+        ''')
+        for table in ROLLUP_TABLES:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    bucket_us INTEGER NOT NULL,
+                    agent_name TEXT NOT NULL,
+                    model_used TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    calls INTEGER NOT NULL,
+                    prompt_tokens INTEGER NOT NULL,
+                    response_tokens INTEGER NOT NULL,
+                    duration_ms INTEGER NOT NULL,
+                    timed_calls INTEGER NOT NULL,
+                    PRIMARY KEY (bucket_us, agent_name, model_used, status)
+                ) WITHOUT ROWID
+            ''')
+        inserts = "".join(
+            f"""
+            INSERT INTO {table} VALUES (NEW.ts_us / {width} * {width}, NEW.agent_name, NEW.model_used,
+                COALESCE(NEW.status, ''), 1, NEW.prompt_tokens, NEW.response_tokens,
+                COALESCE(NEW.duration_ms, 0), NEW.duration_ms IS NOT NULL)
+            {_ROLLUP_UPSERT};"""
+            for table, width in ROLLUP_TABLES.items()
+        )
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS llm_log_rollup AFTER INSERT ON llm_log
+            WHEN NEW.ts_us IS NOT NULL
+            BEGIN {inserts}
+            END
+        """)
+        conn.execute(
+            "INSERT OR IGNORE INTO migration_progress VALUES (9, 0, (SELECT COALESCE(MAX(id), 0) FROM llm_log))"
+        )
+
+    while True:
+        with pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            last_id, end_id = conn.execute(
+                "SELECT last_id, end_id FROM migration_progress WHERE migration = 9"
+            ).fetchone()
+            if last_id >= end_id:
+                return
+            upper = min(last_id + chunk_size, end_id)
+            for table, width in ROLLUP_TABLES.items():
+                conn.execute(f"""
+                    INSERT INTO {table}
+                    SELECT ts_us / {width} * {width}, agent_name, model_used, COALESCE(status, ''), COUNT(*),
+                           SUM(prompt_tokens), SUM(response_tokens), COALESCE(SUM(duration_ms), 0), COUNT(duration_ms)
+                    FROM llm_log WHERE id > ? AND id <= ? AND ts_us IS NOT NULL
+                    GROUP BY 1, 2, 3, 4
+                    {_ROLLUP_UPSERT}
+                """, (last_id, upper))
+            conn.execute("UPDATE migration_progress SET last_id = ? WHERE migration = 9", (upper,))
+
+
+def _migration_10_create_meta_checkpoint(pool, chunk_size: int):
+    """Meta-loop restart state: its llm_log watermark and aggregates, and its triggered agents."""
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS meta_checkpoint (
+                name TEXT PRIMARY KEY,
+                watermark INTEGER NOT NULL,
+                aggregates TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        # One row per triggering log entry (so an entry can never trigger twice): PENDING
+        # until claimed for dispatch, DISPATCHED while the run lasts, then DONE.
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS meta_trigger (
+                log_id INTEGER PRIMARY KEY,
+                checkpoint TEXT NOT NULL,
+                rule TEXT NOT NULL,
+                agent_name TEXT NOT NULL,
+                input TEXT NOT NULL,
+                state TEXT NOT NULL,
+                claimed_at REAL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_meta_trigger_checkpoint ON meta_trigger (checkpoint, state)")
+
+
+def prompt_hash(prompt) -> str:
+    """Short digest of a prompt, stored in llm_log.prompt_hash so repeats of a prompt are found by index."""
+    return hashlib.sha256((prompt or "").encode()).hexdigest()[:16]
+
+
+def _migration_11_add_heal_columns(pool, chunk_size: int):
+    """
+    Adds llm_log.prompt_hash, so repeats of a prompt are found by index, and
+    llm_log.heal_of, the id of the failed entry a retry was run for. The hash is
+    backfilled in short transactions.
+    """
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        columns = _columns(conn, "llm_log")
+        if "prompt_hash" not in columns:
+            conn.execute("ALTER TABLE llm_log ADD COLUMN prompt_hash TEXT")
+        if "heal_of" not in columns:
+            conn.execute("ALTER TABLE llm_log ADD COLUMN heal_of INTEGER")
+
+    last_id = 0
+    while True:
+        with pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT id, prompt FROM llm_log WHERE id > ? AND prompt_hash IS NULL ORDER BY id LIMIT ?",
+                (last_id, chunk_size),
+            ).fetchall()
+            if not rows:
+                break
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE llm_log SET prompt_hash = ? WHERE id = ? AND prompt_hash IS NULL",
+                [(prompt_hash(row[1]), row[0]) for row in rows],
+            )
+        last_id = rows[-1][0]
+
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_log_agent_prompt ON llm_log (agent_name, prompt_hash, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_log_heal_of ON llm_log (heal_of) WHERE heal_of IS NOT NULL")
+
+
+def _migration_12_create_agent_guard(pool, chunk_size: int):
+    """LoopGuardian verdicts: agents throttled or paused until `until` (epoch seconds)."""
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS agent_guard (
+                agent_name TEXT PRIMARY KEY,
+                action TEXT NOT NULL,
+                reason TEXT NOT NULL,
+                min_interval REAL NOT NULL,
+                until REAL NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+
+
+MIGRATIONS = [
+    (1, "create llm_log", _migration_1_create_llm_log),
+    (2, "add llm_log.ts_us and backfill", _migration_2_add_ts_us),
+    (3, "index llm_log by time, agent and status", _migration_3_index_llm_log),
+    (4, "create prompt_cache", _migration_4_create_prompt_cache),
+    (5, "create backend_health", _migration_5_create_backend_health),
+    (6, "add llm_log token counts", _migration_6_add_token_counts),
+    (7, "add llm_log.duration_ms", _migration_7_add_duration),
+    (8, "index llm_log by agent, status and model for keyset pages", _migration_8_index_llm_log_by_id),
+    (9, "create llm_log minute/hour rollups and backfill", _migration_9_create_rollups),
+    (10, "create meta_checkpoint and meta_trigger", _migration_10_create_meta_checkpoint),
+    (11, "add llm_log.prompt_hash and heal_of, backfill and index", _migration_11_add_heal_columns),
+    (12, "create agent_guard", _migration_12_create_agent_guard),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(pool) -> int:
+    with pool.connection() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(pool, chunk_size: int = BACKFILL_CHUNK_SIZE, verbose: bool = False) -> int:
+    """
+    Applies every pending migration in order and returns the resulting schema version.
+    `pool` is anything with a `connection()` context manager, e.g. a ConnectionPool.
+    """
+    version = get_schema_version(pool)
+    for target, name, apply in MIGRATIONS:
+        if target <= version:
+            continue
+        if verbose:
+            print(f"Applying migration {target}: {name}...")
+        apply(pool, chunk_size)
+        with pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Another process may have finished this step first; never move backwards.
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            if current < target:
+                conn.execute(f"PRAGMA user_version = {target}")
+        version = target
+    return version
@@ -0,0 +1,100 @@
+# reliakit/heal_engine.py
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional
+from reliakit.model_arbiter import CANCELLED
+from reliakit.model_backends import CancelToken
+from reliakit.loop_guardian import BLOCKED
+
+
+class HealEngine:
+    """
+    Re-runs failed agent executions. Candidates come from MemoryDB.get_heal_candidates:
+    one per failed (agent, prompt) pair however often it failed, leaving out pairs that a
+    later run already answered. Each pair is retried up to `max_attempts` times, waiting
+    `base_delay` * 2^(n-1) seconds (with jitter, capped at `max_delay`) after the n-th
+    failed attempt. Up to `max_workers` pairs are healed concurrently, with at most
+    `per_agent` runs of any one agent at a time. Every attempt is logged with heal_of set
+    to the failed entry's id. An agent the LoopGuardian has blocked is not retried.
+    """
+
+    def __init__(self, memory_db, executor, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                 per_agent: int = 2, max_workers: int = 8):
+        self.memory_db = memory_db
+        self.executor = executor
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.per_agent = per_agent
+        self.max_workers = max_workers
+        self._agent_slots = {}
+        self._slots_lock = threading.Lock()
+
+    def find_candidates(self, since=None, limit: Optional[int] = None) -> list[dict]:
+        return self.memory_db.get_heal_candidates(since=since, limit=limit)
+
+    def heal(self, candidates: list[dict], cancel: Optional[CancelToken] = None, on_result=None) -> dict:
+        """
+        Heals `candidates` and returns {"healed", "failed", "cancelled"} counts.
+        `on_result(candidate, result, attempts)` is called from a worker thread as each
+        pair is settled. Cancelling stops further attempts and kills the runs in progress;
+        pairs stopped that way count as cancelled unless an earlier attempt had finished.
+        """
+        cancel = cancel or CancelToken()
+        summary = {"healed": 0, "failed": 0, "cancelled": 0}
+        if not candidates:
+            return summary
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="heal") as pool:
+            futures = {pool.submit(self._heal_one, candidate, cancel): candidate for candidate in candidates}
+            for future in as_completed(futures):
+                result, attempts = future.result()
+                if result is None:
+                    summary["cancelled"] += 1
+                    continue
+                summary["failed" if result["status"] in ("ERROR", BLOCKED) else "healed"] += 1
+                if on_result is not None:
+                    on_result(futures[future], result, attempts)
+        return summary
+
+    def _heal_one(self, candidate: dict, cancel: CancelToken) -> tuple:
+        """Retries one failed pair with backoff; returns (last result or None if cancelled first, attempts)."""
+        woken = threading.Event()
+        unlink = cancel.on_cancel(woken.set)
+        try:
+            return self._attempt(candidate, cancel, woken)
+        finally:
+            unlink()
+
+    def _attempt(self, candidate: dict, cancel: CancelToken, woken: threading.Event) -> tuple:
+        result = None
+        for attempt in range(1, self.max_attempts + 1):
+            if attempt > 1:
+                delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 2)) * random.uniform(0.5, 1.0)
+                if woken.wait(delay):
+                    return result, attempt - 1
+            slot = self._agent_slot(candidate["agent_name"])
+            while not slot.acquire(timeout=0.5):
+                if cancel.cancelled:
+                    return result, attempt - 1
+            try:
+                if cancel.cancelled:
+                    return result, attempt - 1
+                with cancel.linked() as run_cancel: # One token per run, detached once it ends
+                    latest = self.executor.run(candidate["agent_name"], candidate["prompt"] or "", run_cancel,
+                                               heal_of=candidate["id"])
+            finally:
+                slot.release()
+            if latest["status"] == CANCELLED:
+                return result, attempt - 1
+            result = latest
+            if result["status"] != "ERROR":
+                break
+        return result, attempt
+
+    def _agent_slot(self, agent_name: str) -> threading.BoundedSemaphore:
+        with self._slots_lock:
+            slot = self._agent_slots.get(agent_name)
+            if slot is None:
+                slot = self._agent_slots[agent_name] = threading.BoundedSemaphore(self.per_agent)
+            return slot
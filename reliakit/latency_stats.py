@@ -0,0 +1,112 @@
+# reliakit/latency_stats.py
+import math
+import threading
+from typing import Optional
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class LatencyHistogram:
+    """
+    HDR-style streaming histogram: latencies fall into logarithmic buckets `precision`
+    wide (5% by default), so any percentile is within that relative error in O(buckets)
+    memory. Once `max_samples` have been recorded all counts are halved, which keeps the
+    distribution weighted towards recent calls.
+    """
+
+    def __init__(self, precision: float = 0.05, max_samples: int = 2000):
+        self._log_base = math.log1p(precision)
+        self.max_samples = max_samples
+        self._counts = {}  # bucket index -> count
+        self.count = 0
+
+    def record(self, seconds: float):
+        ms = max(seconds * 1000.0, 1.0)
+        index = math.ceil(math.log(ms) / self._log_base)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        if self.count >= self.max_samples:
+            self._counts = {i: c // 2 for i, c in self._counts.items() if c // 2}
+            self.count = sum(self._counts.values())
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Returns the q-quantile (0..1) in seconds, or None if nothing was recorded."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                return math.exp(index * self._log_base) / 1000.0
+        return math.exp(max(self._counts) * self._log_base) / 1000.0
+
+
+class LatencyTracker:
+    """
+    Latency histograms per backend and per (backend, agent), and the timeouts derived
+    from them: p99 x `factor`, clamped to [floor, ceiling]. The per-agent histogram is
+    used once it has `min_samples`, then the backend's; with neither, the caller's default.
+    """
+
+    def __init__(self, factor: float = 3.0, floor: float = 5.0, ceiling: float = 120.0, min_samples: int = 20,
+                 quantile: float = 0.99):
+        self.factor = factor
+        self.floor = floor
+        self.ceiling = ceiling
+        self.min_samples = min_samples
+        self.quantile = quantile
+        self._histograms = {}  # (backend, agent or None) -> LatencyHistogram
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows, **kwargs) -> "LatencyTracker":
+        """Builds a tracker from llm_log rows with model_used, agent_name and duration_ms."""
+        tracker = cls(**kwargs)
+        for row in rows:
+            tracker.record(row["model_used"], row["agent_name"], row["duration_ms"] / 1000.0)
+        return tracker
+
+    def record(self, backend: str, agent_name: Optional[str], seconds: float):
+        with self._lock:
+            for key in ((backend, None), (backend, agent_name)) if agent_name else ((backend, None),):
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = LatencyHistogram()
+                histogram.record(seconds)
+
+    def _histogram(self, backend: str, agent_name: Optional[str]) -> Optional[LatencyHistogram]:
+        """The most specific histogram with enough samples. Caller holds the lock."""
+        for key in ((backend, agent_name), (backend, None)):
+            histogram = self._histograms.get(key)
+            if histogram is not None and histogram.count >= self.min_samples:
+                return histogram
+        return None
+
+    def percentile(self, backend: str, q: float, agent_name: Optional[str] = None) -> Optional[float]:
+        """The q-quantile latency in seconds, or None while there are too few samples."""
+        with self._lock:
+            histogram = self._histogram(backend, agent_name)
+            return histogram.percentile(q) if histogram is not None else None
+
+    def timeout(self, backend: str, default: float, agent_name: Optional[str] = None) -> float:
+        """The timeout for the next call to `backend`; `default` until enough calls were seen."""
+        observed = self.percentile(backend, self.quantile, agent_name)
+        if observed is None:
+            return default
+        return min(self.ceiling, max(self.floor, observed * self.factor))
+
+    def table(self) -> list:
+        """Percentiles and the derived timeout per backend and per agent, for dashboards."""
+        with self._lock:
+            items = sorted(self._histograms.items(), key=lambda item: (item[0][0], item[0][1] or ""))
+            rows = []
+            for (backend, agent_name), histogram in items:
+                row = {"backend": backend, "agent_name": agent_name, "count": histogram.count}
+                for q in PERCENTILES:
+                    value = histogram.percentile(q)
+                    row[f"p{int(q * 100)}"] = round(value, 3) if value is not None else None
+                p = histogram.percentile(self.quantile) if histogram.count >= self.min_samples else None
+                row["timeout"] = round(min(self.ceiling, max(self.floor, p * self.factor)), 2) if p else None
+                rows.append(row)
+            return rows
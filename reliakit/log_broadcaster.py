@@ -0,0 +1,98 @@
+# reliakit/log_broadcaster.py
+import queue
+import threading
+import time
+from typing import Optional
+from reliakit.memory_db import MemoryDB, LogChangeFeed
+
+
+class Subscription:
+    """One client's view of the broadcast: a bounded queue of (rows, stats) batches."""
+
+    def __init__(self, max_pending: int):
+        self.queue = queue.Queue(maxsize=max_pending)
+        # Set when the client fell too far behind and was dropped; it should reconnect and resume.
+        self.dropped = False
+
+    def get(self, timeout: float):
+        """Returns the next (rows, stats) batch, or None if nothing arrived within `timeout`."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LogBroadcaster:
+    """
+    Watches llm_log from a single thread and fans new rows out to every subscriber,
+    so N connected clients cost one change probe per tick instead of N table queries.
+    """
+
+    def __init__(self, db: MemoryDB, poll_interval: float = 0.5, max_clients: int = 50, max_pending: int = 256):
+        self.db = db
+        self.poll_interval = poll_interval
+        self.max_clients = max_clients
+        self.max_pending = max_pending
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = None
+
+    def subscribe(self) -> Optional[Subscription]:
+        """Registers a client; returns None when `max_clients` are already connected."""
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            sub = Subscription(self.max_pending)
+            self._subscribers.add(sub)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="llm-log-broadcaster", daemon=True)
+                self._thread.start()
+            return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def client_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def stats(self) -> dict:
+        """Returns the aggregate counters as of the last broadcast."""
+        with self._lock:
+            if self._stats is None:
+                self._stats = self._load_stats()
+            return dict(self._stats, by_status=dict(self._stats["by_status"]))
+
+    def _load_stats(self) -> dict:
+        by_status = self.db.get_status_counts()
+        return {"total_entries": sum(by_status.values()), "by_status": by_status}
+
+    def _run(self):
+        feed = LogChangeFeed(self.db)
+        while True:
+            try:
+                rows = feed.poll()
+                if rows:
+                    self._publish(rows)
+            except Exception as e:
+                print(f"Error in log broadcaster: {e}")
+            time.sleep(self.poll_interval)
+
+    def _publish(self, rows: list):
+        with self._lock:
+            if self._stats is None:
+                self._stats = self._load_stats()
+            else:
+                self._stats["total_entries"] += len(rows)
+                for row in rows:
+                    status = row.get("status")
+                    self._stats["by_status"][status] = self._stats["by_status"].get(status, 0) + 1
+            stats = dict(self._stats, by_status=dict(self._stats["by_status"]))
+            for sub in list(self._subscribers):
+                try:
+                    sub.queue.put_nowait((rows, stats))
+                except queue.Full:
+                    sub.dropped = True
+                    self._subscribers.discard(sub)
@@ -0,0 +1,243 @@
+# reliakit/loop_guardian.py
+import hashlib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+THROTTLE = "THROTTLE"
+KILL = "KILL"
+BLOCKED = "BLOCKED" # llm_log status of a query refused because of a verdict
+
+
+def fingerprint(prompt: str, response: str) -> int:
+    """64-bit hash of one prompt/response pair; equal pairs give equal fingerprints."""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update((prompt or "").encode("utf-8", "replace"))
+    digest.update(b"\0")
+    digest.update((response or "").encode("utf-8", "replace"))
+    return int.from_bytes(digest.digest(), "big")
+
+
+class _AgentHistory:
+    """The last actions of one agent: a ring buffer of (time, fingerprint) plus running counters."""
+
+    def __init__(self, window: int, max_period: int):
+        self.events = deque(maxlen=window)
+        self.counts = {} # fingerprint -> occurrences in `events`
+        self.runs = [0] * (max_period + 1) # runs[p]: consecutive actions equal to the one p before
+
+    def push(self, at: float, fp: int, max_age: float):
+        while self.events and (len(self.events) == self.events.maxlen or self.events[0][0] < at - max_age):
+            self._drop(self.events.popleft()[1])
+        for period in range(2, len(self.runs)):
+            if len(self.events) >= period and self.events[-period][1] == fp:
+                self.runs[period] += 1
+            else:
+                self.runs[period] = 0
+        self.events.append((at, fp))
+        self.counts[fp] = self.counts.get(fp, 0) + 1
+
+    def _drop(self, fp: int):
+        left = self.counts[fp] - 1
+        if left:
+            self.counts[fp] = left
+        else:
+            del self.counts[fp]
+
+    def reset(self):
+        self.events.clear()
+        self.counts.clear()
+        self.runs = [0] * len(self.runs)
+
+
+class LoopGuardian:
+    """
+    Spots agents stuck in a loop by watching the llm_log rows the meta loop reads (pass
+    `observe` as MetaLoopScheduler's on_entries). Each action is reduced to a fingerprint
+    of its prompt and response, and per agent the last `window` fingerprints younger than
+    `max_age` seconds are kept with a count per fingerprint and, for every period p from 2
+    to `max_period`, the length of the current run of actions equal to the one p places
+    earlier. Each row therefore costs a fixed amount of work, however long the agent runs.
+
+    An agent is flagged when one fingerprint occurs more than `max_repeats` times in its
+    window (repetition), or when its last actions repeat a cycle of p steps `min_cycles`
+    times in a row (oscillation, e.g. A B A B A B). The first flag throttles the agent to
+    one model call per `throttle_interval` seconds; a second flag within `escalate_within`
+    seconds pauses it. Verdicts are written to the agent_guard table for `hold_seconds`;
+    every ModelArbiter enforces them through an AgentGuard, which also cancels a paused
+    agent's in-flight calls. Detection is purely from hashes, so it never spends a model
+    call of its own.
+    """
+
+    def __init__(self, memory_db, window: int = 20, max_age: float = 600.0, max_repeats: int = 5,
+                 max_period: int = 4, min_cycles: int = 3, throttle_interval: float = 30.0,
+                 hold_seconds: float = 600.0, escalate_within: float = 1800.0, exempt=("LoopGuardian",),
+                 on_verdict=None):
+        self.memory_db = memory_db
+        self.window = window
+        self.max_age = max_age
+        self.max_repeats = max_repeats
+        self.max_period = max_period
+        self.min_cycles = min_cycles
+        self.throttle_interval = throttle_interval
+        self.hold_seconds = hold_seconds
+        self.escalate_within = escalate_within
+        self.exempt = set(exempt)
+        self.on_verdict = on_verdict
+        self._history = {} # agent -> _AgentHistory
+        self._flagged = {} # agent -> time of its last verdict
+
+    def observe(self, entries: list):
+        for entry in entries:
+            try:
+                self.observe_one(entry)
+            except Exception as e:
+                print(f"LoopGuardian could not check log #{entry.get('id')}: {e}")
+
+    def observe_one(self, entry: dict) -> Optional[dict]:
+        """Feeds one llm_log row; returns the verdict it caused, if any."""
+        agent = entry.get('agent_name')
+        if not agent or agent in self.exempt or entry.get('status') in (BLOCKED, "CANCELLED"):
+            return None
+        history = self._history.get(agent)
+        if history is None:
+            history = self._history[agent] = _AgentHistory(self.window, self.max_period)
+        fp = fingerprint(entry.get('prompt'), entry.get('response'))
+        history.push(self._time(entry), fp, self.max_age)
+        reason = self._detect(history, fp)
+        if reason is None:
+            return None
+        history.reset() # The next verdict needs fresh evidence
+        return self._verdict(agent, reason, entry)
+
+    def _detect(self, history: _AgentHistory, fp: int) -> Optional[str]:
+        repeats = history.counts[fp]
+        if repeats > self.max_repeats:
+            return f"repeated the same action {repeats} times"
+        for period in range(2, self.max_period + 1):
+            if history.runs[period] >= period * (self.min_cycles - 1):
+                return f"cycled through the same {period} actions {self.min_cycles} times"
+        return None
+
+    def _verdict(self, agent: str, reason: str, entry: dict) -> dict:
+        now = time.time()
+        last = self._flagged.get(agent)
+        action = KILL if last is not None and now - last <= self.escalate_within else THROTTLE
+        self._flagged[agent] = now
+        verdict = {"agent_name": agent, "action": action, "reason": f"{reason} (log #{entry.get('id')})",
+                   "min_interval": self.throttle_interval, "until": now + self.hold_seconds}
+        print(f"LoopGuardian: {agent} {verdict['reason']}; "
+              f"{'pausing' if action == KILL else 'throttling'} it for {self.hold_seconds:.0f}s.")
+        self.memory_db.put_agent_guard(**verdict)
+        if self.on_verdict is not None:
+            self.on_verdict(verdict)
+        return verdict
+
+    @staticmethod
+    def _time(entry: dict) -> float:
+        try:
+            return datetime.fromisoformat(entry['timestamp']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return time.time()
+
+
+class AgentGuard:
+    """
+    Enforces LoopGuardian verdicts where the model calls are made. check(agent) returns the
+    verdict blocking a call right now: a paused agent is always refused and a throttled one
+    is refused until `min_interval` seconds have passed since its last call in this process.
+    Verdicts are re-read from agent_guard at most every `refresh_seconds`, and only when
+    the database has changed (data_version). While calls are tracked with track(), a
+    watcher thread keeps refreshing and cancels the tokens of agents that become paused.
+    """
+
+    def __init__(self, memory_db, refresh_seconds: float = 1.0):
+        self.memory_db = memory_db
+        self.refresh_seconds = refresh_seconds
+        self._verdicts = {} # agent -> verdict row
+        self._version = None
+        self._checked = float("-inf")
+        self._last_call = {} # agent -> time of its last call let through while throttled
+        self._tracked = {} # agent -> set of CancelTokens of its calls in flight
+        self._watcher = None
+        self._lock = threading.Lock()
+
+    def check(self, agent_name: str) -> Optional[dict]:
+        self._refresh()
+        now = time.time()
+        with self._lock:
+            verdict = self._verdicts.get(agent_name)
+            if verdict is None or verdict["until"] <= now:
+                return None
+            if verdict["action"] == KILL:
+                return verdict
+            last = self._last_call.get(agent_name)
+            if last is not None and now - last < verdict["min_interval"]:
+                return verdict
+            self._last_call[agent_name] = now
+            return None
+
+    def refusal(self, agent_name: str, verdict: dict) -> dict:
+        """The result returned, and logged with status BLOCKED, in place of a refused call."""
+        state = "paused" if verdict["action"] == KILL else "throttled"
+        return {"model_used": "LoopGuardian", "status": BLOCKED,
+                "response": f"LLM ERROR: {agent_name} is {state} by LoopGuardian: {verdict['reason']}."}
+
+    def paused(self, agent_name: str) -> Optional[dict]:
+        """The KILL verdict in force for `agent_name`, if any; does not count as a call."""
+        with self._lock:
+            verdict = self._verdicts.get(agent_name)
+        if verdict is not None and verdict["action"] == KILL and verdict["until"] > time.time():
+            return verdict
+        return None
+
+    @contextmanager
+    def track(self, agent_name: str, cancel):
+        """Cancels `cancel` if `agent_name` is paused while the block runs."""
+        with self._lock:
+            self._tracked.setdefault(agent_name, set()).add(cancel)
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="agent-guard", daemon=True)
+                self._watcher.start()
+        try:
+            yield cancel
+        finally:
+            with self._lock:
+                tokens = self._tracked.get(agent_name)
+                tokens.discard(cancel)
+                if not tokens:
+                    del self._tracked[agent_name]
+
+    def _watch(self):
+        """Runs while calls are tracked, then exits; the next track() starts a new one."""
+        while True:
+            time.sleep(self.refresh_seconds)
+            with self._lock:
+                if not self._tracked:
+                    self._watcher = None
+                    return
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"Error reading agent guards: {e}")
+
+    def _refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked < self.refresh_seconds:
+                return
+            self._checked = now
+        version = self.memory_db.data_version()
+        if version == self._version:
+            return
+        verdicts = {row["agent_name"]: row for row in self.memory_db.get_agent_guards()}
+        with self._lock:
+            self._version = version
+            self._verdicts = verdicts
+            doomed = [token for agent, tokens in self._tracked.items()
+                      if agent in verdicts and verdicts[agent]["action"] == KILL for token in tokens]
+        for token in doomed:
+            token.cancel()
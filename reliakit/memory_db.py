@@ -1,57 +1,829 @@
 # reliakit/memory_db.py
+import atexit
+import json
 import sqlite3
+import threading
+import queue
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 from typing import Optional
+from reliakit.db_migrations import migrate, prompt_hash, ROLLUP_TABLES
+
+# PRAGMAs applied to every pooled connection. WAL lets the dashboard, the
+# arbiter and the meta loop read while another process is writing.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -16000,  # negative = KiB, so ~16 MB of page cache
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+
+class ConnectionPool:
+    """
+    A small, thread-safe pool of persistent SQLite connections for one database file.
+    Connections are created lazily up to `max_size` and reused across calls and threads.
+    """
+
+    def __init__(self, db_path: Path, max_size: int = 8, pragmas: Optional[dict] = None, timeout: float = 30.0):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._all = []
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,  # Connections are handed between threads by the pool
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed.")
+            if self._created < self.max_size:
+                conn = self._connect()
+                self._created += 1
+                self._all.append(conn)
+                return conn
+        return self._idle.get(timeout=self.timeout)
+
+    def _release(self, conn: sqlite3.Connection):
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Checks out a connection; commits on success and rolls back on error."""
+        conn = self._acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for conn in self._all:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._all.clear()
+            self._created = 0
+
+
+INSERT_LOG_SQL = '''
+    INSERT INTO llm_log (timestamp, ts_us, agent_name, model_used, prompt, response, status,
+                         prompt_tokens, response_tokens, duration_ms, prompt_hash, heal_of)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+# Dimensions of the activity rollups; see get_activity.
+ROLLUP_KEYS = ("agent_name", "model_used", "status")
+
+LOG_COLUMNS = ("id, timestamp, agent_name, model_used, prompt, response, status, prompt_tokens, response_tokens, "
+               "duration_ms, heal_of")
+
+
+def _to_us(value) -> int:
+    """Accepts a datetime or epoch microseconds and returns epoch microseconds."""
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1_000_000)
+    return int(value)
+
+
+def _log_filters(agent_name: Optional[str] = None, status: Optional[str] = None, model_used: Optional[str] = None,
+                 since=None, until=None) -> tuple[list, list]:
+    """Builds WHERE clauses for llm_log queries. `since`/`until` are datetimes or epoch microseconds."""
+    clauses, params = [], []
+    if agent_name is not None:
+        clauses.append("agent_name = ?")
+        params.append(agent_name)
+    if status is not None:
+        clauses.append("status = ?")
+        params.append(status)
+    if model_used is not None:
+        clauses.append("model_used = ?")
+        params.append(model_used)
+    if since is not None:
+        clauses.append("ts_us >= ?")
+        params.append(_to_us(since))
+    if until is not None:
+        clauses.append("ts_us < ?")
+        params.append(_to_us(until))
+    return clauses, params
+
+
+def _now_stamps() -> tuple:
+    """Returns the (ISO text, epoch microseconds) pair stored on each llm_log row."""
+    us = time.time_ns() // 1000
+    return datetime.fromtimestamp(us / 1_000_000).isoformat(), us
+
+
+def _write_log_rows(pool: ConnectionPool, rows: list, durable: bool = False, retries: int = 6):
+    """
+    Writes `rows` to llm_log in a single transaction. BEGIN IMMEDIATE takes the write
+    lock up front, and lock contention from other processes is retried with backoff.
+    A durable write commits with synchronous=FULL so the WAL is fsynced before returning.
+    If any row fails, the transaction is rolled back and nothing is written.
+    """
+    for attempt in range(retries):
+        try:
+            with pool.connection() as conn:
+                if durable:
+                    conn.execute("PRAGMA synchronous=FULL")
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    if rows:
+                        conn.executemany(INSERT_LOG_SQL, rows)
+                    conn.commit()
+                except BaseException:
+                    if conn.in_transaction:
+                        conn.rollback() # synchronous cannot be reset inside a transaction
+                    raise
+                finally:
+                    if durable:
+                        conn.execute(f"PRAGMA synchronous={pool.pragmas.get('synchronous', 'NORMAL')}")
+            return
+        except sqlite3.OperationalError as e:
+            message = str(e).lower()
+            if attempt == retries - 1 or ("locked" not in message and "busy" not in message):
+                raise
+            time.sleep(0.05 * (2 ** attempt))
+
+
+class _FlushRequest:
+    def __init__(self, durable: bool):
+        self.durable = durable
+        self.done = threading.Event()
+        self.error = None # Set if rows submitted before the request could not be written
+
+
+_STOP = object()
+
+
+class BatchLogWriter:
+    """
+    Background group-commit writer for llm_log. Rows are queued by `submit` and written
+    by a single thread in multi-row transactions once `batch_size` rows are pending or
+    `flush_interval` seconds have passed since the first pending row. `on_commit` is
+    called on the writer thread after each transaction that wrote rows. If a batch fails,
+    its rows are retried one at a time so one bad row does not cost the others; rows that
+    still fail are dropped and the error is raised by the next flush().
+    """
+
+    def __init__(self, pool: ConnectionPool, batch_size: int = 500, flush_interval: float = 0.25, max_pending: int = 100_000,
+                 on_commit=None):
+        self.pool = pool
+        self.on_commit = on_commit
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.closed = False
+        self._error = None # First write failure not yet reported by a flush(); writer thread only
+        self._queue = queue.Queue(maxsize=max_pending)  # Blocks producers when the writer falls behind
+        self._thread = threading.Thread(target=self._run, name="llm-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row: tuple):
+        if self.closed:
+            raise RuntimeError("BatchLogWriter is closed.")
+        self._queue.put(row)
+
+    def flush(self, durable: bool = False, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until every row submitted before this call is committed; False on timeout.
+        Raises the write error if any of those rows (or ones before the previous flush)
+        could not be written.
+        """
+        if self.closed:
+            return True
+        request = _FlushRequest(durable)
+        self._queue.put(request)
+        if not request.done.wait(timeout):
+            return False
+        if request.error is not None:
+            raise request.error
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Writes all pending rows durably and stops the writer thread."""
+        if self.closed:
+            return
+        request = _FlushRequest(durable=True)
+        self._queue.put(request)
+        self._queue.put(_STOP)
+        self.closed = True
+        request.done.wait(timeout)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            rows, requests = [], []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, _FlushRequest):
+                    requests.append(item)
+                    break
+                rows.append(item)
+                if len(rows) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            durable = any(r.durable for r in requests)
+            if rows or durable:
+                self._write(rows, durable)
+            for request in requests:
+                request.error, self._error = self._error, None
+                request.done.set()
+
+    def _write(self, rows: list, durable: bool):
+        try:
+            _write_log_rows(self.pool, rows, durable=durable)
+            written = len(rows)
+        except Exception as e:
+            written = 0
+            for row in rows if len(rows) > 1 else (): # Retry one at a time to isolate the bad row
+                try:
+                    _write_log_rows(self.pool, [row], durable=durable)
+                    written += 1
+                except Exception as row_error:
+                    e = row_error
+            if written < len(rows) or not rows:
+                print(f"Dropped {len(rows) - written} llm_log rows: {e}")
+                self._error = self._error or e
+        if written and self.on_commit is not None:
+            try:
+                self.on_commit()
+            except Exception as e:
+                print(f"Error in llm_log commit callback: {e}")
+
+
+class DataVersionProbe:
+    """
+    Cheap "has anything changed" check for a database file. PRAGMA data_version is per
+    connection, so the probe keeps one dedicated connection and turns its value into a
+    counter that increases whenever any connection (in this process or another) has
+    committed since the previous call. Costs one PRAGMA and no I/O beyond the WAL index.
+    """
 
-class MemoryDB:
     def __init__(self, db_path: Path):
         self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._last = None
+        self._generation = 0
+
+    def version(self) -> int:
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            value = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if value != self._last:
+                self._last = value
+                self._generation += 1
+            return self._generation
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class MemoryDB:
+    # Database files whose schema has already been checked in this process.
+    _schema_ready: set = set()
+    _schema_lock = threading.Lock()
+
+    def __init__(self, db_path: Path, pool_size: int = 8, pragmas: Optional[dict] = None,
+                 batch_writes: bool = False, batch_size: int = 500, flush_interval: float = 0.25):
+        self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.pool = ConnectionPool(self.db_path, max_size=pool_size, pragmas=pragmas)
         self._ensure_db()
+        self._log_listeners = []
+        # With batch_writes, insert_log only queues the row; call flush() to make it visible.
+        self.writer = BatchLogWriter(self.pool, batch_size, flush_interval, on_commit=self._logs_committed) if batch_writes else None
+        self._probe = DataVersionProbe(self.db_path)
 
     def _ensure_db(self):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS llm_log (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    agent_name TEXT NOT NULL,
-                    model_used TEXT NOT NULL,
-                    prompt TEXT,
-                    response TEXT,
-                    status TEXT
-                )
-            ''')
+        key = str(Path(self.db_path).resolve())
+        with MemoryDB._schema_lock:
+            if key in MemoryDB._schema_ready and self.db_path.exists():
+                return
+            # Creates llm_log on a fresh database and upgrades older ones (see db_migrations.py)
+            migrate(self.pool)
+            MemoryDB._schema_ready.add(key)
+
+    def close(self):
+        """Flushes pending log rows and closes all pooled connections."""
+        if self.writer is not None:
+            self.writer.close()
+        self._probe.close()
+        self.pool.close()
 
-    def insert_log(self, agent_name: str, model_used: str, prompt: str, response: str, status: str = "SUCCESS"):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute('''
-                INSERT INTO llm_log (timestamp, agent_name, model_used, prompt, response, status)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (datetime.now().isoformat(), agent_name, model_used, prompt, response, status))
+    def add_log_listener(self, callback):
+        """
+        Calls `callback()` after every commit of llm_log rows made through this MemoryDB, so
+        consumers in this process can wake at once instead of polling. It runs on the
+        committing thread and must be quick. Writes from other processes are not
+        reported; use data_version() for those.
+        """
+        self._log_listeners.append(callback)
+
+    def remove_log_listener(self, callback):
+        try:
+            self._log_listeners.remove(callback)
+        except ValueError:
+            pass
+
+    def _logs_committed(self):
+        for callback in list(self._log_listeners):
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in llm_log listener: {e}")
+
+    def data_version(self) -> int:
+        """Returns a counter that moves whenever the database has been committed to; see DataVersionProbe."""
+        return self._probe.version()
+
+    def flush(self, durable: bool = False, timeout: Optional[float] = None) -> bool:
+        """
+        Commits every queued log row; with durable=True the commit is fsynced. Raises the
+        write error if queued rows could not be written (see BatchLogWriter).
+        """
+        if self.writer is not None:
+            return self.writer.flush(durable=durable, timeout=timeout)
+        if durable:
+            _write_log_rows(self.pool, [], durable=True)
+        return True
+
+    def insert_log(self, agent_name: str, model_used: str, prompt: str, response: str, status: str = "SUCCESS",
+                   durable: bool = False, prompt_tokens: int = 0, response_tokens: int = 0,
+                   duration_ms: Optional[int] = None, heal_of: Optional[int] = None):
+        row = (*_now_stamps(), agent_name, model_used, prompt, response, status, prompt_tokens, response_tokens,
+               duration_ms, prompt_hash(prompt), heal_of)
+        if self.writer is not None and not self.writer.closed:
+            self.writer.submit(row)
+            if durable:
+                self.writer.flush(durable=True)
+        else:
+            _write_log_rows(self.pool, [row], durable=durable)
+            self._logs_committed()
+
+    def insert_logs(self, entries: list[dict], durable: bool = False):
+        """Inserts many log entries (insert_log keyword dicts) in one transaction."""
+        now = _now_stamps()
+        rows = [
+            (*now, e["agent_name"], e["model_used"], e.get("prompt"), e.get("response"), e.get("status", "SUCCESS"),
+             e.get("prompt_tokens", 0), e.get("response_tokens", 0), e.get("duration_ms"), prompt_hash(e.get("prompt")),
+             e.get("heal_of"))
+            for e in entries
+        ]
+        if self.writer is not None and not self.writer.closed:
+            for row in rows:
+                self.writer.submit(row)
+            if durable:
+                self.writer.flush(durable=True)
+        else:
+            _write_log_rows(self.pool, rows, durable=durable)
+            self._logs_committed()
 
     def has_entries(self) -> bool:
-        with sqlite3.connect(self.db_path) as conn:
-            cur = conn.execute('SELECT COUNT(*) FROM llm_log')
-            return cur.fetchone()[0] > 0
+        with self.pool.connection() as conn:
+            cur = conn.execute('SELECT 1 FROM llm_log LIMIT 1')
+            return cur.fetchone() is not None
 
     def get_last_used_model(self) -> Optional[str]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT model_used FROM llm_log ORDER BY timestamp DESC LIMIT 1")
+        with self.pool.connection() as conn:
+            cursor = conn.execute("SELECT model_used FROM llm_log ORDER BY ts_us DESC LIMIT 1")
             result = cursor.fetchone()
             return result[0] if result else None
 
     def get_all_llm_logs(self) -> list[dict]:
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, timestamp, agent_name, model_used, prompt, response, status FROM llm_log ORDER BY timestamp ASC")
+        """Materialises the whole log; prefer get_llm_logs_page or iter_llm_logs for large histories."""
+        return list(self.iter_llm_logs())
+
+    def get_llm_logs_page(self, limit: int = 100, after_id: Optional[int] = None, before_id: Optional[int] = None,
+                          **filters) -> list[dict]:
+        """
+        Returns one keyset-paginated page of log entries, always in ascending id order.
+        With `after_id` the page holds the oldest rows newer than that id; otherwise it holds
+        the newest rows (older than `before_id`, if given). Continue with
+        after_id=page[-1]['id'] to go forward, or before_id=page[0]['id'] to go back.
+        `filters` are those accepted by _log_filters (agent_name, status, model_used, since, until).
+        """
+        clauses, params = _log_filters(**filters)
+        if after_id is not None:
+            clauses.append("id > ?")
+            params.append(after_id)
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = "ASC" if after_id is not None else "DESC"
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                f"SELECT {LOG_COLUMNS} FROM llm_log {where} ORDER BY id {order} LIMIT ?",
+                (*params, limit),
+            )
+            rows = [dict(row) for row in cursor.fetchall()]
+        if order == "DESC":
+            rows.reverse()
+        return rows
+
+    def iter_llm_logs(self, after_id: Optional[int] = None, batch_size: int = 500, **filters):
+        """
+        Streams log entries in ascending id order, fetching `batch_size` rows at a time, so
+        arbitrarily large logs are processed in constant memory. The generator holds one
+        pooled connection until it is exhausted or closed.
+        """
+        clauses, params = _log_filters(**filters)
+        if after_id is not None:
+            clauses.append("id > ?")
+            params.append(after_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.pool.connection() as conn:
+            cursor = conn.execute(f"SELECT {LOG_COLUMNS} FROM llm_log {where} ORDER BY id ASC", params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        return
+                    for row in rows:
+                        yield dict(row)
+            finally:
+                cursor.close()
+
+    def get_max_log_id(self) -> int:
+        """Returns the newest llm_log id (0 when empty); a watermark for get_logs_since."""
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT MAX(id) FROM llm_log").fetchone()[0] or 0
+
+    def get_logs_since(self, watermark: int, limit: Optional[int] = None, **filters) -> list[dict]:
+        """Returns entries with id greater than `watermark`, oldest first."""
+        clauses, params = _log_filters(**filters)
+        clauses.append("id > ?")
+        params.append(watermark)
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                f"SELECT {LOG_COLUMNS} FROM llm_log WHERE {' AND '.join(clauses)} ORDER BY id ASC LIMIT ?",
+                (*params, -1 if limit is None else limit),
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_logs_by_status(self, status: str, limit: Optional[int] = None) -> list[dict]:
+        """Returns log entries with the given status, oldest first, via the (status, ts_us) index."""
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                f"SELECT {LOG_COLUMNS} FROM llm_log WHERE status = ? ORDER BY ts_us ASC LIMIT ?",
+                (status, -1 if limit is None else limit),
+            )
             return [dict(row) for row in cursor.fetchall()]
 
+    def get_heal_candidates(self, since=None, limit: Optional[int] = None) -> list[dict]:
+        """
+        Returns one entry per failed (agent_name, prompt) pair, oldest first: the newest
+        failure's id, agent_name and prompt, plus `failures`, how many ERROR rows the pair
+        has. Pairs with a SUCCESS, FALLBACK or CACHED entry newer than their last failure
+        have been answered (or healed) since and are left out. Failures are read via the
+        (status, id) index and each pair is checked with one (agent_name, prompt_hash, id)
+        probe. `since` (a datetime or epoch microseconds) limits the failures considered.
+        """
+        clauses, params = _log_filters(status="ERROR", since=since)
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                f"""
+                SELECT id, agent_name, prompt, failures FROM (
+                    SELECT MAX(id) AS id, agent_name, prompt_hash, prompt, COUNT(*) AS failures
+                    FROM llm_log WHERE {' AND '.join(clauses)}
+                    GROUP BY agent_name, prompt_hash
+                ) AS failed
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM llm_log AS later
+                    WHERE later.agent_name = failed.agent_name AND later.prompt_hash = failed.prompt_hash
+                      AND later.id > failed.id AND later.status IN ('SUCCESS', 'FALLBACK', 'CACHED')
+                )
+                ORDER BY id LIMIT ?
+                """,
+                (*params, -1 if limit is None else limit),
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_status_counts(self) -> dict:
+        """Returns {status: entry count}, answered from the (status, ts_us) index."""
+        with self.pool.connection() as conn:
+            cursor = conn.execute("SELECT status, COUNT(*) FROM llm_log GROUP BY status")
+            return {row[0]: row[1] for row in cursor.fetchall()}
+
     def get_total_llm_entries(self) -> int:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM llm_log")
+        with self.pool.connection() as conn:
+            cursor = conn.execute("SELECT COUNT(*) FROM llm_log")
             return cursor.fetchone()[0]
+
+
+    def get_token_usage(self, since) -> list[dict]:
+        """
+        Returns requests and tokens spent per (model_used, agent_name) since `since`
+        (a datetime or epoch microseconds). Cached and failed queries carry no token counts
+        and are excluded.
+        """
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                "SELECT model_used, agent_name, COUNT(*) AS requests, "
+                "SUM(prompt_tokens + response_tokens) AS tokens FROM llm_log "
+                "WHERE ts_us >= ? AND status IN ('SUCCESS', 'FALLBACK') GROUP BY model_used, agent_name",
+                (_to_us(since),),
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_recent_durations(self, limit: int = 5000) -> list[dict]:
+        """
+        Returns model_used, agent_name and duration_ms of the newest `limit` answered
+        queries, oldest first, for seeding latency histograms.
+        """
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                "SELECT model_used, agent_name, duration_ms FROM llm_log "
+                "WHERE status IN ('SUCCESS', 'FALLBACK') AND duration_ms IS NOT NULL ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            rows = [dict(row) for row in cursor.fetchall()]
+        rows.reverse()
+        return rows
+
+    def get_activity(self, since, until=None, group_by=("agent_name",)) -> list[dict]:
+        """
+        Returns calls, prompt_tokens, response_tokens, duration_ms (total) and timed_calls
+        per `group_by` combination of agent_name, model_used and status for entries in
+        [since, until), to the minute. Answered from the rollup tables (migration 9): whole
+        hours come from the hourly buckets and the partial hours at either end from the
+        per-minute ones, so a month-long window reads a few hundred buckets per combination.
+        """
+        unknown = set(group_by) - set(ROLLUP_KEYS)
+        if unknown:
+            raise ValueError(f"Cannot group activity by {sorted(unknown)}; expected some of {ROLLUP_KEYS}")
+        minute, hour = ROLLUP_TABLES["llm_log_rollup_minute"], ROLLUP_TABLES["llm_log_rollup_hour"]
+        start = _to_us(since) // minute * minute
+        end = -(-_to_us(until if until is not None else time.time_ns() // 1000) // minute) * minute
+        hours_start, hours_end = -(-start // hour) * hour, end // hour * hour
+        if hours_start < hours_end:
+            ranges = [("llm_log_rollup_minute", start, hours_start), ("llm_log_rollup_hour", hours_start, hours_end),
+                      ("llm_log_rollup_minute", hours_end, end)]
+        else:
+            ranges = [("llm_log_rollup_minute", start, end)]
+
+        keys = ", ".join(group_by)
+        select = f"{keys}, " if keys else ""
+        parts = " UNION ALL ".join(
+            f"SELECT {select}calls, prompt_tokens, response_tokens, duration_ms, timed_calls FROM {table} "
+            f"WHERE bucket_us >= ? AND bucket_us < ?"
+            for table, _, _ in ranges
+        )
+        query = (f"SELECT {select}SUM(calls) AS calls, SUM(prompt_tokens) AS prompt_tokens, "
+                 f"SUM(response_tokens) AS response_tokens, SUM(duration_ms) AS duration_ms, "
+                 f"SUM(timed_calls) AS timed_calls FROM ({parts})")
+        if keys:
+            query += f" GROUP BY {keys} ORDER BY calls DESC"
+        with self.pool.connection() as conn:
+            cursor = conn.execute(query, [bound for _, lo, hi in ranges for bound in (lo, hi)])
+            return [dict(row) for row in cursor.fetchall() if row["calls"]]
+
+    def get_prompt_cache(self, cache_key: str) -> Optional[dict]:
+        """Returns an unexpired prompt_cache entry, or None."""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT agent_name, model_used, response, status, expires_us FROM prompt_cache "
+                "WHERE cache_key = ? AND expires_us > ?",
+                (cache_key, time.time_ns() // 1000),
+            ).fetchone()
+            return dict(row) if row else None
+
+    def put_prompt_cache(self, cache_key: str, agent_name: str, model_used: str, response: str, status: str,
+                         expires_us: int):
+        with self.pool.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO prompt_cache (cache_key, agent_name, model_used, response, status, expires_us) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key, agent_name, model_used, response, status, expires_us),
+            )
+
+    def purge_prompt_cache(self) -> int:
+        """Deletes expired prompt_cache entries and returns how many were removed."""
+        with self.pool.connection() as conn:
+            return conn.execute("DELETE FROM prompt_cache WHERE expires_us <= ?", (time.time_ns() // 1000,)).rowcount
+
+    def get_backend_health(self, backend: str) -> Optional[dict]:
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT state, opened_until, open_seconds, updated_at FROM backend_health WHERE backend = ?",
+                (backend,),
+            ).fetchone()
+            return dict(row) if row else None
+
+    def put_backend_health(self, backend: str, state: str, opened_until: float, open_seconds: float,
+                           updated_at: float):
+        with self.pool.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO backend_health (backend, state, opened_until, open_seconds, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (backend, state, opened_until, open_seconds, updated_at),
+            )
+
+    def get_meta_checkpoint(self, name: str) -> Optional[dict]:
+        """Returns the saved watermark and aggregates of a meta loop, or None on its first run."""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT watermark, aggregates, updated_at FROM meta_checkpoint WHERE name = ?", (name,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"watermark": row["watermark"], "aggregates": json.loads(row["aggregates"]), "updated_at": row["updated_at"]}
+
+    def save_meta_checkpoint(self, name: str, watermark: int, aggregates: dict, triggers: list[dict] = ()) -> int:
+        """
+        Records, in one transaction, that a meta loop has processed every entry up to
+        `watermark` and which agents those entries trigger (dicts with log_id, rule,
+        agent_name and input). Triggers for entries at or below the saved watermark are
+        skipped: a loop sharing the checkpoint has already recorded them. The watermark
+        never moves backward; the saved one is returned. DONE triggers below every
+        checkpoint's watermark are pruned.
+        """
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT watermark FROM meta_checkpoint WHERE name = ?", (name,)).fetchone()
+            saved = row["watermark"] if row is not None else -1
+            conn.executemany(
+                "INSERT OR IGNORE INTO meta_trigger (log_id, checkpoint, rule, agent_name, input, state) "
+                "VALUES (?, ?, ?, ?, ?, 'PENDING')",
+                [(t["log_id"], name, t["rule"], t["agent_name"], t["input"]) for t in triggers if t["log_id"] > saved],
+            )
+            conn.execute(
+                "INSERT INTO meta_checkpoint (name, watermark, aggregates, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET watermark = MAX(watermark, excluded.watermark), "
+                "aggregates = excluded.aggregates, updated_at = excluded.updated_at",
+                (name, watermark, json.dumps(aggregates), time.time()),
+            )
+            conn.execute(
+                "DELETE FROM meta_trigger WHERE log_id <= (SELECT MIN(watermark) FROM meta_checkpoint) "
+                "AND state = 'DONE'"
+            )
+        return max(saved, watermark)
+
+    def get_pending_triggers(self, name: str) -> list[dict]:
+        """Returns a meta loop's triggers that have not been dispatched, oldest entry first."""
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                "SELECT log_id, rule, agent_name, input FROM meta_trigger "
+                "WHERE checkpoint = ? AND state = 'PENDING' ORDER BY log_id",
+                (name,),
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def claim_trigger(self, log_id: int) -> bool:
+        """
+        Marks a pending trigger as dispatched and returns True, or False if it was already
+        claimed. The claim is committed durably before the caller runs the agent, so a
+        crash can lose a dispatch but never repeat one.
+        """
+        with self.pool.connection() as conn:
+            conn.execute("PRAGMA synchronous=FULL")
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                claimed = conn.execute(
+                    "UPDATE meta_trigger SET state = 'DISPATCHED', claimed_at = ? WHERE log_id = ? AND state = 'PENDING'",
+                    (time.time(), log_id),
+                ).rowcount == 1
+                conn.commit()
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback() # synchronous cannot be reset inside a transaction
+                raise
+            finally:
+                conn.execute(f"PRAGMA synchronous={self.pool.pragmas.get('synchronous', 'NORMAL')}")
+        return claimed
+
+    def finish_trigger(self, log_id: int):
+        """Marks a dispatched trigger DONE; the row stays as the record that its entry was handled."""
+        with self.pool.connection() as conn:
+            conn.execute("UPDATE meta_trigger SET state = 'DONE' WHERE log_id = ?", (log_id,))
+
+    def drop_dispatched_triggers(self, name: str) -> int:
+        """Closes triggers whose runs were cut short by a restart (they are not retried); returns how many."""
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "UPDATE meta_trigger SET state = 'DONE' WHERE checkpoint = ? AND state = 'DISPATCHED'", (name,)
+            ).rowcount
+
+    def get_agent_guards(self, now: Optional[float] = None) -> list[dict]:
+        """Returns the LoopGuardian verdicts still in force at `now` (epoch seconds)."""
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                "SELECT agent_name, action, reason, min_interval, until FROM agent_guard WHERE until > ?",
+                (time.time() if now is None else now,),
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def put_agent_guard(self, agent_name: str, action: str, reason: str, min_interval: float, until: float):
+        with self.pool.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO agent_guard (agent_name, action, reason, min_interval, until, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (agent_name, action, reason, min_interval, until, time.time()),
+            )
+
+
+class LogChangeFeed:
+    """
+    A consumer's cursor over new llm_log rows. `poll` returns only rows past the held
+    watermark and skips the query entirely when data_version shows no commits since the
+    last poll, so an idle tick costs a single PRAGMA.
+    """
+
+    def __init__(self, db: MemoryDB, watermark: Optional[int] = None, **filters):
+        self.db = db
+        self.filters = filters
+        # Default to "from now on": existing history is not replayed.
+        self.watermark = db.get_max_log_id() if watermark is None else watermark
+        self._seen_version = None
+
+    def has_changes(self) -> bool:
+        return self.db.data_version() != self._seen_version
+
+    def rewind(self, watermark: int):
+        """Moves the cursor back so rows after `watermark` are returned again by the next poll."""
+        self.watermark = watermark
+        self._seen_version = None
+
+    def poll(self, limit: Optional[int] = 1000) -> list[dict]:
+        version = self.db.data_version()
+        if version == self._seen_version:
+            return []
+        rows = self.db.get_logs_since(self.watermark, limit=limit, **self.filters)
+        if rows:
+            self.watermark = rows[-1]["id"]
+        # A full page may leave more rows behind; only mark the version seen once caught up.
+        if limit is None or len(rows) < limit:
+            self._seen_version = version
+        return rows
+
+
+_shared_dbs: dict = {}
+_shared_lock = threading.Lock()
+
+
+def get_memory_db(db_path: Path) -> MemoryDB:
+    """
+    Returns the process-wide MemoryDB for `db_path`, creating it on first use.
+    The dashboard, ModelArbiter and the meta loop share one pool this way, and
+    their log inserts go through one group-commit writer.
+    """
+    key = str(Path(db_path).resolve())
+    with _shared_lock:
+        db = _shared_dbs.get(key)
+        if db is None:
+            db = _shared_dbs[key] = MemoryDB(db_path=Path(db_path), batch_writes=True)
+        return db
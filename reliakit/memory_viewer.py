@@ -0,0 +1,259 @@
+# reliakit/memory_viewer.py
+import tkinter as tk
+from tkinter import ttk, scrolledtext
+from reliakit.memory_db import LogChangeFeed
+
+PAGE_SIZE = 200 # Rows fetched per query when paging or catching up
+MAX_ROWS = 1000 # Rows kept in the tree; paging further drops rows from the far end
+CELL_CHARS = 80 # Prompt/response characters shown in a cell; the detail pane has the full text
+ALL = "All"
+STATUSES = ("SUCCESS", "FALLBACK", "CACHED", "ERROR", "BLOCKED")
+COLUMNS = (
+    ("id", "ID", 60),
+    ("timestamp", "Time", 170),
+    ("agent_name", "Agent", 120),
+    ("model_used", "Model", 130),
+    ("status", "Status", 80),
+    ("prompt", "Prompt", 260),
+    ("response", "Response", 320),
+)
+
+
+class MemoryViewer:
+    """
+    The Memory Viewer tab: llm_log rows in a ttk.Treeview holding a sliding window of at
+    most MAX_ROWS rows. The newest page is shown first; scrolling to the top pages older
+    rows in and scrolling back to the bottom pages newer ones in, both as keyset queries.
+    While the window reaches the newest row, refresh() appends rows committed since then,
+    tracked by the id watermark of a LogChangeFeed. Agent, status and model filters are
+    applied in SQL. Every query runs on a TkTaskRunner worker, and each render touches one
+    page, so the cost does not grow with the size of the log.
+    """
+
+    def __init__(self, parent, memory_db, tasks, agents=()):
+        self.memory_db = memory_db
+        self.tasks = tasks
+        self.rows = {} # id -> row, for the rows currently in the tree
+        self.models = set()
+        self._generation = 0 # Bumped by reload() so results of superseded queries are dropped
+        self._loading = False
+        self._refresh_pending = False
+        self._feed = None
+        self._has_older = False
+        self._at_tail = False
+        self._build(parent, agents)
+        self.reload()
+
+    def _build(self, parent, agents):
+        filters = ttk.Frame(parent)
+        filters.pack(fill="x", pady=(0, 5))
+        self.agent_var = tk.StringVar(value=ALL)
+        self.status_var = tk.StringVar(value=ALL)
+        self.model_var = tk.StringVar(value=ALL)
+        for label, var, values in (("Agent:", self.agent_var, (ALL, *agents)),
+                                   ("Status:", self.status_var, (ALL, *STATUSES)),
+                                   ("Model:", self.model_var, (ALL,))):
+            ttk.Label(filters, text=label).pack(side="left", padx=(5, 2))
+            box = ttk.Combobox(filters, textvariable=var, values=values, width=18)
+            box.pack(side="left", padx=(0, 5))
+            box.bind("<<ComboboxSelected>>", lambda _: self.reload())
+            box.bind("<Return>", lambda _: self.reload())
+            if var is self.model_var:
+                self.model_box = box
+        self.count_label = ttk.Label(filters, text="Loading...")
+        self.count_label.pack(side="right", padx=5)
+
+        table = ttk.Frame(parent)
+        table.pack(fill="both", expand=True)
+        self.tree = ttk.Treeview(table, columns=[name for name, _, _ in COLUMNS], show="headings",
+                                 selectmode="browse")
+        for name, heading, width in COLUMNS:
+            self.tree.heading(name, text=heading)
+            self.tree.column(name, width=width, stretch=name in ("prompt", "response"))
+        self.scrollbar = ttk.Scrollbar(table, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.tree.tag_configure("ERROR", foreground="red")
+        self.tree.tag_configure("BLOCKED", foreground="purple")
+        self.tree.tag_configure("FALLBACK", foreground="orange")
+        self.tree.tag_configure("CACHED", foreground="blue")
+        self.tree.bind("<<TreeviewSelect>>", self._show_detail)
+
+        self.detail = scrolledtext.ScrolledText(parent, wrap=tk.WORD, height=8, state='disabled')
+        self.detail.pack(fill="x", pady=(5, 0))
+
+    def _filters(self) -> dict:
+        filters = {}
+        for key, var in (("agent_name", self.agent_var), ("status", self.status_var), ("model_used", self.model_var)):
+            value = var.get().strip()
+            if value and value != ALL:
+                filters[key] = value
+        return filters
+
+    def reload(self):
+        """Drops the loaded rows and shows the newest page for the current filters."""
+        self._generation += 1
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self.rows.clear()
+        self._feed = None
+        self._has_older = self._at_tail = False
+        self._refresh_pending = False
+        self.count_label.config(text="Loading...")
+        self._query(self._fetch_newest, self._filters(), on_done=self._newest_loaded, name="Load memory")
+
+    def refresh(self):
+        """Appends rows committed since the last look, if the window reaches the newest row."""
+        if self._loading:
+            self._refresh_pending = True
+            return
+        if self._feed is None or not self._at_tail:
+            return # Newer rows are paged in when the user scrolls down to them
+        self._query(self._feed.poll, PAGE_SIZE, on_done=self._appended, visible=False, name="Refresh memory")
+
+    def _query(self, fn, *args, on_done, visible: bool = True, name: str = "Memory query"):
+        """Runs one query at a time on a worker; on_done gets its result on the Tk thread."""
+        self._loading = True
+        generation = self._generation
+        self.tasks.submit(fn, *args, name=name, visible=visible,
+                          on_done=lambda result: self._deliver(generation, on_done, result),
+                          on_error=lambda error: self._failed(generation, error))
+
+    def _deliver(self, generation: int, on_done, result):
+        if generation != self._generation:
+            return
+        self._loading = False
+        on_done(result)
+        if self._refresh_pending and not self._loading:
+            self._refresh_pending = False
+            self.refresh()
+
+    def _failed(self, generation: int, error: Exception):
+        if generation == self._generation:
+            self._loading = False
+        print(f"Error reading memory snapshots: {error}")
+
+    # --- Worker-thread queries ---
+
+    def _fetch_newest(self, filters: dict) -> tuple:
+        feed = LogChangeFeed(self.memory_db, **filters) # Watermark at the current newest id
+        page = self.memory_db.get_llm_logs_page(limit=PAGE_SIZE, **filters)
+        if page:
+            feed.watermark = max(feed.watermark, page[-1]['id']) # Rows committed in between are on the page
+        return feed, page
+
+    def _fetch_older(self, before_id: int, filters: dict) -> list:
+        return self.memory_db.get_llm_logs_page(limit=PAGE_SIZE, before_id=before_id, **filters)
+
+    def _fetch_newer(self, after_id: int, filters: dict) -> list:
+        return self.memory_db.get_llm_logs_page(limit=PAGE_SIZE, after_id=after_id, **filters)
+
+    # --- Tk-thread rendering ---
+
+    def _newest_loaded(self, fetched: tuple):
+        self._feed, page = fetched
+        self._insert(page, at_end=True)
+        self._has_older = len(page) == PAGE_SIZE
+        self._at_tail = True
+        self.tree.yview_moveto(1.0)
+        self._update_count()
+
+    def _appended(self, rows: list):
+        if not rows:
+            return
+        follow = self.tree.yview()[1] >= 1.0 # Keep following the newest row only if it was in view
+        self._insert(rows, at_end=True)
+        self._trim(from_start=True)
+        if follow:
+            self.tree.see(self.tree.get_children()[-1])
+        self._update_count()
+        if len(rows) == PAGE_SIZE:
+            self.refresh() # More were committed than one page holds
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._loading or not self.rows:
+            return
+        filters = self._filters()
+        if float(first) <= 0.0 and self._has_older:
+            oldest = int(self.tree.get_children()[0])
+            self._query(self._fetch_older, oldest, filters, on_done=self._older_loaded, name="Load older memory")
+        elif float(last) >= 1.0 and not self._at_tail:
+            newest = int(self.tree.get_children()[-1])
+            self._query(self._fetch_newer, newest, filters, on_done=self._newer_loaded, name="Load newer memory")
+
+    def _older_loaded(self, page: list):
+        anchor = self.tree.get_children()[0]
+        self._has_older = len(page) == PAGE_SIZE
+        self._insert(page, at_end=False)
+        self._trim(from_start=False)
+        self.tree.see(anchor)
+        self._update_count()
+
+    def _newer_loaded(self, page: list):
+        anchor = self.tree.get_children()[-1]
+        self._insert(page, at_end=True)
+        self._trim(from_start=True)
+        if len(page) < PAGE_SIZE:
+            self._at_tail = True
+            if page:
+                self._feed.watermark = max(self._feed.watermark, page[-1]['id'])
+        self.tree.see(anchor)
+        self._update_count()
+
+    def _insert(self, rows: list, at_end: bool):
+        models = len(self.models)
+        for index, row in enumerate(rows):
+            self.rows[row['id']] = row
+            if row.get('model_used'):
+                self.models.add(row['model_used'])
+            self.tree.insert("", "end" if at_end else index, iid=str(row['id']),
+                             values=[self._cell(row, name) for name, _, _ in COLUMNS], tags=(row.get('status'),))
+        if len(self.models) != models:
+            self.model_box.config(values=(ALL, *sorted(self.models)))
+
+    def _trim(self, from_start: bool):
+        """Keeps at most MAX_ROWS rows by dropping from one end of the window."""
+        excess = len(self.rows) - MAX_ROWS
+        if excess <= 0:
+            return
+        children = self.tree.get_children()
+        dropped = children[:excess] if from_start else children[-excess:]
+        self.tree.delete(*dropped)
+        for iid in dropped:
+            self.rows.pop(int(iid), None)
+        if from_start:
+            self._has_older = True
+        else:
+            self._at_tail = False
+
+    @staticmethod
+    def _cell(row: dict, name: str) -> str:
+        value = row.get(name)
+        if value is None:
+            return "N/A"
+        text = str(value).replace("\n", " ")
+        return text if len(text) <= CELL_CHARS else text[:CELL_CHARS - 3] + "..."
+
+    def _update_count(self):
+        if not self.rows:
+            self.count_label.config(text="No memory snapshots found yet.")
+            return
+        more = " (scroll up for older)" if self._has_older else ""
+        self.count_label.config(text=f"{len(self.rows)} entries loaded{more}")
+
+    def _show_detail(self, _event=None):
+        selection = self.tree.selection()
+        row = self.rows.get(int(selection[0])) if selection else None
+        self.detail.config(state='normal')
+        self.detail.delete(1.0, tk.END)
+        if row is not None:
+            self.detail.insert(tk.END, f"[{row.get('timestamp', 'N/A')}] Agent: {row.get('agent_name', 'N/A')}, "
+                                       f"Model: {row.get('model_used', 'N/A')}, Status: {row.get('status', 'N/A')}\n")
+            self.detail.insert(tk.END, f"  Prompt: {row.get('prompt', 'N/A')}\n")
+            self.detail.insert(tk.END, f"  Response: {row.get('response', 'N/A')}\n")
+            if row.get('heal_of'):
+                self.detail.insert(tk.END, f"  Retry of log #{row['heal_of']}\n")
+        self.detail.config(state='disabled')
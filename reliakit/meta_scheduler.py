@@ -0,0 +1,205 @@
+# reliakit/meta_scheduler.py
+import json
+import threading
+from collections import deque
+from datetime import datetime
+from reliakit.memory_db import LogChangeFeed
+from reliakit.model_arbiter import LLM_ERROR_RESPONSE, RATE_LIMITED_RESPONSE
+
+
+class TriggerRule:
+    """
+    Runs `agent` for every new llm_log entry that `match(entry)` accepts, with
+    `make_input(entry)` as its input. Entries written by the agent itself never match,
+    so a failing agent cannot keep re-triggering itself.
+    """
+
+    def __init__(self, name: str, agent: str, match, make_input):
+        self.name = name
+        self.agent = agent
+        self.match = match
+        self.make_input = make_input
+
+    def matches(self, entry: dict) -> bool:
+        return entry.get('agent_name') != self.agent and self.match(entry)
+
+
+# Errors of the models rather than of the agent: every backend failed, or every budget is
+# spent. CodeHealer cannot fix those, and running it would only add load to the outage.
+_MODEL_OUTAGE_RESPONSES = (LLM_ERROR_RESPONSE, RATE_LIMITED_RESPONSE)
+
+
+def _agent_failed(entry: dict) -> bool:
+    return entry.get('status') == "ERROR" and entry.get('response') not in _MODEL_OUTAGE_RESPONSES
+
+
+def _heal_input(entry: dict) -> str:
+    return (f"Agent {entry['agent_name']} failed on prompt: {entry.get('prompt') or ''}\n"
+            f"Error: {entry.get('response') or ''}")
+
+
+DEFAULT_RULES = [
+    TriggerRule("heal-errors", "CodeHealer", _agent_failed, _heal_input),
+]
+
+
+class MetaLoopScheduler:
+    """
+    Event-driven core of the meta loop. It sleeps until llm_log changes, reads the new
+    rows through a LogChangeFeed and hands the agents whose TriggerRule matches to an
+    AgentExecutor. Commits made through this process's MemoryDB wake it at once; writes
+    from other processes are noticed by a data_version probe whose interval backs off
+    from `min_interval` to `max_interval` while nothing happens, so a quiet system costs
+    one PRAGMA every `max_interval` seconds.
+
+    At most `max_in_flight` dispatches are outstanding. While that many are running the
+    scheduler stops reading the log and the feed's watermark stays put, so a burst of
+    matching entries waits in the database rather than in memory. Reading resumes as runs
+    finish. `on_entries(entries)` is called with each batch of new rows read. An entry
+    triggers at most one agent: the first rule that matches it.
+
+    With `checkpoint` set, the watermark, the running aggregates and the triggers not yet
+    dispatched are saved under that name in one transaction per batch, and a restarted
+    scheduler resumes from them by reading one checkpoint row and at most one batch of
+    pending triggers. A trigger is durably claimed before its agent runs, so an entry is
+    never dispatched twice, even across crashes or by two loops sharing a database. Runs
+    cut short by a crash are dropped, not retried.
+    """
+
+    def __init__(self, db, executor, rules=None, max_in_flight: int = 4, batch_size: int = 100,
+                 min_interval: float = 0.05, max_interval: float = 2.0, on_entries=None,
+                 checkpoint: str = None):
+        self.db = db
+        self.executor = executor
+        self.rules = DEFAULT_RULES if rules is None else rules
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.on_entries = on_entries
+        self.checkpoint = checkpoint
+        self.dispatched = 0
+        self.aggregates = {"entries": 0, "dispatched": 0, "by_status": {}, "by_agent": {}}
+        self._backlog = deque() # Triggers (log_id, rule, agent_name, input) read but not yet dispatched
+        saved = db.get_meta_checkpoint(checkpoint) if checkpoint else None
+        if saved is None:
+            self.feed = LogChangeFeed(db) # Only rows written after the first start are "new"
+        else:
+            self.feed = LogChangeFeed(db, watermark=saved["watermark"])
+            self.aggregates = saved["aggregates"]
+            self._backlog.extend(db.get_pending_triggers(checkpoint))
+            dropped = db.drop_dispatched_triggers(checkpoint)
+            print(f"Resuming meta-loop '{checkpoint}' after log #{saved['watermark']}: "
+                  f"{len(self._backlog)} pending triggers, {dropped} interrupted runs dropped.")
+        self._in_flight = 0
+        self._wake = threading.Condition()
+        self._woken = False
+        self._stopped = False
+
+    def wake(self):
+        """Makes the scheduler look for work now; safe to call from any thread."""
+        with self._wake:
+            self._woken = True
+            self._wake.notify()
+
+    def stop(self):
+        self._stopped = True
+        self.wake()
+
+    def run(self):
+        """Runs until stop() is called. Dispatched runs continue on the executor's pool."""
+        self.db.add_log_listener(self.wake)
+        interval = self.min_interval
+        try:
+            while not self._stopped:
+                try:
+                    busy = self.step()
+                except Exception as e:
+                    print(f"Error in meta-loop: {e}")
+                    busy = False
+                    interval = self.max_interval
+                if busy:
+                    interval = self.min_interval
+                    continue
+                self._sleep(interval)
+                interval = min(interval * 2, self.max_interval)
+        finally:
+            self.db.remove_log_listener(self.wake)
+
+    def step(self) -> bool:
+        """Dispatches what it can and reads more of the log if there is room; True if anything happened."""
+        busy = False
+        while self._backlog and self._has_room():
+            trigger = self._backlog.popleft()
+            if self.checkpoint and not self.db.claim_trigger(trigger["log_id"]):
+                continue # Already dispatched by another loop on this database
+            self._dispatch(trigger)
+            busy = True
+        if self._backlog or not self._has_room():
+            return busy # Saturated: leave new rows in the log until runs finish
+        watermark = self.feed.watermark
+        entries = self.feed.poll(limit=self.batch_size)
+        if not entries:
+            return busy
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] {len(entries)} new LLM logs. "
+              f"Last LLM model used: {entries[-1]['model_used']}")
+        if self.on_entries is not None:
+            self.on_entries(entries)
+        aggregates = json.loads(json.dumps(self.aggregates)) # Only kept once the checkpoint is saved
+        triggers = []
+        for entry in entries:
+            self._count(aggregates, entry)
+            rule = next((rule for rule in self.rules if rule.matches(entry)), None)
+            if rule is not None:
+                triggers.append({"log_id": entry["id"], "rule": rule.name, "agent_name": rule.agent,
+                                 "input": rule.make_input(entry)})
+        if self.checkpoint:
+            try:
+                saved = self.db.save_meta_checkpoint(self.checkpoint, self.feed.watermark, aggregates, triggers)
+            except Exception:
+                self.feed.rewind(watermark) # Read the batch again next time
+                raise
+            if saved > self.feed.watermark:
+                self.feed.watermark = saved # Another loop on this checkpoint is ahead; skip what it handled
+        self.aggregates = aggregates
+        self._backlog.extend(triggers)
+        return True
+
+    @staticmethod
+    def _count(aggregates: dict, entry: dict):
+        aggregates["entries"] += 1
+        status = entry.get("status") or ""
+        aggregates["by_status"][status] = aggregates["by_status"].get(status, 0) + 1
+        agent = entry.get("agent_name") or ""
+        aggregates["by_agent"][agent] = aggregates["by_agent"].get(agent, 0) + 1
+
+    def _has_room(self) -> bool:
+        with self._wake:
+            return self._in_flight < self.max_in_flight
+
+    def _sleep(self, timeout: float):
+        with self._wake:
+            if not self._woken and not self._stopped:
+                self._wake.wait(timeout)
+            self._woken = False
+
+    def _dispatch(self, trigger: dict):
+        print(f"Triggering agent: {trigger['agent_name']} for log #{trigger['log_id']} ({trigger['rule']})")
+        with self._wake:
+            self._in_flight += 1
+        self.dispatched += 1
+        self.aggregates["dispatched"] += 1
+        future = self.executor.submit(trigger["agent_name"], trigger["input"])
+        future.add_done_callback(lambda done: self._finished(trigger, done))
+
+    def _finished(self, trigger: dict, future):
+        with self._wake:
+            self._in_flight -= 1
+        try:
+            if self.checkpoint:
+                self.db.finish_trigger(trigger["log_id"])
+            if not future.cancelled():
+                result = future.result()
+                print(f"Agent {trigger['agent_name']} for log #{trigger['log_id']} finished: {result['status']}.")
+        finally:
+            self.wake()
@@ -1,84 +1,628 @@
 # reliakit/model_arbiter.py
-import subprocess
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from reliakit.memory_db import MemoryDB
+from reliakit.memory_db import get_memory_db
+from reliakit.prompt_cache import PromptCache, CACHEABLE_STATUSES, make_cache_key
+from reliakit.model_backends import BackendError, CancelToken, OllamaHTTPBackend, gemini_backend
+from reliakit.circuit_breaker import CircuitBreaker, OPEN
+from reliakit.rate_limiter import RateLimiter, estimate_tokens
+from reliakit.latency_stats import LatencyTracker
+from reliakit.loop_guardian import AgentGuard, BLOCKED
 import os # For accessing environment variables
 
+LLM_ERROR_RESPONSE = "LLM ERROR: Both primary and fallback models failed to provide a valid response."
+RATE_LIMITED_RESPONSE = "LLM ERROR: Request and token budgets are exhausted for every model; try again later."
+CANCELLED = "CANCELLED" # Status of a query stopped through its CancelToken; such queries are not logged
+
+
+class QueryError(Exception):
+    """An unexpected error while querying `model_used` (backend failures are BackendError and handled)."""
+
+    def __init__(self, model_used: str, error: Exception):
+        super().__init__(f"{model_used}: {error}")
+        self.model_used = model_used
+
+
+class QueryStream:
+    """
+    Returned by ModelArbiter.stream_query. Iterating yields the response in chunks as the
+    model produces them; once exhausted, `response`, `model_used`, `status`, `ttft` (seconds
+    to the first chunk) and `duration` describe the query, which has been logged as one
+    llm_log row. A stream abandoned before the end is not logged, and neither is one
+    stopped through its `cancel` token (status CANCELLED).
+    """
+
+    def __init__(self, cancel: CancelToken = None):
+        self._chunks = iter(())
+        self.cancel = cancel or CancelToken()
+        self.response = None
+        self.model_used = None
+        self.status = None
+        self.ttft = None
+        self.duration = None
+
+    def __iter__(self):
+        return self._chunks
+
+    def _finish(self, result: dict, started: float):
+        self.response = result["response"]
+        self.model_used = result["model_used"]
+        self.status = result["status"]
+        self.duration = time.monotonic() - started
+
+
 class ModelArbiter:
-    def __init__(self):
+    def __init__(self, db_path: Path = None, use_cache: bool = True, cache_ttl: float = 3600.0, persist_cache: bool = True,
+                 backends: dict = None, pool_size: int = 2, concurrency: int = 4,
+                 hedge_delay: float = 3.0, hedge_percentile: float = None,
+                 rate_limiter: RateLimiter = None, queue_timeout: float = 10.0):
         # Determine the database path relative to the project root
         # Assuming model_arbiter.py is in reliakit/
-        db_path = Path(__file__).resolve().parent / "utils" / "memory.db"
-        self.memory_db = MemoryDB(db_path=db_path)
+        if db_path is None:
+            db_path = Path(__file__).resolve().parent / "utils" / "memory.db"
+        self.memory_db = get_memory_db(db_path)
         self.primary_model = "gemini"
         self.fallback_model = "ollama:gemma:2b"
+        # Starting timeouts; once a backend has answered enough calls they follow its observed
+        # p99 latency (see LatencyTracker), per agent where that agent has enough history.
+        self.primary_timeout = 15
+        self.fallback_timeout = 30 # Allow a longer timeout for Ollama
+        self.latency = LatencyTracker.from_rows(self.memory_db.get_recent_durations())
+        # Backends are long-lived: warm workers and keep-alive connections are reused across queries.
+        self.backends = backends or {
+            self.primary_model: gemini_backend(pool_size=pool_size),
+            self.fallback_model: OllamaHTTPBackend(model="gemma:2b", pool_size=pool_size),
+        }
+        # Backends that keep failing are skipped until a probe shows they have recovered;
+        # the breaker state is shared with other processes through the memory DB. A call
+        # counts as slow when it takes over half of its (adaptive) timeout.
+        self.breakers = {
+            self.primary_model: CircuitBreaker(self.primary_model, store=self.memory_db),
+            self.fallback_model: CircuitBreaker(self.fallback_model, store=self.memory_db),
+        }
+        # Identical prompts from the same agent are answered from cache, and concurrent
+        # identical prompts share one model call.
+        self.prompt_cache = PromptCache(ttl=cache_ttl, store=self.memory_db if persist_cache else None) if use_cache else None
+        # Requests-per-minute and token budgets per backend and agent (TokenWeaver thresholds).
+        # A backend over budget is skipped for the next one; the last option queues for up
+        # to `queue_timeout` seconds before the query is given up.
+        self.rate_limiter = rate_limiter or RateLimiter(store=self.memory_db)
+        self.queue_timeout = queue_timeout
+        # Agents the meta loop's LoopGuardian caught looping are throttled or paused without
+        # a model call, and a paused agent's calls in flight are cancelled.
+        self.guard = AgentGuard(self.memory_db)
+
+        # Async API: at most `concurrency` in-flight calls per backend. The fallback is fired
+        # `hedge_delay` seconds after the primary if it has not answered yet (None disables
+        # hedging); with `hedge_percentile` (e.g. 0.95) the delay tracks observed latency.
+        self.concurrency = {name: concurrency for name in self.backends}
+        self.hedge_delay = hedge_delay
+        self.hedge_percentile = hedge_percentile
+        self._limits = {}
+        self._limits_loop = None
+        self._async_in_flight = {}
+
+    def run_query(self, agent_name: str, prompt: str, use_cache: bool = True) -> str:
+        return self.query(agent_name, prompt, use_cache)["response"]
+
+    def query(self, agent_name: str, prompt: str, use_cache: bool = True, heal_of: int = None,
+              cancel: CancelToken = None) -> dict:
+        """
+        run_query returning the whole result: model_used, response, status and accounting
+        fields. `heal_of` is stored on the log row of a retry of the failed entry with that id.
+        Cancelling `cancel` kills the backend call; the result is then CANCELLED and not logged.
+        """
+        result = self._answer(agent_name, prompt, use_cache, cancel=cancel)
+        if result["status"] != CANCELLED:
+            self._log_result(agent_name, prompt, result, heal_of)
+        return result
+
+    def _answer(self, agent_name: str, prompt: str, use_cache: bool = True, queue_timeout: float = None,
+                cancel: CancelToken = None) -> dict:
+        """
+        run_query without the logging: returns model_used/response/status and accounting
+        fields. `queue_timeout` overrides how long the last model option waits for budget.
+        """
+        if self.prompt_cache is None or not use_cache:
+            return self._query_models(agent_name, prompt, queue_timeout, cancel)
+        key = make_cache_key(agent_name, f"{self.primary_model}|{self.fallback_model}", prompt)
+        result, source = self.prompt_cache.get_or_compute(
+            key, agent_name, lambda: self._query_models(agent_name, prompt, queue_timeout, cancel))
+        if source == "computed":
+            return result
+        if result["status"] == CANCELLED:
+            return self._query_models(agent_name, prompt, queue_timeout, cancel) # Another caller gave up, not this one
+        print(f"Answered from prompt cache ({source}).")
+        return self._shared_result(result)
 
-    def run_query(self, agent_name: str, prompt: str) -> str:
-        response = ""
-        model_used = "N/A"
-        status = "ERROR"
+    @staticmethod
+    def _shared_result(result: dict) -> dict:
+        """
+        Another caller's result as seen by one that waited on it. Answers become CACHED;
+        failures keep their status so they are logged, and healed, as failures. Either way
+        the tokens and model time were spent, and logged, by the caller that ran the query.
+        """
+        if result["status"] in CACHEABLE_STATUSES:
+            return dict(result, status="CACHED")
+        return dict(result, prompt_tokens=0, response_tokens=0, duration_ms=None)
 
+    def run_batch(self, agent_name: str, prompts, max_workers: int = None, use_cache: bool = True,
+                  on_progress=None, log_batch_size: int = 100, budget_timeout: float = None) -> dict:
+        """
+        Runs many prompts for one agent on a bounded thread pool (model calls wait on
+        subprocesses and sockets, so threads overlap them well) and returns
+        {"results", "succeeded", "failed", "duration"}. `results[i]` is the result dict for
+        `prompts[i]` whatever order the calls finish in; `failed` lists the indices whose
+        status is ERROR or BLOCKED, so one bad prompt does not sink the batch. `on_progress(done,
+        total, index, result)` is called from this thread as each prompt completes. Log rows
+        are written `log_batch_size` at a time in single transactions. When the request
+        and token budgets run out, prompts queue for budget for up to `budget_timeout`
+        seconds each (None: as long as it takes) instead of failing, so a large batch is
+        paced by the rate limits.
+        """
+        prompts = list(prompts)
+        workers = max_workers or self.concurrency.get(self.primary_model, 4)
+        results = [None] * len(prompts)
+        failed = []
+        pending_logs = []
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="arbiter-batch") as pool:
+            queue_timeout = float("inf") if budget_timeout is None else budget_timeout
+            futures = {pool.submit(self._answer, agent_name, prompt, use_cache, queue_timeout): i
+                       for i, prompt in enumerate(prompts)}
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    i = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # With no model attempted yet, the query was on its way to the primary.
+                        model_used = getattr(e, "model_used", self.primary_model)
+                        result = {"model_used": model_used, "response": f"LLM ERROR: {e}", "status": "ERROR"}
+                    results[i] = result
+                    if result["status"] in ("ERROR", BLOCKED):
+                        failed.append(i)
+                    pending_logs.append(self._log_entry(agent_name, prompts[i], result))
+                    if len(pending_logs) >= log_batch_size:
+                        self.memory_db.insert_logs(pending_logs)
+                        pending_logs = []
+                    if on_progress is not None:
+                        on_progress(done, len(prompts), i, result)
+            except BaseException:
+                for future in futures:
+                    future.cancel()  # Don't start prompts nobody will collect
+                raise
+            finally:
+                if pending_logs:
+                    self.memory_db.insert_logs(pending_logs)
+        failed.sort()
+        duration = time.monotonic() - started
+        print(f"Batch for {agent_name}: {len(prompts) - len(failed)}/{len(prompts)} succeeded in {duration:.2f}s.")
+        return {"results": results, "succeeded": len(prompts) - len(failed), "failed": failed, "duration": duration}
+
+    def stream_query(self, agent_name: str, prompt: str, use_cache: bool = True,
+                     cancel: CancelToken = None) -> QueryStream:
+        """
+        Like run_query, but the answer is yielded in chunks as it is generated (see
+        QueryStream). The fallback takes over only if the primary fails before producing
+        any output; output already yielded cannot be retracted, so a later failure ends the
+        stream with status ERROR and the partial response. Cancelling `cancel` (or
+        `stream.cancel`) from another thread kills the backend call and ends the stream.
+        """
+        stream = QueryStream(cancel)
+        stream._chunks = self._stream_query(agent_name, prompt, use_cache, stream)
+        return stream
+
+    def _stream_query(self, agent_name: str, prompt: str, use_cache: bool, stream: QueryStream):
+        started = time.monotonic()
+        key = None
+        if self.prompt_cache is not None and use_cache:
+            key = make_cache_key(agent_name, f"{self.primary_model}|{self.fallback_model}", prompt)
+            cached = self.prompt_cache.lookup(key)
+            if cached is not None:
+                print("Answered from prompt cache (cache).")
+                stream.ttft = time.monotonic() - started
+                yield cached["response"]
+                result = dict(cached, status="CACHED")
+                stream._finish(result, started)
+                self._log_result(agent_name, prompt, result)
+                return
+
+        verdict = self.guard.check(agent_name)
+        if verdict is not None:
+            result = self.guard.refusal(agent_name, verdict)
+            stream._finish(result, started)
+            self._log_result(agent_name, prompt, result)
+            return
+
+        candidates = self._candidates(agent_name)
+        prompt_tokens = estimate_tokens(prompt)
+        called = False
+        tripped = 0
+        result = None
+        with self.guard.track(agent_name, stream.cancel):
+            for i, (model_used, status, timeout) in enumerate(candidates):
+                if stream.cancel.cancelled:
+                    break
+                if not self._tryable(model_used, i, tripped, len(candidates)):
+                    tripped += 1
+                    continue
+                if not self._admit(model_used, agent_name, prompt_tokens, last_option=i == len(candidates) - 1):
+                    continue
+                called = True
+                print(f"Streaming query with model ({model_used}, timeout {timeout:.1f}s per chunk)...")
+                call_started = time.monotonic()
+                parts = []
+                try:
+                    with stream.cancel.linked() as attempt:
+                        for chunk in self._generate_stream(model_used, prompt, timeout, agent_name, attempt):
+                            if not parts:
+                                stream.ttft = time.monotonic() - started
+                                print(f"First output from {model_used} after {stream.ttft:.2f}s.")
+                            parts.append(chunk)
+                            yield chunk
+                except BackendError as e:
+                    print(f"Model ({model_used}) failed: {e}")
+                    if stream.cancel.cancelled:
+                        break
+                    if not parts:
+                        continue
+                    result = {"model_used": model_used, "response": "".join(parts).strip(), "status": "ERROR"}
+                    break
+                print(f"Model ({model_used}) succeeded.")
+                result = self._success(model_used, agent_name, status, prompt_tokens, "".join(parts).strip(),
+                                       time.monotonic() - call_started)
+                break
+
+        verdict = self.guard.paused(agent_name) if stream.cancel.cancelled else None
+        if result is None and verdict is not None:
+            result = self.guard.refusal(agent_name, verdict)
+        elif result is None and stream.cancel.cancelled:
+            print("Streaming query cancelled.")
+            stream._finish({"model_used": None, "response": "", "status": CANCELLED}, started)
+            return
+        if result is None:
+            response = LLM_ERROR_RESPONSE if called else RATE_LIMITED_RESPONSE
+            result = {"model_used": self.fallback_model, "response": response, "status": "ERROR"}
+        if key is not None and result["status"] in CACHEABLE_STATUSES:
+            self.prompt_cache.put(key, agent_name, result)
+        stream._finish(result, started)
+        self._log_result(agent_name, prompt, result)
+
+    def _log_entry(self, agent_name: str, prompt: str, result: dict, heal_of: int = None) -> dict:
+        """The llm_log row for a result, as insert_log keyword arguments."""
+        spent = result["status"] != "CACHED"  # Cached answers cost no tokens or model time
+        return {
+            "agent_name": agent_name,
+            "model_used": result["model_used"],
+            "prompt": prompt,
+            "response": result["response"],
+            "status": result["status"],
+            "prompt_tokens": result.get("prompt_tokens", 0) if spent else 0,
+            "response_tokens": result.get("response_tokens", 0) if spent else 0,
+            "duration_ms": result.get("duration_ms") if spent else None,
+            "heal_of": heal_of,
+        }
+
+    def _log_result(self, agent_name: str, prompt: str, result: dict, heal_of: int = None) -> str:
+        self.memory_db.insert_log(**self._log_entry(agent_name, prompt, result, heal_of))
+        return result["response"]
+
+    def _timeout(self, model: str, agent_name: str = None) -> float:
+        default = self.primary_timeout if model == self.primary_model else self.fallback_timeout
+        return self.latency.timeout(model, default, agent_name)
+
+    def latency_table(self) -> list:
+        """Latency percentiles and current timeouts per backend and agent, for dashboards."""
+        return self.latency.table()
+
+    def _generate(self, model: str, prompt: str, timeout: float, cancel: CancelToken = None,
+                  agent_name: str = None) -> tuple[str, float]:
+        """
+        Calls one backend and returns (response, latency in seconds). The outcome goes to the
+        backend's circuit breaker and the latency of successful calls to its histograms.
+        """
+        breaker = self.breakers.get(model)
+        started = time.monotonic()
         try:
-            # Attempt with primary model (Gemini CLI)
-            model_used = self.primary_model
-            gemini_command = ["npx", "@google/gemini-cli"]
-            gemini_process = subprocess.Popen(
-                gemini_command,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            response, error_output = gemini_process.communicate(input=prompt)
-            
-            print(f"Attempting query with primary model ({model_used})...")
-            gemini_result = subprocess.run(
-                gemini_command,
-                capture_output=True,
-                text=True,
-                timeout=15, # Timeout after 15 seconds
-                check=False # Do not raise CalledProcessError for non-zero exit codes yet
-            )
-
-            response = gemini_result.stdout.strip()
-            error_output = gemini_result.stderr.strip()
-
-            if not response or "quota" in error_output.lower() or "rate_limit" in error_output.lower() or "error" in error_output.lower():
-                raise ValueError(f"Gemini failed: {error_output if error_output else 'Empty response or unknown error.'}")
-            
-            status = "SUCCESS"
-            print(f"Primary model ({model_used}) succeeded.")
-
-        except (subprocess.TimeoutExpired, ValueError, FileNotFoundError, subprocess.CalledProcessError) as e:
-            print(f"Primary model ({model_used}) failed: {e}. Falling back to {self.fallback_model}...")
-            # Attempt with fallback model (Ollama)
-            model_used = self.fallback_model
-            ollama_command = ["ollama", "run", "gemma:2b", prompt]
+            response = self.backends[model].generate(prompt, timeout=timeout, cancel=cancel)
+        except BackendError:
+            if breaker is not None:
+                if cancel is not None and cancel.cancelled:
+                    breaker.record_cancelled()
+                else:
+                    breaker.record_failure()
+            raise
+        latency = time.monotonic() - started
+        self.latency.record(model, agent_name, latency)
+        if breaker is not None:
+            breaker.record_success(latency, slow=latency > timeout / 2)
+        return response, latency
+
+    def _generate_stream(self, model: str, prompt: str, timeout: float, agent_name: str = None,
+                         cancel: CancelToken = None):
+        """Streaming _generate: yields chunks; the breaker and histograms see the whole call."""
+        breaker = self.breakers.get(model)
+        started = time.monotonic()
+        first_chunk = None
+        try:
+            for chunk in self.backends[model].stream(prompt, timeout=timeout, cancel=cancel):
+                if first_chunk is None:
+                    first_chunk = time.monotonic() - started
+                yield chunk
+        except BackendError:
+            if breaker is not None:
+                if cancel is not None and cancel.cancelled:
+                    breaker.record_cancelled()
+                else:
+                    breaker.record_failure()
+            raise
+        except GeneratorExit:
+            if breaker is not None:
+                breaker.record_cancelled()
+            raise
+        latency = time.monotonic() - started
+        self.latency.record(model, agent_name, latency)
+        if breaker is not None:
+            # `timeout` bounds each chunk, so only the wait for the first one can be slow.
+            breaker.record_success(latency, slow=(first_chunk or 0.0) > timeout / 2)
+
+    def _allowed(self, model: str) -> bool:
+        breaker = self.breakers.get(model)
+        if breaker is None or breaker.allow_request():
+            return True
+        print(f"Circuit open for {model}; skipping it (retry in {breaker.retry_after():.0f}s).")
+        return False
+
+    def _over_budget(self, model: str):
+        """Called when the rate limiter refused `model`; frees a half-open probe slot it was given."""
+        breaker = self.breakers.get(model)
+        if breaker is not None:
+            breaker.record_cancelled()
+        print(f"Budget exhausted for {model}; skipping it.")
+
+    def _admit(self, model: str, agent_name: str, prompt_tokens: int, last_option: bool,
+               queue_timeout: float = None) -> bool:
+        """Takes budget for a call; only the last option queues (default: the arbiter's queue_timeout)."""
+        if not last_option:
+            timeout = 0.0
+        else:
+            timeout = self.queue_timeout if queue_timeout is None else queue_timeout
+        if self.rate_limiter.acquire(model, agent_name, prompt_tokens, timeout):
+            return True
+        self._over_budget(model)
+        return False
+
+    def _success(self, model: str, agent_name: str, status: str, prompt_tokens: int, response: str,
+                 latency: float) -> dict:
+        response_tokens = estimate_tokens(response)
+        self.rate_limiter.charge(model, agent_name, response_tokens)
+        return {"model_used": model, "response": response, "status": status,
+                "prompt_tokens": prompt_tokens, "response_tokens": response_tokens,
+                "duration_ms": int(latency * 1000)}
+
+    def backend_health(self) -> list:
+        """Circuit state and health score per backend, for dashboards."""
+        return [breaker.health() for breaker in self.breakers.values()]
+
+    def probe_open_backends(self, prompt: str = "ping", timeout: float = 10) -> dict:
+        """
+        Sends a probe to every backend whose breaker cool-down has ended, so the primary is
+        restored without waiting for real traffic. Returns {backend: recovered}.
+        """
+        results = {}
+        for model, breaker in self.breakers.items():
+            breaker.sync()
+            if breaker.state != OPEN or breaker.retry_after() > 0 or not breaker.allow_request():
+                continue
             try:
-                ollama_result = subprocess.run(
-                    ollama_command,
-                    capture_output=True,
-                    text=True,
-                    check=True, # Raise CalledProcessError for non-zero exit codes
-                    timeout=30 # Allow a longer timeout for Ollama
-                )
-                response = ollama_result.stdout.strip()
-                if not response:
-                    raise ValueError("Ollama failed: Empty response.")
-                
-                status = "FALLBACK"
-                print(f"Fallback model ({model_used}) succeeded.")
-
-            except (subprocess.CalledProcessError, FileNotFoundError, ValueError, subprocess.TimeoutExpired) as e_fallback:
-                print(f"Fallback model ({model_used}) also failed: {e_fallback}")
-                response = "LLM ERROR: Both primary and fallback models failed to provide a valid response."
-                status = "ERROR"
+                self._generate(model, prompt, timeout)
+                results[model] = True
+            except BackendError as e:
+                print(f"Probe of {model} failed: {e}")
+                results[model] = False
+        return results
+
+    def _candidates(self, agent_name: str) -> list:
+        """(model, status, timeout) for each model to try in order; circuits are checked by _tryable."""
+        return [
+            (self.primary_model, "SUCCESS", self._timeout(self.primary_model, agent_name)),
+            (self.fallback_model, "FALLBACK", self._timeout(self.fallback_model, agent_name)),
+        ]
+
+    def _tryable(self, model: str, index: int, tripped: int, count: int) -> bool:
+        """
+        Whether the candidate at `index` may be called, asked only when it is about to be:
+        in HALF_OPEN that takes the breaker's one probe slot, which a model that is never
+        called would hold until the slot expires. `tripped` counts the earlier candidates
+        whose circuit was open; if that is all of them, the last one is tried regardless
+        rather than fail without a call.
+        """
+        return self._allowed(model) or (index == count - 1 and tripped == index)
+
+    def _query_models(self, agent_name: str, prompt: str, queue_timeout: float = None,
+                      cancel: CancelToken = None) -> dict:
+        """
+        Tries the primary model, then the fallback. Returns model_used/response/status and
+        the token counts charged to the model's budget; an agent held by the LoopGuardian
+        gets a BLOCKED result instead, and a query stopped through `cancel` a CANCELLED one.
+        """
+        verdict = self.guard.check(agent_name)
+        if verdict is not None:
+            return self.guard.refusal(agent_name, verdict)
+        candidates = self._candidates(agent_name)
+        prompt_tokens = estimate_tokens(prompt)
+        called = False
+        tripped = 0
+        cancel = cancel or CancelToken()
+        with self.guard.track(agent_name, cancel):
+            for i, (model_used, status, timeout) in enumerate(candidates):
+                if cancel.cancelled:
+                    break
+                if not self._tryable(model_used, i, tripped, len(candidates)):
+                    tripped += 1
+                    continue
+                if not self._admit(model_used, agent_name, prompt_tokens, last_option=i == len(candidates) - 1,
+                                   queue_timeout=queue_timeout):
+                    continue
+                called = True
+                print(f"Attempting query with model ({model_used}, timeout {timeout:.1f}s)...")
+                try:
+                    with cancel.linked() as attempt:
+                        response, latency = self._generate(model_used, prompt, timeout, attempt, agent_name)
+                    print(f"Model ({model_used}) succeeded.")
+                    return self._success(model_used, agent_name, status, prompt_tokens, response, latency)
+                except BackendError as e:
+                    print(f"Model ({model_used}) failed: {e}")
+                except Exception as e:
+                    raise QueryError(model_used, e) from e
+
+        if cancel.cancelled:
+            verdict = self.guard.paused(agent_name)
+            if verdict is not None:
+                return self.guard.refusal(agent_name, verdict)
+            print("Query cancelled.")
+            return {"model_used": None, "response": "", "status": CANCELLED}
+
+        response = LLM_ERROR_RESPONSE if called else RATE_LIMITED_RESPONSE
+        return {"model_used": self.fallback_model, "response": response, "status": "ERROR"}
+
+    # --- asyncio API ---
+
+    async def arun_query(self, agent_name: str, prompt: str, use_cache: bool = True) -> str:
+        """Async run_query: hedges the fallback against a slow primary and logs one row."""
+        if self.prompt_cache is None or not use_cache:
+            result = await self._aquery_models(agent_name, prompt)
+            return self._log_result(agent_name, prompt, result)
+
+        key = make_cache_key(agent_name, f"{self.primary_model}|{self.fallback_model}", prompt)
+        cached = await asyncio.to_thread(self.prompt_cache.lookup, key)
+        if cached is not None:
+            return self._log_result(agent_name, prompt, dict(cached, status="CACHED"))
+
+        flight = self._async_in_flight.get(key)
+        if flight is not None:
+            result = await asyncio.shield(flight)
+            return self._log_result(agent_name, prompt, self._shared_result(result))
+
+        flight = self._async_in_flight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._aquery_models(agent_name, prompt)
+            flight.set_result(result)
+        except BaseException as e:
+            flight.set_exception(e)
+            flight.exception()  # Mark retrieved; waiters (if any) still receive it
+            raise
         finally:
-            self.memory_db.insert_log(
-                agent_name=agent_name,
-                model_used=model_used,
-                prompt=prompt,
-                response=response,
-                status=status
-            )
-            return response
\ No newline at end of file
+            del self._async_in_flight[key]
+        if result["status"] in CACHEABLE_STATUSES:
+            await asyncio.to_thread(self.prompt_cache.put, key, agent_name, result)
+        return self._log_result(agent_name, prompt, result)
+
+    async def run_many(self, queries: list, use_cache: bool = True) -> list:
+        """Runs (agent_name, prompt) pairs concurrently; responses are returned in input order."""
+        return await asyncio.gather(*(self.arun_query(agent, prompt, use_cache) for agent, prompt in queries))
+
+    def _limit(self, model: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._limits_loop is not loop:
+            # Semaphores belong to one event loop; start fresh under a new one.
+            self._limits, self._limits_loop = {}, loop
+        if model not in self._limits:
+            self._limits[model] = asyncio.Semaphore(self.concurrency.get(model, 4))
+        return self._limits[model]
+
+    def _current_hedge_delay(self, agent_name: str = None):
+        if self.hedge_percentile is not None:
+            observed = self.latency.percentile(self.primary_model, self.hedge_percentile, agent_name)
+            if observed is not None:
+                return observed
+        return self.hedge_delay
+
+    async def _acall(self, model: str, prompt: str, timeout: float, cancel: CancelToken,
+                     agent_name: str = None) -> tuple[str, float]:
+        async with self._limit(model):
+            print(f"Attempting query with model ({model}, timeout {timeout:.1f}s)...")
+            return await asyncio.to_thread(self._generate, model, prompt, timeout, cancel, agent_name)
+
+    async def _aquery_models(self, agent_name: str, prompt: str) -> dict:
+        """
+        Starts the primary; starts the fallback when the primary fails, is over budget or is
+        still running after the hedge delay. The first valid answer wins and the other call
+        is cancelled.
+        """
+        verdict = self.guard.check(agent_name)
+        if verdict is not None:
+            return self.guard.refusal(agent_name, verdict)
+        attempts = {}  # task -> (model, status, cancel token)
+        prompt_tokens = estimate_tokens(prompt)
+        paused = CancelToken()  # Cancelled by the guard if the agent is paused mid-query
+
+        def start(model, status):
+            token = CancelToken()
+            unlink = paused.on_cancel(token.cancel)
+            task = asyncio.create_task(self._acall(model, prompt, self._timeout(model, agent_name), token, agent_name))
+            task.add_done_callback(lambda _: unlink())
+            attempts[task] = (model, status, token)
+            return task
+
+        async def start_fallback(force: bool = False, queue: bool = True):
+            if not (force or self._allowed(self.fallback_model)):
+                return None
+            # A hedge is optional, so it never waits for budget; a real fallback may queue.
+            timeout = self.queue_timeout if queue else 0.0
+            if not await self.rate_limiter.acquire_async(self.fallback_model, agent_name, prompt_tokens, timeout):
+                self._over_budget(self.fallback_model)
+                return None
+            return start(self.fallback_model, "FALLBACK")
+
+        primary = fallback = None
+        primary_open = not self._allowed(self.primary_model)
+        if not primary_open:
+            if self.rate_limiter.reserve(self.primary_model, agent_name, prompt_tokens) == 0:
+                primary = start(self.primary_model, "SUCCESS")
+            else:
+                self._over_budget(self.primary_model)
+        if primary is None:
+            # With both circuits open, still try the fallback rather than fail without a call.
+            fallback = await start_fallback(force=primary_open)
+            if fallback is None:
+                return {"model_used": self.fallback_model, "response": RATE_LIMITED_RESPONSE, "status": "ERROR"}
+        with self.guard.track(agent_name, paused):
+            try:
+                delay = self._current_hedge_delay(agent_name)
+                if primary is not None and delay is not None:
+                    await asyncio.wait({primary}, timeout=delay)
+                    if not primary.done() and not paused.cancelled:
+                        print(f"Primary model ({self.primary_model}) slower than {delay:.2f}s; hedging with {self.fallback_model}...")
+                        fallback = await start_fallback(queue=False)
+
+                pending = set(attempts)
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        model, status, _ = attempts[task]
+                        if task.exception() is None:
+                            print(f"Model ({model}) succeeded.")
+                            return self._success(model, agent_name, status, prompt_tokens, *task.result())
+                        print(f"Model ({model}) failed: {task.exception()}")
+                        if task is primary and fallback is None and not paused.cancelled:
+                            fallback = await start_fallback()
+                            if fallback is not None:
+                                pending.add(fallback)
+            finally:
+                for task, (_, _, token) in attempts.items():
+                    if not task.done():
+                        token.cancel()
+                        task.cancel()
+        verdict = self.guard.paused(agent_name) if paused.cancelled else None
+        if verdict is not None:
+            return self.guard.refusal(agent_name, verdict)
+        return {"model_used": self.fallback_model, "response": LLM_ERROR_RESPONSE, "status": "ERROR"}
+
+    def close(self):
+        """Stops warm backend workers and connections."""
+        for backend in self.backends.values():
+            backend.close()
@@ -0,0 +1,521 @@
+# reliakit/model_backends.py
+import codecs
+import http.client
+import json
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+from urllib.parse import urlparse
+
+
+class BackendError(Exception):
+    """A model backend failed to produce a usable response."""
+
+
+def _check_stderr(name: str, error_output: str):
+    lowered = error_output.lower()
+    if "quota" in lowered or "rate_limit" in lowered or "error" in lowered:
+        raise BackendError(f"{name} failed: {error_output}")
+
+
+class CancelToken:
+    """
+    Lets another thread abandon an in-flight generate() call, e.g. the losing side of a
+    hedged request. Backends register a callback that kills their process or connection,
+    and remove it before that process or connection goes back to a pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self.cancelled = False
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, {}
+        for callback in callbacks.values():
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback):
+        """
+        Runs `callback` on cancellation (immediately if already cancelled). Returns a
+        function that unregisters it, for when the callback's target outlives the call.
+        """
+        key = object()
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks[key] = callback
+                return lambda: self._remove(key)
+        callback()
+        return lambda: None
+
+    @contextmanager
+    def linked(self):
+        """A fresh token, cancelled along with this one while the block runs (one per attempt)."""
+        child = CancelToken()
+        unlink = self.on_cancel(child.cancel)
+        try:
+            yield child
+        finally:
+            unlink()
+
+    def _remove(self, key):
+        with self._lock:
+            self._callbacks.pop(key, None)
+
+
+class ModelBackend:
+    """A way of getting a completion for a prompt from one model."""
+
+    name = "backend"
+
+    def generate(self, prompt: str, timeout: float, cancel: Optional[CancelToken] = None) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, timeout: float, cancel: Optional[CancelToken] = None):
+        """
+        Yields the completion in chunks as the model produces them. `timeout` bounds the
+        wait for each chunk rather than the whole generation. Backends that cannot stream
+        yield the full response once.
+        """
+        yield self.generate(prompt, timeout, cancel)
+
+    def close(self):
+        pass
+
+
+def _pump(pipe, chunks: queue.Queue):
+    """Reader thread: forwards raw output as it arrives; None marks EOF."""
+    try:
+        for data in iter(lambda: os.read(pipe.fileno(), 4096), b""):
+            chunks.put(data)
+    except OSError:
+        pass
+    chunks.put(None)
+
+
+class OneShotCLIBackend(ModelBackend):
+    """Runs `command` once per prompt, feeding the prompt on stdin."""
+
+    def __init__(self, name: str, command: list):
+        self.name = name
+        self.command = command
+
+    def generate(self, prompt: str, timeout: float, cancel: Optional[CancelToken] = None) -> str:
+        try:
+            process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE, text=True)
+        except OSError as e:
+            raise BackendError(f"{self.name} failed: {e}") from e
+        unlink = cancel.on_cancel(process.kill) if cancel is not None else None
+        try:
+            stdout, stderr = process.communicate(input=prompt, timeout=timeout)
+        except subprocess.TimeoutExpired as e:
+            process.kill()
+            process.communicate()
+            raise BackendError(f"{self.name} failed: {e}") from e
+        finally:
+            if unlink is not None:
+                unlink()
+        if cancel is not None and cancel.cancelled:
+            raise BackendError(f"{self.name} cancelled")
+        response = stdout.strip()
+        _check_stderr(self.name, stderr.strip())
+        if process.returncode != 0 or not response:
+            raise BackendError(f"{self.name} failed: exit code {process.returncode}, {stderr.strip() or 'empty response'}")
+        return response
+
+    def stream(self, prompt: str, timeout: float, cancel: Optional[CancelToken] = None):
+        try:
+            process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE)
+        except OSError as e:
+            raise BackendError(f"{self.name} failed: {e}") from e
+        unlink = cancel.on_cancel(process.kill) if cancel is not None else None
+        chunks = queue.Queue()
+        stderr = []
+        threading.Thread(target=_pump, args=(process.stdout, chunks), daemon=True).start()
+        stderr_reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+        stderr_reader.start()
+        try:
+            process.stdin.write(prompt.encode())
+            process.stdin.close()
+        except OSError:
+            pass  # The process exited early; its exit code and stderr say why
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        produced = False
+        try:
+            while True:
+                try:
+                    data = chunks.get(timeout=timeout)
+                except queue.Empty:
+                    raise BackendError(f"{self.name} failed: no output for {timeout}s")
+                text = decoder.decode(data or b"", final=data is None)
+                if text.strip() or (produced and text):
+                    produced = True
+                    yield text
+                if data is None:
+                    break
+            process.wait(timeout=timeout)
+            stderr_reader.join(timeout=timeout)
+        finally:
+            if unlink is not None:
+                unlink()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        if cancel is not None and cancel.cancelled:
+            raise BackendError(f"{self.name} cancelled")
+        error_output = (stderr[0] if stderr else b"").decode(errors="replace").strip()
+        _check_stderr(self.name, error_output)
+        if process.returncode != 0 or not produced:
+            raise BackendError(f"{self.name} failed: exit code {process.returncode}, {error_output or 'empty response'}")
+
+
+class _Worker:
+    """
+    One long-lived process speaking line-delimited JSON: it reads {"id", "prompt"} objects
+    on stdin and answers each with {"id", "response"} or {"id", "error"} on stdout. A
+    worker may send {"id", "chunk"} lines with partial output first, in which case the
+    final "response" may be omitted.
+    """
+
+    def __init__(self, command: list):
+        self.command = command
+        self.process = None
+        self._lines = None
+        self._next_id = 0
+
+    def _start(self):
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+        self._lines = queue.Queue()
+        threading.Thread(target=self._read_stdout, args=(self.process, self._lines), daemon=True).start()
+
+    @staticmethod
+    def _read_stdout(process, lines):
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)  # EOF: the worker exited
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def replies(self, prompt: str, timeout: float, idle_timeout: bool = False):
+        """
+        Sends one prompt and yields its replies up to and including the final one. The
+        timeout covers the whole exchange, or each reply when `idle_timeout` is set.
+        """
+        if not self.alive():
+            self._start()
+        self._next_id += 1
+        request_id = self._next_id
+        process, lines = self.process, self._lines  # stop() from a cancelling thread may clear self.process
+        process.stdin.write(json.dumps({"id": request_id, "prompt": prompt}) + "\n")
+        process.stdin.flush()
+        deadline = time.monotonic() + timeout
+        finished = False
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(self.command, timeout)
+                try:
+                    line = lines.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+                if line is None:
+                    raise BackendError("worker process exited")
+                try:
+                    reply = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Ignore banners or log lines on stdout
+                if reply.get("id") != request_id:
+                    continue
+                if "chunk" not in reply:
+                    finished = True
+                    yield reply
+                    return
+                yield reply
+                if idle_timeout:
+                    deadline = time.monotonic() + timeout
+        finally:
+            if not finished:
+                # Replies may still arrive later; a fresh process avoids reading them as the next answer.
+                self.stop()
+
+    def request(self, prompt: str, timeout: float) -> dict:
+        """Sends one prompt and returns its final reply; partial chunks are concatenated."""
+        parts = []
+        for reply in self.replies(prompt, timeout):
+            if "chunk" in reply:
+                parts.append(reply["chunk"])
+            elif parts and not reply.get("error") and not reply.get("response"):
+                return dict(reply, response="".join(parts))
+            else:
+                return reply
+
+    def stop(self):
+        if self.process is not None:
+            try:
+                self.process.kill()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+            self.process = None
+
+
+class WorkerPoolBackend(ModelBackend):
+    """
+    Keeps up to `pool_size` warm worker processes (see _Worker) and reuses them across
+    prompts, so interpreter/runtime start-up is paid once per worker instead of per call.
+    """
+
+    def __init__(self, name: str, command: list, pool_size: int = 2):
+        self.name = name
+        self.command = command
+        self.pool_size = pool_size
+        self._idle = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._idle.put(_Worker(command))
+
+    def generate(self, prompt: str, timeout: float, cancel: Optional[CancelToken] = None) -> str:
+        started = time.monotonic()
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise BackendError(f"{self.name} failed: no free worker within {timeout}s")
+        # Killing the worker makes request() see EOF; it is restarted on next use.
+        unlink = cancel.on_cancel(worker.stop) if cancel is not None else None
+        try:
+            reply = worker.request(prompt, timeout - (time.monotonic() - started))
+        except (subprocess.TimeoutExpired, OSError, BackendError) as e:
+            raise BackendError(f"{self.name} failed: {e}") from e
+        finally:
+            if unlink is not None:
+                unlink() # The worker must not be stopped under its next user
+            self._idle.put(worker)
+        if reply.get("error"):
+            raise BackendError(f"{self.name} failed: {reply['error']}")
+        response = (reply.get("response") or "").strip()
+        if not response:
+            raise BackendError(f"{self.name} failed: Empty response.")
+        return response
+
+    def stream(self, prompt: str, timeout: float, cancel: Optional[CancelToken] = None):
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise BackendError(f"{self.name} failed: no free worker within {timeout}s")
+        unlink = cancel.on_cancel(worker.stop) if cancel is not None else None
+        produced = False
+        error = None
+        try:
+            for reply in worker.replies(prompt, timeout, idle_timeout=True):
+                if reply.get("error"):
+                    error = reply["error"]
+                    break
+                # A final "response" after chunks repeats them; only a non-streaming worker's counts.
+                text = reply["chunk"] if "chunk" in reply else ("" if produced else reply.get("response") or "")
+                if text.strip() or (produced and text):
+                    produced = True
+                    yield text
+        except (subprocess.TimeoutExpired, OSError, BackendError) as e:
+            raise BackendError(f"{self.name} failed: {e}") from e
+        finally:
+            if unlink is not None:
+                unlink()
+            self._idle.put(worker)
+        if error:
+            raise BackendError(f"{self.name} failed: {error}")
+        if not produced:
+            raise BackendError(f"{self.name} failed: Empty response.")
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                return
+
+
+class OllamaHTTPBackend(ModelBackend):
+    """
+    Talks to a local Ollama server's /api/generate over a pool of keep-alive HTTP connections.
+    The server keeps the model loaded between calls, so no process is spawned per prompt.
+    """
+
+    def __init__(self, model: str = "gemma:2b", host: Optional[str] = None, pool_size: int = 4,
+                 keep_alive: str = "10m"):
+        self.model = model
+        self.name = f"ollama:{model}"
+        self.keep_alive = keep_alive
+        url = urlparse(host or os.getenv("OLLAMA_HOST", "http://localhost:11434"))
+        self.host = url.hostname or "localhost"
+        self.port = url.port or 11434
+        self.pool_size = pool_size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _open(self, conn: http.client.HTTPConnection, body: bytes) -> http.client.HTTPResponse:
+        conn.request("POST", "/api/generate", body=body, headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        if resp.status != 200:
+            raise BackendError(f"{self.name} failed: HTTP {resp.status} {resp.read()[:200]!r}")
+        return resp
+
+    def _open_with_retry(self, conn: http.client.HTTPConnection, body: bytes,
+                         cancel: Optional[CancelToken] = None) -> http.client.HTTPResponse:
+        try:
+            return self._open(conn, body)
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            if cancel is not None and cancel.cancelled:
+                raise # Disconnected by our own abort, not by the server
+            # The server closed an idle keep-alive connection; retry once on a fresh one.
+            conn.close()
+            return self._open(conn, body)
+
+    def _connection(self, timeout: float, cancel: Optional[CancelToken]) -> tuple:
+        """An idle or new connection, and the function that detaches it from `cancel` again."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        if cancel is None:
+            return conn, lambda: None
+        unlink = cancel.on_cancel(lambda: self._abort(conn))
+        if cancel.cancelled: # Before the call started; the abort has already run
+            raise BackendError(f"{self.name} cancelled")
+        return conn, unlink
+
+    @staticmethod
+    def _abort(conn: http.client.HTTPConnection):
+        """
+        Ends a read blocked on `conn`. close() alone does not: the response holds its own
+        reference to the socket, so the read only returns once the server answers or the
+        timeout expires. Shutting the socket down makes it return at once.
+        """
+        sock = conn.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        conn.close()
+
+    def _body(self, prompt: str, stream: bool) -> bytes:
+        return json.dumps({"model": self.model, "prompt": prompt, "stream": stream,
+                           "keep_alive": self.keep_alive}).encode()
+
+    def generate(self, prompt: str, timeout: float, cancel: Optional[CancelToken] = None) -> str:
+        if not self._slots.acquire(timeout=timeout):
+            raise BackendError(f"{self.name} failed: no free connection within {timeout}s")
+        try:
+            conn, unlink = self._connection(timeout, cancel)
+            try:
+                payload = json.loads(self._open_with_retry(conn, self._body(prompt, stream=False), cancel).read())
+            except Exception as e:
+                conn.close()
+                # An aborted read can fail in http.client itself, not only with OSError.
+                if cancel is not None and cancel.cancelled:
+                    raise BackendError(f"{self.name} cancelled") from e
+                if isinstance(e, (OSError, http.client.HTTPException, ValueError)):
+                    raise BackendError(f"{self.name} failed: {e}") from e
+                raise
+            finally:
+                unlink()
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+        response = (payload.get("response") or "").strip()
+        if not response:
+            raise BackendError(f"{self.name} failed: Empty response.")
+        return response
+
+    def stream(self, prompt: str, timeout: float, cancel: Optional[CancelToken] = None):
+        """Streams /api/generate's newline-delimited JSON; the socket timeout bounds each chunk."""
+        if not self._slots.acquire(timeout=timeout):
+            raise BackendError(f"{self.name} failed: no free connection within {timeout}s")
+        produced = False
+        try:
+            conn, unlink = self._connection(timeout, cancel)
+            try:
+                resp = self._open_with_retry(conn, self._body(prompt, stream=True), cancel)
+                for line in resp:
+                    if not line.strip():
+                        continue
+                    part = json.loads(line)
+                    if part.get("error"):
+                        raise BackendError(f"{self.name} failed: {part['error']}")
+                    text = part.get("response") or ""
+                    if text.strip() or (produced and text):
+                        produced = True
+                        yield text
+                    if part.get("done"):
+                        break
+                resp.read()  # Drain the rest so the connection can be reused
+                if cancel is not None and cancel.cancelled:
+                    raise BackendError(f"{self.name} cancelled") # The abort ended the response early
+            except BackendError:
+                conn.close()
+                raise
+            except Exception as e:
+                conn.close()
+                # An aborted chunked read can fail in http.client itself, not only with OSError.
+                if cancel is not None and cancel.cancelled:
+                    raise BackendError(f"{self.name} cancelled") from e
+                if isinstance(e, (OSError, http.client.HTTPException, ValueError)):
+                    raise BackendError(f"{self.name} failed: {e}") from e
+                raise
+            except BaseException:
+                conn.close()  # Abandoned mid-response; the connection cannot be reused
+                raise
+            finally:
+                unlink()
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+        if not produced:
+            raise BackendError(f"{self.name} failed: Empty response.")
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def gemini_backend(pool_size: int = 2) -> ModelBackend:
+    """
+    The Gemini backend. If RELIAKIT_GEMINI_WORKER names a command that speaks the worker
+    protocol, that many warm workers are kept; otherwise the CLI is run once per prompt,
+    preferring an installed `gemini` binary over `npx` to skip npx's package resolution.
+    """
+    worker_command = os.getenv("RELIAKIT_GEMINI_WORKER")
+    if worker_command:
+        return WorkerPoolBackend("gemini", worker_command.split(), pool_size=pool_size)
+    installed = shutil.which("gemini")
+    command = [installed] if installed else ["npx", "@google/gemini-cli"]
+    return OneShotCLIBackend("gemini", command)
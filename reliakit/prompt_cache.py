@@ -0,0 +1,169 @@
+# reliakit/prompt_cache.py
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Only answers that came from a model are worth replaying; errors are always retried.
+CACHEABLE_STATUSES = {"SUCCESS", "FALLBACK"}
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapses whitespace so trivially reformatted prompts share a cache entry."""
+    return re.sub(r"\s+", " ", prompt or "").strip()
+
+
+def make_cache_key(agent_name: str, model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{agent_name}\0{model}\0{normalize_prompt(prompt)}".encode()).hexdigest()
+
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+class PromptCache:
+    """
+    Prompt -> response cache for ModelArbiter with single-flight request coalescing.
+    Entries live in a memory-bounded LRU with a TTL and, if `store` (a MemoryDB) is given,
+    are written through to its prompt_cache table so they survive restarts. Expired rows
+    are deleted from the table by put(), at most once every `purge_interval` seconds.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: float = 3600.0, store=None,
+                 purge_interval: float = 300.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.store = store
+        self.purge_interval = purge_interval
+        self._last_purge = float("-inf")
+        self._entries = OrderedDict()  # key -> (expires_at, size, entry)
+        self._bytes = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _size(key: str, entry: dict) -> int:
+        return len(key) + sum(len(str(v)) for v in entry.values()) + 64
+
+    def _remember(self, key: str, entry: dict, expires_at: float):
+        """Adds an entry to the in-memory LRU. Caller holds the lock."""
+        size = self._size(key, entry)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (expires_at, size, entry)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def _lookup(self, key: str) -> Optional[dict]:
+        """Checks memory, then the persistent store. Caller holds the lock."""
+        item = self._entries.get(key)
+        if item is not None:
+            if item[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[2]
+            self._bytes -= item[1]
+            del self._entries[key]
+        if self.store is not None:
+            row = self.store.get_prompt_cache(key)
+            if row is not None:
+                entry = {k: row[k] for k in ("model_used", "response", "status")}
+                remaining = row["expires_us"] / 1_000_000 - time.time()
+                self._remember(key, entry, time.monotonic() + remaining)
+                self.store_hits += 1
+                return entry
+        return None
+
+    def lookup(self, key: str) -> Optional[dict]:
+        """Returns the cached entry for `key` without computing anything on a miss."""
+        with self._lock:
+            return self._lookup(key)
+
+    def get_or_compute(self, key: str, agent_name: str, compute) -> tuple[dict, str]:
+        """
+        Returns (entry, source) where entry has model_used/response/status and source is
+        "cache", "coalesced" (waited on an identical in-flight call) or "computed".
+        `compute()` runs at most once per key at a time.
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry, "cache"
+            flight = self._in_flight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._in_flight[key] = _InFlight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.entry, "coalesced"
+
+        try:
+            flight.entry = compute()
+            if flight.entry["status"] in CACHEABLE_STATUSES:
+                self.put(key, agent_name, flight.entry)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.event.set()
+        return flight.entry, "computed"
+
+    def put(self, key: str, agent_name: str, entry: dict):
+        with self._lock:
+            self._remember(key, entry, time.monotonic() + self.ttl)
+        if self.store is not None:
+            try:
+                self.store.put_prompt_cache(
+                    key, agent_name, entry["model_used"], entry["response"], entry["status"],
+                    time.time_ns() // 1000 + int(self.ttl * 1_000_000),
+                )
+            except Exception as e:
+                print(f"Error persisting prompt cache entry: {e}")
+            self._purge_expired()
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = now
+        try:
+            purged = self.store.purge_prompt_cache()
+            if purged:
+                print(f"Purged {purged} expired prompt cache entries.")
+        except Exception as e:
+            print(f"Error purging prompt cache: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
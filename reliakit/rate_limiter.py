@@ -0,0 +1,184 @@
+# reliakit/rate_limiter.py
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_WINDOW_SECONDS = 60.0
+DEFAULT_REQUESTS_PER_WINDOW = 60
+# Per-model token budgets; overridden by the TokenWeaver agent's config.thresholds.
+DEFAULT_TOKEN_THRESHOLDS = {"gemini": 5000, "claude": 3000, "ollama": 10000}
+TOKEN_THRESHOLDS_PATH = Path(__file__).resolve().parent.parent / "generated_configs" / "new_agents.jsonl"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token); good enough for budgeting."""
+    return max(1, len(text or "") // 4)
+
+
+def load_token_thresholds(config_path: Path = TOKEN_THRESHOLDS_PATH) -> dict:
+    """Reads the TokenWeaver agent's per-model token thresholds from new_agents.jsonl."""
+    thresholds = dict(DEFAULT_TOKEN_THRESHOLDS)
+    if config_path.exists():
+        with open(config_path, 'r') as f:
+            for line in f:
+                try:
+                    agent_data = json.loads(line.strip())
+                except json.JSONDecodeError:
+                    continue
+                if agent_data.get("name") == "TokenWeaver":
+                    thresholds.update(agent_data.get("config", {}).get("thresholds", {}))
+    return thresholds
+
+
+class TokenBucket:
+    """Holds up to `capacity` units, refilled continuously at capacity per `window_seconds`."""
+
+    def __init__(self, capacity: float, window_seconds: float):
+        self.capacity = capacity
+        self.rate = capacity / window_seconds
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (0 if now). A full bucket admits oversized requests."""
+        self._refill()
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount: float):
+        """Takes `amount`; the level may go negative, which delays later requests."""
+        self._refill()
+        self.level -= amount
+
+
+class RateLimiter:
+    """
+    Proactive request and token budgets per backend, and per agent within each backend.
+
+    Each backend gets `requests_per_window` calls and `thresholds[prefix]` tokens per
+    `window_seconds` (the prefix being the part of the backend name before ':'), and no
+    single agent may use more than `agent_share` of either, so one chatty agent cannot
+    exhaust a model for everyone. `reserve` admits a call only if every bucket has room;
+    `charge` adds the response tokens once they are known. With a `store` (a MemoryDB),
+    spending recorded on llm_log within the last window is replayed at start-up, so a
+    restart does not hand out a fresh budget.
+    """
+
+    def __init__(self, thresholds: Optional[dict] = None, requests_per_window: int = DEFAULT_REQUESTS_PER_WINDOW,
+                 window_seconds: float = DEFAULT_WINDOW_SECONDS, agent_share: float = 0.5, store=None):
+        self.thresholds = load_token_thresholds() if thresholds is None else thresholds
+        self.requests_per_window = requests_per_window
+        self.window_seconds = window_seconds
+        self.agent_share = agent_share
+        self._buckets = {}  # (backend, agent or None) -> (request bucket, token bucket)
+        self._lock = threading.Lock()
+        self.throttled = 0
+        if store is not None:
+            self.restore(store)
+
+    def _token_budget(self, backend: str) -> Optional[float]:
+        return self.thresholds.get(backend, self.thresholds.get(backend.split(":", 1)[0]))
+
+    def _buckets_for(self, backend: str, agent_name: str) -> list:
+        """Returns the request/token buckets a call must fit in. Caller holds the lock."""
+        buckets = []
+        for key, share in (((backend, None), 1.0), ((backend, agent_name), self.agent_share)):
+            pair = self._buckets.get(key)
+            if pair is None:
+                tokens = self._token_budget(backend)
+                pair = self._buckets[key] = (
+                    TokenBucket(max(1.0, self.requests_per_window * share), self.window_seconds),
+                    TokenBucket(tokens * share, self.window_seconds) if tokens else None,
+                )
+            buckets.append(pair)
+        return buckets
+
+    def reserve(self, backend: str, agent_name: str, tokens: int) -> float:
+        """
+        Takes one request and `tokens` from the backend's and the agent's budgets if all of
+        them have room and returns 0. Otherwise takes nothing and returns the seconds to wait.
+        """
+        with self._lock:
+            buckets = self._buckets_for(backend, agent_name)
+            wait = 0.0
+            for requests, token_bucket in buckets:
+                wait = max(wait, requests.wait_time(1))
+                if token_bucket is not None:
+                    wait = max(wait, token_bucket.wait_time(tokens))
+            if wait > 0:
+                self.throttled += 1
+                return wait
+            for requests, token_bucket in buckets:
+                requests.take(1)
+                if token_bucket is not None:
+                    token_bucket.take(tokens)
+            return 0.0
+
+    def acquire(self, backend: str, agent_name: str, tokens: int, timeout: float = 0.0) -> bool:
+        """Reserves, queueing for up to `timeout` seconds. False if the budget stays exhausted."""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.reserve(backend, agent_name, tokens)
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, backend: str, agent_name: str, tokens: int, timeout: float = 0.0) -> bool:
+        """acquire() for coroutines: waits without blocking the event loop."""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.reserve(backend, agent_name, tokens)
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+    def charge(self, backend: str, agent_name: str, tokens: int):
+        """Spends tokens that were not known at reserve() time, e.g. the response."""
+        with self._lock:
+            for _, token_bucket in self._buckets_for(backend, agent_name):
+                if token_bucket is not None:
+                    token_bucket.take(tokens)
+
+    def restore(self, store):
+        """Replays the last window's spending from llm_log (see MemoryDB.get_token_usage)."""
+        since = time.time_ns() // 1000 - int(self.window_seconds * 1_000_000)
+        try:
+            usage = store.get_token_usage(since)
+        except Exception as e:
+            print(f"Error restoring rate-limit budgets: {e}")
+            return
+        with self._lock:
+            for row in usage:
+                for requests, token_bucket in self._buckets_for(row["model_used"], row["agent_name"]):
+                    requests.take(row["requests"])
+                    if token_bucket is not None:
+                        token_bucket.take(row["tokens"] or 0)
+
+    def stats(self) -> list:
+        """Remaining requests and tokens per backend and per agent, for dashboards."""
+        with self._lock:
+            rows = []
+            for (backend, agent_name), (requests, token_bucket) in self._buckets.items():
+                requests._refill()
+                if token_bucket is not None:
+                    token_bucket._refill()
+                rows.append({
+                    "backend": backend,
+                    "agent_name": agent_name,
+                    "requests_left": round(requests.level, 2),
+                    "tokens_left": round(token_bucket.level, 1) if token_bucket is not None else None,
+                    "token_budget": token_bucket.capacity if token_bucket is not None else None,
+                })
+            return rows
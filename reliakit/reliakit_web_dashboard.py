@@ -1,11 +1,18 @@
 # reliakit/reliakit_web_dashboard.py
 import os
-from flask import Flask, render_template_string, jsonify
+import gzip
+import hashlib
+import threading
+from flask import Flask, Response, render_template_string, jsonify, request
 from pathlib import Path
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timezone
 import json # For handling potential JSON data in memory entries
-from reliakit.memory_db import MemoryDB # Import the MemoryDB class
+from reliakit.memory_db import get_memory_db # Shared, pooled MemoryDB
+from reliakit.log_broadcaster import LogBroadcaster
+from reliakit.response_cache import ResponseCache
+from reliakit.latency_stats import LatencyTracker
+from reliakit.model_arbiter import ModelArbiter
 
 app = Flask(__name__)
 
@@ -17,6 +24,21 @@ base_dir = Path(__file__).resolve().parent.parent # This points to 'ReliaKit' if
 # Construct the path to the database
 DB_PATH = base_dir / "reliakit" / "utils" / "memory.db" # Corrected path
 
+# Page size for /memory; callers may ask for fewer (or more, up to MAX_PAGE_LIMIT) via ?limit=
+# The dashboard page renders at most DEFAULT_PAGE_LIMIT of the latest entries.
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
+# JSON responses smaller than this are not worth gzipping
+GZIP_MIN_SIZE = 500
+
+# Rendered /memory bodies, keyed by (endpoint, params, data_version); see /stats/cache
+response_cache = ResponseCache(max_entries=256, ttl=30.0)
+
+# Server-Sent Events settings for /events
+MAX_SSE_CLIENTS = 50
+SSE_HEARTBEAT_SECONDS = 15
+
 # HTML template for the dashboard
 DASHBOARD_HTML = """
 <!DOCTYPE html>
@@ -99,6 +121,17 @@ DASHBOARD_HTML = """
             </div>
         </div>
 
+        <div class="card p-6 mb-8">
+            <h2 class="text-2xl font-semibold mb-4 text-purple-300">Ask an Agent</h2>
+            <form id="query-form" class="flex flex-wrap gap-2 mb-4">
+                <input id="query-agent" class="bg-gray-700 p-2 rounded-lg" placeholder="Agent name" required>
+                <input id="query-prompt" class="bg-gray-700 p-2 rounded-lg flex-1" placeholder="Prompt" required>
+                <button id="query-submit" class="header-gradient px-4 py-2 rounded-lg font-semibold">Run</button>
+            </form>
+            <p id="query-status" class="text-sm text-gray-400 mb-2"></p>
+            <div id="query-output" class="scroll-area bg-gray-700 p-4 rounded-lg text-sm whitespace-pre-wrap"></div>
+        </div>
+
         <div class="card p-6 mb-8">
             <h2 class="text-2xl font-semibold mb-4 text-purple-300">Memory Snapshots</h2>
             <div id="memory-snapshots" class="scroll-area bg-gray-700 p-4 rounded-lg">
@@ -115,12 +148,24 @@ DASHBOARD_HTML = """
     </div>
 
     <script>
+        const WINDOW_SIZE = {{ window_size }}; // Server-side cap on rendered entries
+        let logs = [];        // Latest entries, oldest first, at most WINDOW_SIZE
+        let latestId = null;  // Watermark for ?since= delta requests
+        let etag = null;
+
         async function fetchData() {
             try {
-                const response = await fetch('/memory');
+                const url = latestId === null ? '/memory' : `/memory?since=${latestId}`;
+                const headers = etag ? { 'If-None-Match': etag } : {};
+                const response = await fetch(url, { headers, cache: 'no-store' });
+                if (response.status === 304) {
+                    document.getElementById('last-refresh').textContent = new Date().toLocaleTimeString();
+                    return; // Nothing changed since the last poll
+                }
                 if (!response.ok) {
                     throw new Error(`HTTP error! status: ${response.status}`);
                 }
+                etag = response.headers.get('ETag');
                 const data = await response.json();
                 updateDashboard(data);
             } catch (error) {
@@ -130,54 +175,165 @@ DASHBOARD_HTML = """
                 document.getElementById('db-status').classList.add('text-red-400');
                 document.getElementById('memory-snapshots').innerHTML = '<p class="text-center text-red-400">Error loading data: ' + error.message + '</p>';
                 document.getElementById('raw-data').innerHTML = '<p class="text-center text-red-400">Error loading data: ' + error.message + '</p>';
+                latestId = null; // Force a full reload once the server is reachable again
+                etag = null;
             }
         }
 
+        function renderLog(log) {
+            const logElement = document.createElement('div');
+            logElement.className = 'bg-gray-800 p-3 rounded-md mb-2 last:mb-0';
+            const header = document.createElement('p');
+            header.className = 'text-purple-400 font-semibold';
+            header.textContent = `${log.timestamp} - ${log.model_used}`;
+            const prompt = document.createElement('p');
+            prompt.className = 'text-gray-300';
+            prompt.innerHTML = '<strong>Prompt:</strong> ';
+            prompt.append(log.prompt || '');
+            const reply = document.createElement('p');
+            reply.className = 'text-gray-400';
+            reply.innerHTML = '<strong>Response:</strong> ';
+            reply.append(log.response || '');
+            logElement.append(header, prompt, reply);
+            return logElement;
+        }
+
         function updateDashboard(data) {
+            document.getElementById('db-status').textContent = 'Connected';
+            document.getElementById('db-status').classList.remove('text-red-400');
+            document.getElementById('db-status').classList.add('text-green-400');
             document.getElementById('last-refresh').textContent = new Date().toLocaleTimeString();
-            document.getElementById('total-memories').textContent = data.total_entries;
+            if (data.total_entries !== null) {
+                document.getElementById('total-memories').textContent = data.total_entries;
+            }
+
+            // Memory Snapshots (llm_log entries): append deltas, re-render on a full window
+            const snapshotsDiv = document.getElementById('memory-snapshots');
+            if (data.mode === 'full' || logs.length === 0) {
+                logs = [];
+                snapshotsDiv.innerHTML = '';
+            }
+            data.llm_logs.forEach(log => {
+                logs.push(log);
+                snapshotsDiv.appendChild(renderLog(log));
+            });
+            while (logs.length > WINDOW_SIZE) {
+                logs.shift();
+                snapshotsDiv.removeChild(snapshotsDiv.firstChild);
+            }
+            if (logs.length === 0) {
+                snapshotsDiv.innerHTML = '<p class="text-center text-gray-400">No LLM logs recorded yet.</p>';
+            }
+            if (data.latest_id !== null) {
+                latestId = data.latest_id;
+            }
 
             // LLM Log Summary
-            if (data.last_llm_log) {
-                document.getElementById('last-model').textContent = data.last_llm_log.model_used; # Changed from .model to .model_used
-                document.getElementById('last-prompt').textContent = data.last_llm_log.prompt.substring(0, 100) + (data.last_llm_log.prompt.length > 100 ? '...' : '');
-                document.getElementById('last-response').textContent = data.last_llm_log.response.substring(0, 100) + (data.last_llm_log.response.length > 100 ? '...' : '');
+            const lastLog = logs.length > 0 ? logs[logs.length - 1] : null;
+            if (lastLog) {
+                const prompt = lastLog.prompt || '';
+                const reply = lastLog.response || '';
+                document.getElementById('last-model').textContent = lastLog.model_used;
+                document.getElementById('last-prompt').textContent = prompt.substring(0, 100) + (prompt.length > 100 ? '...' : '');
+                document.getElementById('last-response').textContent = reply.substring(0, 100) + (reply.length > 100 ? '...' : '');
             } else {
                 document.getElementById('last-model').textContent = 'N/A';
                 document.getElementById('last-prompt').textContent = 'No LLM logs yet.';
                 document.getElementById('last-response').textContent = 'No LLM logs yet.';
             }
 
-            // Memory Snapshots (llm_log entries)
-            const snapshotsDiv = document.getElementById('memory-snapshots');
-            snapshotsDiv.innerHTML = ''; // Clear previous content
-            if (data.llm_logs && data.llm_logs.length > 0) {
-                data.llm_logs.forEach(log => {
-                    const logElement = document.createElement('div');
-                    logElement.className = 'bg-gray-800 p-3 rounded-md mb-2 last:mb-0';
-                    logElement.innerHTML = `
-                        <p class="text-purple-400 font-semibold">${log.timestamp} - ${log.model_used}</p> # Changed from .model to .model_used
-                        <p class="text-gray-300"><strong>Prompt:</strong> ${log.prompt}</p>
-                        <p class="text-gray-400"><strong>Response:</strong> ${log.response}</p>
-                    `;
-                    snapshotsDiv.appendChild(logElement);
-                });
-            } else {
-                snapshotsDiv.innerHTML = '<p class="text-center text-gray-400">No LLM logs recorded yet.</p>';
-            }
-
             // Raw Data
             const rawDataDiv = document.getElementById('raw-data');
-            rawDataDiv.textContent = JSON.stringify(data.llm_logs, null, 2);
+            rawDataDiv.textContent = JSON.stringify(logs.slice(-10), null, 2);
 
             // Placeholder for Agent Activity - needs actual agent data
             document.getElementById('active-agents').textContent = 'N/A (TODO)';
             document.getElementById('recent-executions').textContent = 'N/A (TODO)';
         }
 
-        // Initial fetch and set up auto-refresh
-        fetchData();
-        setInterval(fetchData, 5000); // Refresh every 5 seconds
+        // Live updates: /events pushes new rows; fall back to polling if SSE is unavailable
+        let pollTimer = null;
+        function startPolling() {
+            if (pollTimer === null) {
+                pollTimer = setInterval(fetchData, 5000); // Refresh every 5 seconds
+            }
+        }
+
+        function startEvents() {
+            if (!window.EventSource) {
+                startPolling();
+                return;
+            }
+            // The first connection resumes from the loaded window; reconnects send Last-Event-ID.
+            const source = new EventSource(latestId === null ? '/events' : `/events?last_event_id=${latestId}`);
+            source.addEventListener('log', event => {
+                updateDashboard({ mode: 'delta', llm_logs: [JSON.parse(event.data)], total_entries: null, latest_id: Number(event.lastEventId) });
+            });
+            source.addEventListener('stats', event => {
+                document.getElementById('total-memories').textContent = JSON.parse(event.data).total_entries;
+            });
+            source.addEventListener('reset', () => fetchData());
+            source.onerror = () => {
+                if (source.readyState === EventSource.CLOSED) {
+                    startPolling(); // Server refused the stream, e.g. client cap reached
+                }
+            };
+        }
+
+        // Ask an Agent: POST /query answers with an event stream of output chunks
+        document.getElementById('query-form').addEventListener('submit', async event => {
+            event.preventDefault();
+            const output = document.getElementById('query-output');
+            const status = document.getElementById('query-status');
+            const button = document.getElementById('query-submit');
+            output.textContent = '';
+            status.textContent = 'Waiting for first output...';
+            button.disabled = true;
+            try {
+                const response = await fetch('/query', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({
+                        agent: document.getElementById('query-agent').value,
+                        prompt: document.getElementById('query-prompt').value,
+                    }),
+                });
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+                    let end;
+                    while ((end = buffer.indexOf('\n\n')) >= 0) {
+                        const frame = buffer.slice(0, end);
+                        buffer = buffer.slice(end + 2);
+                        const type = (frame.match(/^event: (.*)$/m) || [])[1];
+                        const data = JSON.parse((frame.match(/^data: (.*)$/m) || [])[1] || 'null');
+                        if (type === 'first') {
+                            status.textContent = `First output after ${data.ttft.toFixed(2)}s...`;
+                        } else if (type === 'chunk') {
+                            output.append(data.text);
+                            output.scrollTop = output.scrollHeight;
+                        } else if (type === 'done') {
+                            const ttft = data.ttft === null ? 'n/a' : `${data.ttft.toFixed(2)}s`;
+                            status.textContent = `${data.status} via ${data.model_used} (first output ${ttft}, total ${data.duration.toFixed(2)}s)`;
+                        }
+                    }
+                }
+            } catch (error) {
+                status.textContent = 'Query failed: ' + error.message;
+            } finally {
+                button.disabled = false;
+            }
+        });
+
+        // Initial fetch, then live updates
+        fetchData().then(startEvents);
     </script>
 </body>
 </html>
@@ -186,36 +342,266 @@ DASHBOARD_HTML = """
 @app.route('/')
 def index():
     """Serves the main dashboard HTML page."""
-    return render_template_string(DASHBOARD_HTML)
+    return render_template_string(DASHBOARD_HTML, window_size=DEFAULT_PAGE_LIMIT)
+
+_summary_lock = threading.Lock()
+_summary = {"version": None}
+
+def _log_summary(db) -> dict:
+    """
+    Returns the latest id, total count and last-modified time of llm_log.
+    Recomputed only when the database's data_version has moved, so 304 checks stay cheap.
+    """
+    version = db.data_version()
+    with _summary_lock:
+        if _summary["version"] != version:
+            latest = db.get_llm_logs_page(limit=1)
+            last_modified = None
+            if latest:
+                try:
+                    last_modified = datetime.fromisoformat(latest[0]['timestamp']).astimezone(timezone.utc)
+                except ValueError:
+                    pass
+            _summary.update(
+                version=version,
+                latest_id=latest[0]['id'] if latest else 0,
+                total_entries=db.get_total_llm_entries(),
+                last_modified=last_modified,
+            )
+        return dict(_summary)
+
+def _memory_payload(db, args, summary: dict) -> bytes:
+    """Queries and serialises one /memory response body."""
+    limit = min(args.get('limit', DEFAULT_PAGE_LIMIT, type=int), MAX_PAGE_LIMIT)
+    filters = dict(
+        agent_name=args.get('agent'),
+        status=args.get('status'),
+        model_used=args.get('model'),
+    )
+    since = args.get('since', type=int)
+    if since is not None and 0 <= summary['latest_id'] - since <= limit:
+        mode = "delta"
+        llm_logs = db.get_logs_since(since, limit=limit, **filters)
+    else:
+        mode = "full"
+        llm_logs = db.get_llm_logs_page(
+            limit=limit,
+            after_id=args.get('after_id', type=int),
+            before_id=args.get('before_id', type=int),
+            **filters,
+        )
+    last_llm_log = llm_logs[-1] if llm_logs else None # Get the most recent log (last in ASC order)
+
+    return json.dumps({
+        "mode": mode,
+        "total_entries": summary['total_entries'],
+        "llm_logs": llm_logs,
+        "last_llm_log": last_llm_log,
+        "latest_id": last_llm_log['id'] if last_llm_log else since,
+        "next_before_id": llm_logs[0]['id'] if llm_logs else None
+    }).encode()
 
 @app.route('/memory')
 def get_memory_data():
     """
     API endpoint to fetch recent LLM log entries from the database.
-    Returns data as JSON.
+    Returns one keyset-paginated page as JSON; pass ?before_id= / ?after_id= to move
+    between pages and ?agent=, ?status=, ?model= to filter.
+
+    With ?since=<id> only entries newer than that id are returned ("mode": "delta"),
+    unless more than a window's worth arrived, in which case the latest window is sent
+    ("mode": "full") and the client should re-render. Responses carry ETag and
+    Last-Modified, and a matching If-None-Match / If-Modified-Since gets a 304.
     """
-    conn = None
     try:
-        # Use the MemoryDB class to get data
-        db = MemoryDB(db_path=DB_PATH)
-        llm_logs = db.get_all_llm_logs()
-        total_entries = db.get_total_llm_entries()
-        last_llm_log = llm_logs[-1] if llm_logs else None # Get the most recent log (last in ASC order)
-
-        return jsonify({
-            "total_entries": total_entries,
-            "llm_logs": llm_logs,
-            "last_llm_log": last_llm_log
-        })
+        # Reuse the process-wide MemoryDB so requests share pooled connections
+        db = get_memory_db(DB_PATH)
+        summary = _log_summary(db)
+        # ?since= is left out of the tag: a client polling with since=<latest id> and the tag from
+        # its previous response already holds exactly what the server would send.
+        params = sorted((k, v) for k, v in request.args.items(multi=True) if k != 'since')
+        params_hash = hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+        etag = f"{summary['latest_id']}-{summary['total_entries']}-{params_hash}"
+
+        if request.if_none_match:
+            if request.if_none_match.contains_weak(etag):
+                return "", 304
+        elif request.if_modified_since and summary['last_modified'] is not None:
+            if summary['last_modified'].replace(microsecond=0) <= request.if_modified_since:
+                return "", 304
+
+        # Identical requests between commits share one query and one serialisation
+        key = ('/memory', tuple(sorted(request.args.items(multi=True))), summary['version'])
+        args = request.args.copy()
+        body = response_cache.get_or_compute(key, lambda: _memory_payload(db, args, summary))
+        response = Response(body, mimetype='application/json')
+        if 'gzip' in request.headers.get('Accept-Encoding', '').lower() and len(body) >= GZIP_MIN_SIZE:
+            response.set_data(response_cache.get_or_compute(key + ('gzip',), lambda: gzip.compress(body, compresslevel=5)))
+            response.headers['Content-Encoding'] = 'gzip'
+            response.vary.add('Accept-Encoding')
+        response.set_etag(etag, weak=True)
+        if summary['last_modified'] is not None:
+            response.last_modified = summary['last_modified']
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return jsonify({"error": "Database error", "details": str(e)}), 500
     except Exception as e:
         print(f"Server error: {e}")
         return jsonify({"error": "Server error", "details": str(e)}), 500
-    finally:
-        # No explicit close needed for MemoryDB as it closes connection per method
-        pass
+
+@app.route('/stats/latency')
+def latency_stats():
+    """
+    Latency percentiles (p50/p90/p99, seconds) and the adaptive timeout per backend and
+    per agent, rebuilt from llm_log.duration_ms only when the database has changed.
+    """
+    try:
+        db = get_memory_db(DB_PATH)
+        key = ('/stats/latency', db.data_version())
+        table = response_cache.get_or_compute(key, lambda: LatencyTracker.from_rows(db.get_recent_durations()).table())
+        return jsonify(table)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return jsonify({"error": "Database error", "details": str(e)}), 500
+
+@app.route('/stats/backends')
+def backend_stats():
+    """
+    Circuit state, failure rate, median latency and health score per model backend. The
+    state is shared with every other process through backend_health; the meta loop
+    probes open backends as their cool-downs end.
+    """
+    return jsonify(get_arbiter().backend_health())
+
+@app.route('/stats/cache')
+def cache_stats():
+    """Hit/miss counters for the shared response cache, for sizing it."""
+    return jsonify(response_cache.stats())
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+def get_broadcaster() -> LogBroadcaster:
+    """Returns the single shared llm_log watcher that feeds every /events client."""
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None:
+            _broadcaster = LogBroadcaster(get_memory_db(DB_PATH), max_clients=MAX_SSE_CLIENTS)
+        return _broadcaster
+
+def _sse(event: str, data, event_id=None) -> str:
+    message = f"event: {event}\n"
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+@app.route('/events')
+def stream_events():
+    """
+    Server-Sent Events stream of new llm_log rows ("log" events, id = log id) followed by
+    aggregate counters ("stats"). Reconnecting clients resume after their Last-Event-ID;
+    if they missed more than a window's worth, a "reset" event tells them to reload /memory.
+    """
+    broadcaster = get_broadcaster()
+    sub = broadcaster.subscribe()
+    if sub is None:
+        return jsonify({"error": "Too many event stream clients"}), 503
+
+    resume_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    resume_id = int(resume_id) if resume_id and resume_id.isdigit() else None
+
+    def generate():
+        try:
+            # Subscribed before replaying, so rows written meanwhile are queued, not lost
+            last_id = resume_id
+            yield "retry: 3000\n\n"
+            if resume_id is not None:
+                db = get_memory_db(DB_PATH)
+                if db.get_max_log_id() - resume_id > DEFAULT_PAGE_LIMIT:
+                    yield _sse("reset", {})
+                    last_id = db.get_max_log_id()
+                else:
+                    for row in db.get_logs_since(resume_id):
+                        yield _sse("log", row, row['id'])
+                        last_id = row['id']
+            yield _sse("stats", broadcaster.stats())
+
+            while not sub.dropped:
+                batch = sub.get(timeout=SSE_HEARTBEAT_SECONDS)
+                if batch is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                rows, stats = batch
+                for row in rows:
+                    if last_id is None or row['id'] > last_id:
+                        yield _sse("log", row, row['id'])
+                        last_id = row['id']
+                yield _sse("stats", stats)
+        finally:
+            broadcaster.unsubscribe(sub)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no', # Disable proxy buffering so events are delivered immediately
+    })
+
+_arbiter = None
+_arbiter_lock = threading.Lock()
+
+def get_arbiter() -> ModelArbiter:
+    """Returns the dashboard's ModelArbiter, created on the first /query."""
+    global _arbiter
+    with _arbiter_lock:
+        if _arbiter is None:
+            _arbiter = ModelArbiter(db_path=DB_PATH)
+        return _arbiter
+
+@app.route('/query', methods=['POST'])
+def stream_query():
+    """
+    Runs a prompt for an agent and streams the answer as Server-Sent Events: "chunk"
+    events carry output as it is generated, "first" reports the time to first output and
+    "done" the model, status and timings. The query is logged as a single llm_log row.
+    """
+    payload = request.get_json(silent=True) or {}
+    agent, prompt = payload.get('agent'), payload.get('prompt')
+    if not agent or not prompt:
+        return jsonify({"error": "Both 'agent' and 'prompt' are required"}), 400
+    stream = get_arbiter().stream_query(agent, prompt)
+
+    def generate():
+        first = True
+        for chunk in stream:
+            if first:
+                first = False
+                yield _sse("first", {"ttft": stream.ttft})
+            yield _sse("chunk", {"text": chunk})
+        yield _sse("done", {"model_used": stream.model_used, "status": stream.status,
+                            "ttft": stream.ttft, "duration": stream.duration})
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@app.after_request
+def gzip_response(response):
+    """Gzips JSON responses for clients that accept it."""
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.headers.get('Accept-Encoding', '').lower()):
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Content-Length'] = str(len(response.get_data()))
+    response.vary.add('Accept-Encoding')
+    return response
 
 if __name__ == '__main__':
     # Ensure the database path exists before starting the app
@@ -1,70 +1,95 @@
 # tk_meta_loop.py
-import time
 import argparse
+import signal
+import threading
 from pathlib import Path
-from datetime import datetime
-from reliakit.memory_db import MemoryDB # Corrected import to use MemoryDB class
+from reliakit.memory_db import get_memory_db
 # from reliakit.model_arbiter import ModelArbiter # Uncomment if ModelArbiter is ready and needed here
-# from reliakit.agent_executor import execute_agent # Assuming this will exist
+from reliakit.agent_executor import get_agent_executor, DEFAULT_DB_PATH
+from reliakit.meta_scheduler import MetaLoopScheduler
+from reliakit.loop_guardian import LoopGuardian
 
-def run_meta_loop(db_path: Path, interval: int = 5):
+CHECKPOINT_NAME = "meta_loop" # Row in meta_checkpoint holding this loop's restart state
+PROBE_INTERVAL = 15.0 # Seconds between checks for open circuits whose cool-down has ended
+
+def probe_backends(executor, stopped: threading.Event, interval: float = PROBE_INTERVAL):
+    """
+    Probes every backend whose circuit is open and whose cool-down has ended, so a
+    recovered primary is put back into use without waiting for real traffic. The breaker
+    state is shared through the memory DB, so this also serves the GUI and dashboard.
+    """
+    while not stopped.wait(interval):
+        try:
+            for backend, recovered in executor.arbiter.probe_open_backends().items():
+                print(f"Probe of {backend}: {'recovered' if recovered else 'still failing'}.")
+        except Exception as e:
+            print(f"Error probing backends: {e}")
+
+def run_meta_loop(db_path: Path, interval: float = 2.0, max_in_flight: int = 4):
     """
     The main autonomous reflection loop for ReliaKit.
-    Scans memory, triggers agents, and performs reflection.
+    Scans memory, triggers agents, and performs reflection. The loop is event-driven (see
+    MetaLoopScheduler): it wakes on new llm_log writes, checking for writes from other
+    processes at most every `interval` seconds while idle, and runs at most
+    `max_in_flight` triggered agents at a time.
     """
-    db = MemoryDB(db_path=db_path)
+    db = get_memory_db(db_path)
+    executor = get_agent_executor(db_path) # Triggered agents run in-process, off the loop's thread
     # arbiter = ModelArbiter() # Initialize ModelArbiter if needed
 
-    print(f"Starting ReliaKit meta-loop with {interval}s interval...")
-    while True:
-        try:
-            # 1. Scan memory for new unresolved entries
-            last_model = db.get_last_used_model()
-            if last_model:
-                print(f"[{datetime.now().strftime('%H:%M:%S')}] Last LLM model used: {last_model}")
-            else:
-                print(f"[{datetime.now().strftime('%H:%M:%S')}] No LLM logs found yet.")
-
-            # --- Auto-run matching agent (Placeholder) ---
-            # if new_unresolved_memory_entry:
-            #     agent_name = determine_agent(memory_entry)
-            #     input_data = memory_entry.input
-            #     print(f"Triggering agent: {agent_name} with input: {input_data}")
-            #     # execute_agent(agent_name, input_data) # Call actual agent execution
+    # --- Auto-run matching agent ---
+    # Each new entry is checked against the trigger rules (DEFAULT_RULES: failed runs go
+    # to CodeHealer, unless every model was down or out of budget); matching agents are dispatched with executor.submit.
+    # Progress is checkpointed, so a restart resumes where the last run stopped.
+    # --- LoopGuardian ---
+    # Every new entry also goes through the LoopGuardian, which throttles, then pauses,
+    # agents that keep repeating themselves (enforced by each ModelArbiter).
+    guardian = LoopGuardian(db)
+    scheduler = MetaLoopScheduler(db, executor, max_in_flight=max_in_flight, max_interval=interval,
+                                  on_entries=guardian.observe, checkpoint=CHECKPOINT_NAME)
 
-            # --- Token usage threshold (Placeholder) ---
-            # if current_token_usage > threshold:
-            #     print("Token usage high, running LoopGuardian...")
-            #     # execute_agent("LoopGuardian", "Optimize token usage")
+    # --- Token usage threshold (Placeholder) ---
+    # if current_token_usage > threshold:
+    #     print("Token usage high, running LoopGuardian...")
+    #     # executor.submit("LoopGuardian", "Optimize token usage")
 
-            # --- Stale configs detection (Placeholder) ---
-            # if stale_configs_detected:
-            #     print("Stale configs detected, running QuanaSage...")
-            #     # execute_agent("QuanaSage", "Update agent configurations")
+    # --- Stale configs detection (Placeholder) ---
+    # if stale_configs_detected:
+    #     print("Stale configs detected, running QuanaSage...")
+    #     # executor.submit("QuanaSage", "Update agent configurations")
 
-            # --- Auto-reflect (Placeholder) ---
-            # This would involve analyzing recent logs/executions and potentially
-            # updating agent behaviors or system rules.
-            # print("Performing reflection synthesis...")
-            # reflection_result = perform_reflection(db) # A hypothetical function
-            # db.insert_log( # Changed to insert_log
-            #    agent_name="ReflectionAgent",
-            #    model_used="SelfReflection",
-            #    prompt="Performed reflection cycle.",
-            #    response="Reflection results...",
-            #    status="REFLECTED"
-            # )
+    # --- Auto-reflect (Placeholder) ---
+    # This would involve analyzing recent logs/executions and potentially
+    # updating agent behaviors or system rules.
+    # print("Performing reflection synthesis...")
+    # reflection_result = perform_reflection(db) # A hypothetical function
+    # db.insert_log( # Changed to insert_log
+    #    agent_name="ReflectionAgent",
+    #    model_used="SelfReflection",
+    #    prompt="Performed reflection cycle.",
+    #    response="Reflection results...",
+    #    status="REFLECTED"
+    # )
 
-            # --- Model arbitration (Placeholder) ---
-            # if arbiter:
-            #    response_from_arbiter = arbiter.run_query(agent_name="MetaLoop", prompt="Check system status.")
-            #    print(f"Arbiter response: {response_from_arbiter[:50]}...")
+    # --- Model arbitration (Placeholder) ---
+    # if arbiter:
+    #    response_from_arbiter = arbiter.run_query(agent_name="MetaLoop", prompt="Check system status.")
+    #    print(f"Arbiter response: {response_from_arbiter[:50]}...")
 
-        except Exception as e:
-            print(f"Error in meta-loop: {e}")
-            # Implement more robust error handling, logging, or notification
+    # --- Backend recovery ---
+    stopped = threading.Event()
+    threading.Thread(target=probe_backends, args=(executor, stopped), name="backend-probe", daemon=True).start()
 
-        time.sleep(interval)
+    signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
+    print(f"Starting ReliaKit meta-loop (event-driven, idle check every {interval}s, "
+          f"{max_in_flight} agents at a time)...")
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+    stopped.set()
+    executor.close(wait=False)
+    print(f"Meta-loop stopped after dispatching {scheduler.dispatched} agent runs.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="ReliaKit Autonomous Reflection Loop.")
@@ -75,9 +100,8 @@ if __name__ == "__main__":
     )
     args = parser.parse_args()
 
-    # Determine the database path relative to the project root
-    # Assuming tk_meta_loop.py is at the ReliaKit/ level
-    db_path = Path(__file__).resolve().parent / "reliakit" / "utils" / "memory.db"
+    # The shared memory database (reliakit/utils/memory.db), as used by the GUI and dashboard
+    db_path = DEFAULT_DB_PATH
 
     if args.auto:
         run_meta_loop(db_path=db_path)
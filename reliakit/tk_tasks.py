@@ -0,0 +1,119 @@
+# reliakit/tk_tasks.py
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from reliakit.model_backends import CancelToken
+
+POLL_MS = 50 # How often finished work is handed back to the Tk thread
+
+
+class BackgroundTask:
+    """One piece of work started through TkTaskRunner. cancel() may be called from any thread."""
+
+    def __init__(self, name: str, future: Future, cancel: CancelToken, visible: bool):
+        self.name = name
+        self.future = future
+        self.cancel_token = cancel
+        self.visible = visible
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token.cancelled
+
+    def cancel(self):
+        """Drops the task if it has not started, otherwise asks it to stop through its token."""
+        self.future.cancel()
+        self.cancel_token.cancel()
+
+
+class TkTaskRunner:
+    """
+    Keeps blocking work (database reads, agent runs) off the Tk main loop. Work runs on a
+    small thread pool, or elsewhere as a Future handed to watch(); completions, and any
+    callback a worker posts with post(), go through a queue that the Tk thread drains every
+    `poll_ms` via root.after. Every callback therefore runs on the Tk thread and may touch
+    widgets, while nothing on the Tk thread waits for a database or a model.
+
+    Results of cancelled tasks are dropped. `on_change(tasks)` is called on the Tk thread
+    with the visible in-flight tasks whenever that list changes, to drive a busy indicator.
+    """
+
+    def __init__(self, root, max_workers: int = 4, on_change=None, poll_ms: int = POLL_MS):
+        self.root = root
+        self.on_change = on_change
+        self.poll_ms = poll_ms
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tk-task")
+        self._callbacks = queue.SimpleQueue()
+        self._tasks = [] # Only touched on the Tk thread
+        self._after_id = self.root.after(self.poll_ms, self._drain)
+
+    @property
+    def in_flight(self) -> list:
+        return [task for task in self._tasks if task.visible]
+
+    def submit(self, fn, *args, on_done=None, on_error=None, name: str = None, visible: bool = True,
+               cancel: CancelToken = None) -> BackgroundTask:
+        """
+        Runs fn(*args) on the pool; on_done(result) or on_error(exception) then runs on the
+        Tk thread. Pass `cancel` if fn watches a CancelToken so cancel() can stop it midway.
+        Background housekeeping (visible=False) does not show in the busy indicator.
+        """
+        future = self._pool.submit(fn, *args)
+        return self.watch(future, on_done, on_error, name or fn.__name__, visible, cancel)
+
+    def watch(self, future: Future, on_done=None, on_error=None, name: str = "task", visible: bool = True,
+              cancel: CancelToken = None) -> BackgroundTask:
+        """Like submit, for work already running elsewhere (e.g. an AgentExecutor Future)."""
+        task = BackgroundTask(name, future, cancel or CancelToken(), visible)
+        self._tasks.append(task)
+        self._changed(task)
+        future.add_done_callback(lambda _: self._callbacks.put((self._finish, (task, on_done, on_error))))
+        return task
+
+    def post(self, callback, *args):
+        """Thread-safe: runs callback(*args) on the Tk thread at the next drain."""
+        self._callbacks.put((callback, args))
+
+    def cancel_all(self):
+        """Cancels every visible in-flight task."""
+        for task in self.in_flight:
+            task.cancel()
+
+    def close(self):
+        """Cancels everything and stops draining; call before the root window is destroyed."""
+        for task in self._tasks:
+            task.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _finish(self, task: BackgroundTask, on_done, on_error):
+        self._tasks.remove(task)
+        self._changed(task)
+        if task.cancelled or task.future.cancelled():
+            return
+        error = task.future.exception()
+        if error is not None:
+            if on_error is not None:
+                on_error(error)
+            else:
+                print(f"Background task '{task.name}' failed: {error}")
+        elif on_done is not None:
+            on_done(task.future.result())
+
+    def _changed(self, task: BackgroundTask):
+        if task.visible and self.on_change is not None:
+            self.on_change(self.in_flight)
+
+    def _drain(self):
+        """Runs on the Tk thread: invokes the callbacks queued so far, then reschedules itself."""
+        while True:
+            try:
+                callback, args = self._callbacks.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error in UI callback {getattr(callback, '__name__', callback)}: {e}")
+        self._after_id = self.root.after(self.poll_ms, self._drain)
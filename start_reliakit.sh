@@ -3,9 +3,10 @@
 # start_reliakit.sh
 # This script orchestrates the launch of ReliaKit components:
 # 1. Seeds the memory database (if not already seeded)
-# 2. Starts the background autonomous reflection loop (tk_meta_loop.py)
-# 3. Launches the Flask web dashboard (reliakit_web_dashboard.py)
-# 4. Launches the main Tkinter GUI (gui_launcher.py)
+# 2. Starts the resident agent daemon (reliakit/agent_daemon.py)
+# 3. Starts the background autonomous reflection loop (tk_meta_loop.py)
+# 4. Launches the Flask web dashboard (reliakit_web_dashboard.py)
+# 5. Launches the main Tkinter GUI (gui_launcher.py)
 
 # Set PYTHONPATH to include the ReliaKit directory and its subdirectories
 # This allows Python to find modules like 'reliakit.codex_base_ui'
@@ -20,7 +21,15 @@ echo "🌱 Initializing and seeding memory database..."
 python3 init_memory_db.py
 echo "✅ Database initialization and seeding complete."
 
-# --- 2. Start Autonomous Reflection Loop (tk_meta_loop.py) ---
+# --- 2. Start Agent Daemon ---
+# Keeps models and the database warm; `gui_launcher.py --execute` forwards to it over a
+# Unix socket instead of starting the agent runtime per call (and runs locally if it is down).
+echo "🧩 Starting agent daemon..."
+nohup python3 -m reliakit.agent_daemon > reliakit_agent_daemon.log 2>&1 &
+AGENT_DAEMON_PID=$!
+echo "✅ Agent daemon started (PID: $AGENT_DAEMON_PID)."
+
+# --- 3. Start Autonomous Reflection Loop (tk_meta_loop.py) ---
 # This script is assumed to handle auto-reflection, agent triggering, etc.
 # Run in background using '&'
 echo "🔄 Starting autonomous reflection loop..."
@@ -29,7 +38,7 @@ nohup python3 reliakit/tk_meta_loop.py --auto > reliakit_meta_loop.log 2>&1 &
 TK_META_LOOP_PID=$!
 echo "✅ Autonomous reflection loop started (PID: $TK_META_LOOP_PID)."
 
-# --- 3. Launch Flask Web Dashboard ---
+# --- 4. Launch Flask Web Dashboard ---
 echo "🌐 Starting Flask Web Dashboard..."
 # reliakit_web_dashboard.py is located in the reliakit/ subdirectory
 # Using port 5001 to avoid conflict with Control Center.
@@ -40,7 +49,7 @@ echo "   Access it from your LAN by replacing 127.0.0.1 with your machine's IP a
 echo "   If running via Docker, it will be accessible on the mapped port (e.g., http://localhost:5001)."
 
 
-# --- 4. Launch GUI ---
+# --- 5. Launch GUI ---
 echo "🖥️ Launching ReliaKit GUI..."
 # gui_launcher.py is located at the ReliaKit/ root level
 # The GUI should be launched last, as it's the primary interactive component.
@@ -58,4 +67,7 @@ fi
 if [ -n "$FLASK_PID" ] && kill -0 "$FLASK_PID" 2>/dev/null; then
     kill "$FLASK_PID"
 fi
+if [ -n "$AGENT_DAEMON_PID" ] && kill -0 "$AGENT_DAEMON_PID" 2>/dev/null; then
+    kill "$AGENT_DAEMON_PID"
+fi
 echo "🛑 ReliaKit system shut down."
\ No newline at end of file
@@ -0,0 +1,31 @@
+# test_agent_client.py
+import socket
+import tempfile
+import time
+from pathlib import Path
+from reliakit.agent_client import run_via_daemon
+
+
+def test_silent_daemon_times_out():
+    socket_path = Path(tempfile.mkdtemp()) / "agentd.sock"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(socket_path))
+        server.listen() # Accepts connections (in the backlog) but never replies
+        started = time.monotonic()
+        try:
+            run_via_daemon("EchoLens", "input", Path("memory.db"), socket_path=socket_path, timeout=0.3)
+            raise AssertionError("run_via_daemon should have timed out")
+        except TimeoutError as e:
+            assert "did not answer within" in str(e)
+        assert time.monotonic() - started < 2.0
+
+
+def test_no_daemon_means_run_locally():
+    socket_path = Path(tempfile.mkdtemp()) / "missing.sock"
+    assert run_via_daemon("EchoLens", "input", Path("memory.db"), socket_path=socket_path, timeout=0.3) is None
+
+
+if __name__ == "__main__":
+    test_silent_daemon_times_out()
+    test_no_daemon_means_run_locally()
+    print("Agent client tests passed.")
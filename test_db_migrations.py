@@ -0,0 +1,95 @@
+# test_db_migrations.py
+import sqlite3
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from reliakit.db_migrations import SCHEMA_VERSION, get_schema_version, migrate, prompt_hash
+from reliakit.memory_db import ConnectionPool, MemoryDB
+
+# (timestamp, agent_name, model_used, prompt, status) as the pre-migration code wrote them
+BASELINE_ROWS = [
+    ("2026-03-01T10:15:05.250000", "EchoLens", "gemini", "a", "SUCCESS"),
+    ("2026-03-01T10:15:40.000000", "EchoLens", "gemini", "b", "SUCCESS"),
+    ("2026-03-01T10:16:10.000000", "EchoLens", "gemini", "c", "ERROR"),
+    ("2026-03-01T10:59:59.999999", "TokenWeaver", "ollama:gemma:2b", "d", "FALLBACK"),
+    ("2026-03-01T11:00:00.000000", "EchoLens", "gemini", "e", "SUCCESS"),
+]
+
+
+def _baseline_db() -> Path:
+    """A memory.db as it looked before versioned migrations: llm_log only, user_version 0."""
+    db_path = Path(tempfile.mkdtemp()) / "memory.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                agent_name TEXT NOT NULL,
+                model_used TEXT NOT NULL,
+                prompt TEXT,
+                response TEXT,
+                status TEXT
+            )
+        ''')
+        conn.executemany(
+            "INSERT INTO llm_log (timestamp, agent_name, model_used, prompt, response, status) VALUES (?, ?, ?, ?, 'ok', ?)",
+            BASELINE_ROWS,
+        )
+    conn.close()
+    return db_path
+
+
+def _us(timestamp: str) -> int:
+    return int(datetime.fromisoformat(timestamp).timestamp() * 1_000_000)
+
+
+def test_baseline_db_migrates_to_current_schema():
+    pool = ConnectionPool(_baseline_db())
+    assert get_schema_version(pool) == 0
+    assert migrate(pool, chunk_size=2) == SCHEMA_VERSION == 12 # Small chunks: backfills span several transactions
+
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 12
+        rows = conn.execute("SELECT timestamp, prompt, ts_us, prompt_hash, prompt_tokens, heal_of FROM llm_log ORDER BY id")
+        for timestamp, prompt, ts_us, digest, tokens, heal_of in rows:
+            assert ts_us == _us(timestamp)
+            assert digest == prompt_hash(prompt)
+            assert (tokens, heal_of) == (0, None)
+
+        minute = {(row[0], row[1], row[2]): row[3] for row in conn.execute(
+            "SELECT bucket_us, agent_name, status, calls FROM llm_log_rollup_minute")}
+        assert minute == {
+            (_us("2026-03-01T10:15:00"), "EchoLens", "SUCCESS"): 2,
+            (_us("2026-03-01T10:16:00"), "EchoLens", "ERROR"): 1,
+            (_us("2026-03-01T10:59:00"), "TokenWeaver", "FALLBACK"): 1,
+            (_us("2026-03-01T11:00:00"), "EchoLens", "SUCCESS"): 1,
+        }
+        hour = {(row[0], row[1]): row[2] for row in conn.execute(
+            "SELECT bucket_us, agent_name, SUM(calls) FROM llm_log_rollup_hour GROUP BY 1, 2")}
+        assert hour == {
+            (_us("2026-03-01T10:00:00"), "EchoLens"): 3,
+            (_us("2026-03-01T10:00:00"), "TokenWeaver"): 1,
+            (_us("2026-03-01T11:00:00"), "EchoLens"): 1,
+        }
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {"prompt_cache", "backend_health", "meta_checkpoint", "meta_trigger", "agent_guard"} <= tables
+
+    assert migrate(pool) == 12 # Nothing left to do; re-running is harmless
+    with pool.connection() as conn:
+        assert conn.execute("SELECT SUM(calls) FROM llm_log_rollup_minute").fetchone()[0] == len(BASELINE_ROWS)
+    pool.close()
+
+
+def test_rows_written_after_migration_reach_the_rollups():
+    db = MemoryDB(db_path=_baseline_db()) # Opening runs the pending migrations
+    db.insert_log("EchoLens", model_used="gemini", prompt="f", response="ok", prompt_tokens=3, duration_ms=120)
+    with db.pool.connection() as conn:
+        calls, tokens, timed = conn.execute(
+            "SELECT SUM(calls), SUM(prompt_tokens), SUM(timed_calls) FROM llm_log_rollup_hour").fetchone()
+    assert (calls, tokens, timed) == (len(BASELINE_ROWS) + 1, 3, 1)
+
+
+if __name__ == "__main__":
+    test_baseline_db_migrates_to_current_schema()
+    test_rows_written_after_migration_reach_the_rollups()
+    print("Migration tests passed.")
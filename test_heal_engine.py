@@ -0,0 +1,99 @@
+# test_heal_engine.py
+import tempfile
+import threading
+import time
+from pathlib import Path
+from reliakit.agent_executor import AgentExecutor
+from reliakit.heal_engine import HealEngine
+from reliakit.memory_db import get_memory_db
+from reliakit.model_arbiter import ModelArbiter
+from reliakit.model_backends import BackendError, CancelToken, ModelBackend
+
+
+class HangingBackend(ModelBackend):
+    """Answers nothing until its call is cancelled, like a model that is stuck."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = threading.Semaphore(0)
+
+    def generate(self, prompt, timeout, cancel=None):
+        woken = threading.Event()
+        unlink = cancel.on_cancel(woken.set)
+        try:
+            self.started.release()
+            woken.wait(timeout)
+        finally:
+            unlink()
+        raise BackendError(f"{self.name} call cancelled")
+
+    def close(self):
+        pass
+
+
+class AnsweringBackend(ModelBackend):
+    def __init__(self, name: str):
+        self.name = name
+
+    def generate(self, prompt, timeout, cancel=None):
+        return f"answer to {prompt}"
+
+    def close(self):
+        pass
+
+
+def test_retries_are_logged_against_the_failed_row():
+    db_path = Path(tempfile.mkdtemp()) / "memory.db"
+    db = get_memory_db(db_path) # The arbiter's own instance, so flush() covers its writes too
+    db.insert_log("EchoLens", prompt="reverse a list", response="LLM ERROR: boom", model_used="gemini", status="ERROR")
+    db.flush()
+    arbiter = ModelArbiter(db_path=db_path, use_cache=False,
+                           backends={"gemini": AnsweringBackend("gemini"), "ollama:gemma:2b": HangingBackend("ollama")})
+    engine = HealEngine(db, AgentExecutor(db_path=db_path, arbiter=arbiter))
+    candidates = engine.find_candidates()
+
+    assert engine.heal(candidates) == {"healed": 1, "failed": 0, "cancelled": 0}
+    db.flush()
+    with db.pool.connection() as conn:
+        healed = conn.execute("SELECT * FROM llm_log WHERE heal_of = ?", (candidates[0]["id"],)).fetchone()
+    assert (healed["agent_name"], healed["prompt"], healed["model_used"], healed["status"]) == \
+        ("EchoLens", "reverse a list", "gemini", "SUCCESS")
+    assert healed["response"] == "answer to reverse a list"
+    assert engine.find_candidates() == []
+
+
+def test_cancel_stops_runs_in_progress():
+    db_path = Path(tempfile.mkdtemp()) / "memory.db"
+    db = get_memory_db(db_path) # The arbiter's own instance, so flush() covers its writes too
+    for agent in ("EchoLens", "TokenWeaver"):
+        db.insert_log(agent, prompt=f"{agent} prompt", response="LLM ERROR: boom", model_used="gemini",
+                      status="ERROR")
+    db.flush()
+    primary = HangingBackend("gemini")
+    arbiter = ModelArbiter(db_path=db_path, use_cache=False,
+                           backends={"gemini": primary, "ollama:gemma:2b": HangingBackend("ollama")})
+    engine = HealEngine(db, AgentExecutor(db_path=db_path, arbiter=arbiter))
+    candidates = engine.find_candidates()
+    assert [(c["agent_name"], c["prompt"]) for c in candidates] == [("EchoLens", "EchoLens prompt"),
+                                                                     ("TokenWeaver", "TokenWeaver prompt")]
+
+    cancel = CancelToken()
+    threading.Thread(target=lambda: [primary.started.acquire() for _ in candidates] and cancel.cancel(),
+                     daemon=True).start()
+    started = time.monotonic()
+    summary = engine.heal(candidates, cancel)
+    assert summary == {"healed": 0, "failed": 0, "cancelled": 2}
+    assert time.monotonic() - started < 5.0
+    # Cancelled runs are not logged: the failed rows are still the only ones, unchanged.
+    db.flush()
+    with db.pool.connection() as conn:
+        rows = [tuple(row) for row in conn.execute("SELECT agent_name, prompt, model_used, status FROM llm_log")]
+    assert rows == [("EchoLens", "EchoLens prompt", "gemini", "ERROR"),
+                    ("TokenWeaver", "TokenWeaver prompt", "gemini", "ERROR")]
+    assert engine.find_candidates() == candidates
+
+
+if __name__ == "__main__":
+    test_retries_are_logged_against_the_failed_row()
+    test_cancel_stops_runs_in_progress()
+    print("Heal engine tests passed.")
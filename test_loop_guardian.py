@@ -0,0 +1,99 @@
+# test_loop_guardian.py
+import tempfile
+import threading
+import time
+from pathlib import Path
+from reliakit.loop_guardian import BLOCKED, KILL, THROTTLE, LoopGuardian
+from reliakit.memory_db import get_memory_db
+from reliakit.model_arbiter import ModelArbiter
+from reliakit.model_backends import BackendError, ModelBackend
+
+
+class SlowBackend(ModelBackend):
+    """Answers after `delay` seconds unless the call is cancelled first."""
+
+    def __init__(self, name: str, delay: float = 0.0):
+        self.name = name
+        self.delay = delay
+        self.calls = 0
+
+    def generate(self, prompt, timeout, cancel=None):
+        self.calls += 1
+        woken = threading.Event()
+        unlink = cancel.on_cancel(woken.set)
+        try:
+            if woken.wait(self.delay):
+                raise BackendError(f"{self.name} cancelled")
+        finally:
+            unlink()
+        return f"answer to {prompt}"
+
+    def close(self):
+        pass
+
+
+def _entry(i: int, agent: str, prompt: str) -> dict:
+    return {"id": i, "agent_name": agent, "prompt": prompt, "response": "same answer", "status": "SUCCESS",
+            "timestamp": "2026-10-18T10:00:00"}
+
+
+def _db():
+    return get_memory_db(Path(tempfile.mkdtemp()) / "memory.db")
+
+
+def test_repeating_agent_is_throttled_then_paused():
+    db = _db()
+    guardian = LoopGuardian(db, max_repeats=5, hold_seconds=60)
+    verdicts = [guardian.observe_one(_entry(i, "EchoLens", "same prompt")) for i in range(6)]
+    assert verdicts[:5] == [None] * 5
+    assert verdicts[5]["action"] == THROTTLE
+    assert [guardian.observe_one(_entry(i, "TokenWeaver", f"prompt {i}")) for i in range(20)] == [None] * 20
+
+    cycle = [guardian.observe_one(_entry(10 + i, "EchoLens", "AB"[i % 2])) for i in range(6)]
+    assert cycle[-1]["action"] == KILL # A second flag within escalate_within pauses the agent
+    assert "cycled through the same 2 actions" in cycle[-1]["reason"]
+    assert {row["agent_name"]: row["action"] for row in db.get_agent_guards()} == {"EchoLens": KILL}
+
+
+def test_pause_kills_the_call_in_flight_and_lifts_when_it_expires():
+    db = _db()
+    primary = SlowBackend("gemini", delay=10.0)
+    arbiter = ModelArbiter(db_path=db.db_path, use_cache=False,
+                           backends={"gemini": primary, "ollama:gemma:2b": SlowBackend("ollama")})
+    arbiter.guard.refresh_seconds = 0.05
+    result = {}
+    query = threading.Thread(target=lambda: result.update(arbiter.query("EchoLens", "loop")))
+    query.start()
+    while primary.calls == 0:
+        time.sleep(0.01)
+
+    started = time.monotonic()
+    db.put_agent_guard("EchoLens", KILL, "test pause", 0.0, time.time() + 1.0)
+    query.join(5)
+    assert result["status"] == BLOCKED
+    assert time.monotonic() - started < 2.0 # Cancelled by the guard, not left to run out its 10s
+    assert arbiter.query("EchoLens", "again")["status"] == BLOCKED
+    assert primary.calls == 1 # Refused without calling a model
+
+    primary.delay = 0.0
+    assert arbiter.query("TokenWeaver", "unrelated")["status"] == "SUCCESS" # Only EchoLens is paused
+    time.sleep(max(0.0, started + 1.1 - time.monotonic())) # The pause expires; nothing has to lift it
+    assert arbiter.query("EchoLens", "resumed")["status"] == "SUCCESS"
+
+
+def test_throttled_agent_gets_one_call_per_interval():
+    db = _db()
+    arbiter = ModelArbiter(db_path=db.db_path, use_cache=False,
+                           backends={"gemini": SlowBackend("gemini"), "ollama:gemma:2b": SlowBackend("ollama")})
+    arbiter.guard.refresh_seconds = 0.0
+    db.put_agent_guard("EchoLens", THROTTLE, "test throttle", 0.5, time.time() + 60)
+    assert [arbiter.query("EchoLens", f"p{i}")["status"] for i in range(3)] == ["SUCCESS", BLOCKED, BLOCKED]
+    time.sleep(0.6)
+    assert arbiter.query("EchoLens", "later")["status"] == "SUCCESS"
+
+
+if __name__ == "__main__":
+    test_repeating_agent_is_throttled_then_paused()
+    test_pause_kills_the_call_in_flight_and_lifts_when_it_expires()
+    test_throttled_agent_gets_one_call_per_interval()
+    print("LoopGuardian tests passed.")
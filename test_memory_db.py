@@ -0,0 +1,79 @@
+# test_memory_db.py
+import sqlite3
+import tempfile
+from pathlib import Path
+from reliakit.memory_db import MemoryDB
+
+
+def _db(**kwargs) -> MemoryDB:
+    return MemoryDB(db_path=Path(tempfile.mkdtemp()) / "memory.db", **kwargs)
+
+
+def _log_count(db: MemoryDB) -> int:
+    with db.pool.connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM llm_log").fetchone()[0]
+
+
+def test_batch_writer_groups_rows_into_few_commits():
+    db = _db(batch_writes=True, batch_size=100, flush_interval=60.0)
+    commits = []
+    db.add_log_listener(lambda: commits.append(_log_count(db)))
+    for i in range(250):
+        db.insert_log("EchoLens", model_used="gemini", prompt=f"prompt {i}", response="ok")
+    assert db.flush()
+    assert _log_count(db) == 250
+    assert commits == [100, 200, 250] # Two full batches, then the rest on flush()
+
+
+def test_batch_writer_close_writes_pending_rows():
+    db = _db(batch_writes=True, flush_interval=60.0)
+    for i in range(10):
+        db.insert_log("EchoLens", model_used="gemini", prompt=f"prompt {i}", response="ok")
+    db.close()
+    assert db.writer.closed
+    assert _log_count(MemoryDB(db_path=db.db_path)) == 10
+
+
+def test_batch_writer_keeps_good_rows_and_reports_the_bad_one():
+    db = _db(batch_writes=True, flush_interval=60.0)
+    for i in range(10):
+        db.insert_log("EchoLens", model_used="gemini", prompt=f"prompt {i}", response="ok")
+    db.insert_log("EchoLens", model_used=None, prompt="bad", response="ok") # model_used is NOT NULL
+    try:
+        db.flush()
+        raise AssertionError("flush should report the dropped row")
+    except sqlite3.IntegrityError:
+        pass
+    assert _log_count(db) == 10
+    assert db.flush() # The error was reported once
+    try:
+        db.insert_log("EchoLens", model_used=None, prompt="bad", response="ok", durable=True)
+        raise AssertionError("a durable insert should raise its own write error")
+    except sqlite3.IntegrityError:
+        pass
+
+
+def test_failed_claim_rolls_back_and_restores_synchronous():
+    db = _db(pool_size=1) # One connection, so the failed claim's connection is the one checked below
+    db.save_meta_checkpoint("loop", 1, {}, [{"log_id": 1, "rule": "r", "agent_name": "CodeHealer", "input": "x"}])
+    with db.pool.connection() as conn:
+        conn.execute("CREATE TRIGGER no_claims BEFORE UPDATE ON meta_trigger BEGIN SELECT RAISE(ABORT, 'boom'); END")
+    try:
+        db.claim_trigger(1)
+        raise AssertionError("claim_trigger should have failed")
+    except sqlite3.IntegrityError as e:
+        assert "boom" in str(e) # The real error, not one from resetting the pragma
+    with db.pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1 # NORMAL again
+        conn.execute("DROP TRIGGER no_claims")
+    assert db.claim_trigger(1)
+    assert not db.claim_trigger(1)
+
+
+if __name__ == "__main__":
+    test_batch_writer_groups_rows_into_few_commits()
+    test_batch_writer_close_writes_pending_rows()
+    test_batch_writer_keeps_good_rows_and_reports_the_bad_one()
+    test_failed_claim_rolls_back_and_restores_synchronous()
+    print("Memory DB tests passed.")
@@ -0,0 +1,24 @@
+# test_meta_scheduler.py
+from reliakit.meta_scheduler import DEFAULT_RULES
+from reliakit.model_arbiter import LLM_ERROR_RESPONSE, RATE_LIMITED_RESPONSE
+
+
+def _triggered(entry: dict) -> list:
+    return [rule.agent for rule in DEFAULT_RULES if rule.matches(entry)]
+
+
+def test_agent_errors_go_to_code_healer():
+    entry = {"agent_name": "EchoLens", "status": "ERROR", "response": "LLM ERROR: gemini: KeyError 'id'"}
+    assert _triggered(entry) == ["CodeHealer"]
+
+
+def test_model_outages_are_not_healed():
+    for response in (LLM_ERROR_RESPONSE, RATE_LIMITED_RESPONSE):
+        assert _triggered({"agent_name": "EchoLens", "status": "ERROR", "response": response}) == []
+    assert _triggered({"agent_name": "EchoLens", "status": "SUCCESS", "response": "ok"}) == []
+
+
+if __name__ == "__main__":
+    test_agent_errors_go_to_code_healer()
+    test_model_outages_are_not_healed()
+    print("Meta scheduler rule tests passed.")
@@ -0,0 +1,122 @@
+# test_model_arbiter.py
+import asyncio
+import tempfile
+import threading
+import time
+from pathlib import Path
+from reliakit.circuit_breaker import HALF_OPEN, OPEN, CircuitBreaker
+from reliakit.memory_db import MemoryDB
+from reliakit.model_arbiter import LLM_ERROR_RESPONSE, ModelArbiter
+from reliakit.model_backends import BackendError, ModelBackend
+
+
+class FakeBackend(ModelBackend):
+    """Answers `reply` (or fails when it is None) once `release` is set."""
+
+    def __init__(self, name: str, reply: str = None):
+        self.name = name
+        self.reply = reply
+        self.release = threading.Event()
+        self.release.set()
+        self.calls = 0
+
+    def generate(self, prompt, timeout, cancel=None):
+        self.calls += 1
+        self.release.wait(timeout)
+        if self.reply is None:
+            raise BackendError(f"{self.name} is down")
+        return self.reply
+
+    def close(self):
+        pass
+
+
+def _arbiter(db_path: Path, primary: FakeBackend, fallback: FakeBackend) -> ModelArbiter:
+    return ModelArbiter(db_path=db_path, persist_cache=False,
+                        backends={"gemini": primary, "ollama:gemma:2b": fallback})
+
+
+def _logged(db: MemoryDB) -> list:
+    db.flush()
+    with db.pool.connection() as conn:
+        return [tuple(row) for row in conn.execute(
+            "SELECT status, response, prompt_tokens FROM llm_log ORDER BY id")]
+
+
+def _wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_coalesced_failures_are_logged_as_failures():
+    db_path = Path(tempfile.mkdtemp()) / "memory.db"
+    primary, fallback = FakeBackend("gemini"), FakeBackend("ollama")
+    primary.release.clear()
+    arbiter = _arbiter(db_path, primary, fallback)
+    threads = [threading.Thread(target=arbiter.query, args=("EchoLens", "same prompt")) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: arbiter.prompt_cache.coalesced == 2) # Two callers wait on the first one's query
+    primary.release.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert primary.calls == 1
+    rows = _logged(arbiter.memory_db)
+    assert [(status, response) for status, response, _ in rows] == [("ERROR", LLM_ERROR_RESPONSE)] * 3
+    assert sum(tokens for _, _, tokens in rows) == rows[0][2] # Only the query that ran is charged
+    candidates = arbiter.memory_db.get_heal_candidates()
+    assert [(c["agent_name"], c["prompt"], c["failures"]) for c in candidates] == [("EchoLens", "same prompt", 3)]
+
+
+def test_coalesced_answers_are_logged_as_cached():
+    db_path = Path(tempfile.mkdtemp()) / "memory.db"
+    primary, fallback = FakeBackend("gemini", "ok"), FakeBackend("ollama")
+    primary.release.clear()
+    arbiter = _arbiter(db_path, primary, fallback)
+    threads = [threading.Thread(target=arbiter.query, args=("EchoLens", "same prompt")) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: arbiter.prompt_cache.coalesced == 2)
+    primary.release.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert sorted(status for status, _, _ in _logged(arbiter.memory_db)) == ["CACHED", "CACHED", "SUCCESS"]
+    assert arbiter.memory_db.get_heal_candidates() == []
+
+
+def test_async_waiters_log_failures_as_failures():
+    db_path = Path(tempfile.mkdtemp()) / "memory.db"
+    arbiter = _arbiter(db_path, FakeBackend("gemini"), FakeBackend("ollama"))
+    responses = asyncio.run(arbiter.run_many([("EchoLens", "same prompt")] * 2))
+
+    assert responses == [LLM_ERROR_RESPONSE] * 2
+    assert [status for status, _, _ in _logged(arbiter.memory_db)] == ["ERROR", "ERROR"]
+    assert [c["failures"] for c in arbiter.memory_db.get_heal_candidates()] == [2]
+
+
+def test_unused_fallback_keeps_its_half_open_probe_slot():
+    db_path = Path(tempfile.mkdtemp()) / "memory.db"
+    arbiter = _arbiter(db_path, FakeBackend("gemini", "ok"), FakeBackend("ollama", "ok"))
+    breaker = arbiter.breakers["ollama:gemma:2b"] = CircuitBreaker("ollama:gemma:2b", open_seconds=0.2)
+    for _ in range(breaker.min_calls):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    time.sleep(0.25) # Cool-down over: the next allow_request() takes the probe slot
+
+    assert arbiter.query("EchoLens", "first", use_cache=False)["status"] == "SUCCESS"
+    assert asyncio.run(arbiter.arun_query("EchoLens", "second", use_cache=False)) == "ok"
+    # The primary answered both, so the fallback's probe slot is still free for a real call.
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+
+
+if __name__ == "__main__":
+    test_coalesced_failures_are_logged_as_failures()
+    test_coalesced_answers_are_logged_as_cached()
+    test_async_waiters_log_failures_as_failures()
+    test_unused_fallback_keeps_its_half_open_probe_slot()
+    print("Model arbiter tests passed.")
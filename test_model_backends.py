@@ -0,0 +1,80 @@
+# test_model_backends.py
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from reliakit.model_backends import BackendError, CancelToken, OllamaHTTPBackend
+
+STALL_SECONDS = 4.0
+
+
+class _SlowOllama(BaseHTTPRequestHandler):
+    """Stalls like an overloaded Ollama: before the headers, or after the first streamed chunk."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if not body["stream"]:
+            time.sleep(STALL_SECONDS)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        line = json.dumps({"response": "partial", "done": False}).encode() + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+        time.sleep(STALL_SECONDS)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowOllama)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _cancelled_after(seconds: float) -> CancelToken:
+    cancel = CancelToken()
+    threading.Timer(seconds, cancel.cancel).start()
+    return cancel
+
+
+def test_cancel_aborts_a_blocked_generate():
+    server = _serve()
+    backend = OllamaHTTPBackend(host=f"http://127.0.0.1:{server.server_port}", pool_size=1)
+    started = time.monotonic()
+    try:
+        backend.generate("prompt", timeout=STALL_SECONDS, cancel=_cancelled_after(0.3))
+        raise AssertionError("generate should have been cancelled")
+    except BackendError as e:
+        assert "cancelled" in str(e)
+    assert time.monotonic() - started < 1.5
+    assert backend._slots.acquire(timeout=0) # The connection slot was given back
+    server.shutdown()
+
+
+def test_cancel_aborts_a_stalled_stream():
+    server = _serve()
+    backend = OllamaHTTPBackend(host=f"http://127.0.0.1:{server.server_port}", pool_size=1)
+    chunks = []
+    started = time.monotonic()
+    try:
+        for chunk in backend.stream("prompt", timeout=STALL_SECONDS, cancel=_cancelled_after(0.3)):
+            chunks.append(chunk)
+        raise AssertionError("stream should have been cancelled")
+    except BackendError as e:
+        assert "cancelled" in str(e)
+    assert chunks == ["partial"]
+    assert time.monotonic() - started < 1.5
+    assert backend._slots.acquire(timeout=0)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    test_cancel_aborts_a_blocked_generate()
+    test_cancel_aborts_a_stalled_stream()
+    print("Model backend cancel tests passed.")
@@ -0,0 +1,41 @@
+# test_prompt_cache.py
+import tempfile
+import time
+from pathlib import Path
+from reliakit.memory_db import MemoryDB
+from reliakit.prompt_cache import PromptCache
+
+
+def _cached_keys(db: MemoryDB) -> set:
+    with db.pool.connection() as conn:
+        return {row["cache_key"] for row in conn.execute("SELECT cache_key FROM prompt_cache")}
+
+
+def test_expired_prompt_cache_rows_are_purged():
+    db = MemoryDB(db_path=Path(tempfile.mkdtemp()) / "memory.db")
+    entry = {"model_used": "gemini", "response": "ok", "status": "SUCCESS"}
+
+    short = PromptCache(ttl=0.05, store=db, purge_interval=0.0)
+    short.put("stale", "EchoLens", entry)
+    time.sleep(0.1)
+    assert _cached_keys(db) == {"stale"}
+
+    # The next write through a cache purges rows that have expired in the meantime.
+    PromptCache(ttl=3600.0, store=db, purge_interval=0.0).put("fresh", "EchoLens", entry)
+    assert _cached_keys(db) == {"fresh"}
+
+
+def test_purge_is_rate_limited():
+    db = MemoryDB(db_path=Path(tempfile.mkdtemp()) / "memory.db")
+    entry = {"model_used": "gemini", "response": "ok", "status": "SUCCESS"}
+    cache = PromptCache(ttl=0.05, store=db, purge_interval=3600.0)
+    cache.put("first", "EchoLens", entry) # Purges (nothing yet) and starts the interval
+    time.sleep(0.1)
+    cache.put("second", "EchoLens", entry)
+    assert _cached_keys(db) == {"first", "second"}
+
+
+if __name__ == "__main__":
+    test_expired_prompt_cache_rows_are_purged()
+    test_purge_is_rate_limited()
+    print("Prompt cache purge tests passed.")
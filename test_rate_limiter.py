@@ -0,0 +1,99 @@
+# test_rate_limiter.py
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from reliakit import rate_limiter
+from reliakit.memory_db import MemoryDB
+from reliakit.rate_limiter import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    """Stands in for the time module: monotonic() only moves when sleep() or advance() is called."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+    advance = sleep
+
+
+@contextmanager
+def fake_clock():
+    clock, real = FakeClock(), rate_limiter.time
+    rate_limiter.time = clock
+    try:
+        yield clock
+    finally:
+        rate_limiter.time = real
+
+
+def test_token_bucket_refills_continuously_up_to_capacity():
+    with fake_clock() as clock:
+        bucket = TokenBucket(capacity=10, window_seconds=10) # 1 unit per second
+        bucket.take(10)
+        assert bucket.wait_time(4) == 4.0
+        clock.advance(2.5)
+        assert bucket.wait_time(4) == 1.5
+        clock.advance(100)
+        assert bucket.wait_time(10) == 0.0
+        bucket.take(10)
+        assert bucket.level == 0.0 # Refill stopped at capacity, not at 102.5
+        assert bucket.wait_time(50) == 10.0 # Oversized requests wait for a full bucket
+
+
+def test_agent_share_and_refill_of_request_budget():
+    with fake_clock() as clock:
+        limiter = RateLimiter(thresholds={}, requests_per_window=4, window_seconds=60, agent_share=0.5)
+        assert limiter.reserve("gemini", "EchoLens", 1) == 0.0
+        assert limiter.reserve("gemini", "EchoLens", 1) == 0.0
+        assert limiter.reserve("gemini", "EchoLens", 1) == 30.0 # Half of 4 per minute: one every 30s
+        assert limiter.reserve("gemini", "TokenWeaver", 1) == 0.0 # Other agents keep their share
+        assert limiter.reserve("gemini", "TokenWeaver", 1) == 0.0
+        assert limiter.reserve("gemini", "CodeHealer", 1) == 15.0 # The backend's 4 are spent
+        assert limiter.throttled == 2
+
+        clock.advance(15)
+        assert limiter.reserve("gemini", "CodeHealer", 1) == 0.0
+        assert not limiter.acquire("gemini", "EchoLens", 1, timeout=5.0) # Needs 15s more
+        started = clock.now
+        assert limiter.acquire("gemini", "EchoLens", 1, timeout=60.0)
+        assert clock.now - started == 15.0 # Queued exactly until the bucket refilled
+
+
+def test_token_budget_counts_prompt_and_response_tokens():
+    with fake_clock() as clock:
+        limiter = RateLimiter(thresholds={"ollama": 100}, window_seconds=10, agent_share=0.5)
+        assert limiter.reserve("ollama:gemma:2b", "EchoLens", 20) == 0.0
+        limiter.charge("ollama:gemma:2b", "EchoLens", 30) # The agent has used all of its 50
+        assert limiter.reserve("ollama:gemma:2b", "EchoLens", 10) == 2.0 # 5 tokens per second
+        clock.advance(2)
+        assert limiter.reserve("ollama:gemma:2b", "EchoLens", 10) == 0.0
+        stats = {row["agent_name"]: row for row in limiter.stats()}
+        assert stats[None]["tokens_left"] == 60.0 # 100 - 60 spent + 20 refilled at the backend's 10/s
+        assert stats["EchoLens"]["tokens_left"] == 0.0
+
+
+def test_restart_replays_recent_spending():
+    db = MemoryDB(db_path=Path(tempfile.mkdtemp()) / "memory.db")
+    for status in ("SUCCESS", "FALLBACK", "ERROR", "CACHED"):
+        db.insert_log("EchoLens", model_used="gemini", prompt="p", response="r", status=status,
+                      prompt_tokens=100, response_tokens=50)
+    limiter = RateLimiter(thresholds={"gemini": 1000}, requests_per_window=10, store=db)
+    stats = {row["agent_name"]: row for row in limiter.stats()}
+    # Only the two answered queries spent budget; errors and cache hits did not.
+    assert round(stats[None]["requests_left"]) == 8
+    assert round(stats[None]["tokens_left"]) == 700
+    assert round(stats["EchoLens"]["tokens_left"]) == 200
+
+
+if __name__ == "__main__":
+    test_token_bucket_refills_continuously_up_to_capacity()
+    test_agent_share_and_refill_of_request_budget()
+    test_token_budget_counts_prompt_and_response_tokens()
+    test_restart_replays_recent_spending()
+    print("Rate limiter tests passed.")
@@ -0,0 +1,71 @@
+# test_web_dashboard.py
+import gzip
+import json
+import tempfile
+from pathlib import Path
+from reliakit import reliakit_web_dashboard as dashboard
+from reliakit.memory_db import get_memory_db
+
+
+def _client(rows: int = 3):
+    """A test client for the dashboard, pointed at a fresh database holding `rows` entries."""
+    dashboard.DB_PATH = Path(tempfile.mkdtemp()) / "memory.db"
+    dashboard._summary["version"] = None # data_version counters of different databases can coincide
+    dashboard.response_cache.clear()
+    db = get_memory_db(dashboard.DB_PATH)
+    for i in range(rows):
+        db.insert_log("EchoLens", model_used="gemini", prompt=f"prompt {i}", response="ok " * 20)
+    db.flush()
+    return db, dashboard.app.test_client()
+
+
+def test_memory_sends_etag_and_answers_304_until_the_log_changes():
+    db, client = _client()
+    first = client.get('/memory')
+    assert first.status_code == 200
+    assert first.headers['ETag'].startswith('W/')
+    assert first.headers['Last-Modified']
+    assert len(first.get_json()['llm_logs']) == 3
+
+    unchanged = client.get('/memory', headers={'If-None-Match': first.headers['ETag']})
+    assert unchanged.status_code == 304
+    assert unchanged.data == b""
+    since = client.get('/memory', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert since.status_code == 304
+
+    db.insert_log("EchoLens", model_used="gemini", prompt="prompt 3", response="ok")
+    db.flush()
+    changed = client.get('/memory', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+
+
+def test_memory_since_returns_only_new_entries():
+    db, client = _client()
+    latest_id = client.get('/memory').get_json()['latest_id']
+    db.insert_log("EchoLens", model_used="gemini", prompt="new", response="ok")
+    db.flush()
+    delta = client.get(f'/memory?since={latest_id}').get_json()
+    assert delta['mode'] == "delta"
+    assert [entry['prompt'] for entry in delta['llm_logs']] == ["new"]
+    assert delta['latest_id'] == latest_id + 1
+
+
+def test_memory_is_gzipped_once_for_clients_that_accept_it():
+    _, client = _client(rows=20)
+    plain = client.get('/memory')
+    assert 'Content-Encoding' not in plain.headers
+    assert len(plain.data) >= dashboard.GZIP_MIN_SIZE
+
+    zipped = client.get('/memory', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in zipped.headers['Vary']
+    assert len(zipped.data) < len(plain.data)
+    assert json.loads(gzip.decompress(zipped.data)) == plain.get_json()
+
+
+if __name__ == "__main__":
+    test_memory_sends_etag_and_answers_304_until_the_log_changes()
+    test_memory_since_returns_only_new_entries()
+    test_memory_is_gzipped_once_for_clients_that_accept_it()
+    print("Web dashboard tests passed.")
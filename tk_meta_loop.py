@@ -1,39 +1,49 @@
-from reliakit.memory_db import db_session, MemorySnapshot, ConfigMeta
+from reliakit.memory_db import get_memory_db
 from datetime import datetime, timedelta
+from pathlib import Path
 import json
 
+PROJECT_ROOT = Path(__file__).resolve().parent
+DB_PATH = PROJECT_ROOT / "reliakit" / "utils" / "memory.db"
+CONFIG_FILES = [
+    PROJECT_ROOT / "generated_configs" / "new_agents.jsonl",
+    PROJECT_ROOT / "generated_configs" / "reliakit_codex_gpts.jsonl",
+]
+
 class MetaLoop:
     """Handles agent self-reflection and evolution"""
-    def __init__(self):
+    def __init__(self, db_path: Path = DB_PATH):
         self.reflection_window = timedelta(days=1)  # Analyze last 24h of activity
+        self.memory_db = get_memory_db(db_path)
 
     def analyze_recent_activity(self):
         """Analyze recent agent executions for improvement opportunities"""
-        with db_session() as session:
-            recent = session.query(MemorySnapshot).filter(
-                MemorySnapshot.timestamp > datetime.now() - self.reflection_window
-            ).all()
-            
-            # Basic analysis - count executions by agent
-            activity = {}
-            for snap in recent:
-                if snap.agent_name not in activity:
-                    activity[snap.agent_name] = 0
-                activity[snap.agent_name] += 1
-            
-            return activity
+        # Basic analysis - count executions by agent. Counted in SQL from the minute/hour
+        # rollups, so a week or a month costs about the same as a day.
+        rows = self.memory_db.get_activity(since=datetime.now() - self.reflection_window)
+        return {row['agent_name']: row['calls'] for row in rows}
+
+    def _load_agent_config(self, agent_name):
+        for config_path in CONFIG_FILES:
+            if not config_path.exists():
+                continue
+            with open(config_path, 'r') as f:
+                for line in f:
+                    try:
+                        config = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if config.get('name') == agent_name:
+                        return config
+        return None
 
     def trigger_evolution(self, agent_name):
         """Initiate evolution process for an agent"""
-        with db_session() as session:
-            config = session.query(ConfigMeta).filter(
-                ConfigMeta.agent == agent_name
-            ).first()
-            
-            if config:
-                # Placeholder for evolution logic
-                print(f"Evolution triggered for {agent_name}")
-                return True
+        config = self._load_agent_config(agent_name)
+        if config:
+            # Placeholder for evolution logic
+            print(f"Evolution triggered for {agent_name}")
+            return True
         return False
 
 def main():